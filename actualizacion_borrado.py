@@ -2,25 +2,153 @@
 
 import datetime
 from peewee import *
-from conexion import db, conectar_bd, cerrar_bd
-from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+from conexion import db, conectar_bd, cerrar_bd, sesion
+from crear_tablas import (Cliente, Empleado, Proyecto, EmpleadoProyecto,
+                          ProyectoArchivado, EmpleadoProyectoArchivado, con_upsert, IGNORAR)
+from cache_claves import obtener_cliente, obtener_jefe
+from consultas_compiladas import plantilla, por_clave
+
+# Filas por sentencia en las actualizaciones en bloque (CASE + IN: 3 parámetros por fila)
+TAMANO_LOTE_MASIVO = 1000
+
+def restar_anios(fecha, anios):
+    """
+    Resta años a una fecha. El 29 de febrero pasa a 28 si el año
+    resultante no es bisiesto.
+    """
+    try:
+        return fecha.replace(year=fecha.year - anios)
+    except ValueError:
+        return fecha.replace(year=fecha.year - anios, day=28)
+
+# --- Condiciones sobre proyectos (también las usan purga.py y paginacion.py) ---
+def condicion_activos(fecha_actual):
+    """
+    Proyectos activos: fecha_fin posterior a 'fecha_actual' o NULA.
+    """
+    fecha_fin_futura = Proyecto.fecha_fin > fecha_actual
+    fecha_fin_nula = Proyecto.fecha_fin.is_null(True)
+    return fecha_fin_futura | fecha_fin_nula
+
+def condicion_finalizados(fecha_actual):
+    """
+    Proyectos no activos: fecha_fin definida y no posterior a 'fecha_actual'.
+    """
+    return Proyecto.fecha_fin.is_null(False) & (Proyecto.fecha_fin <= fecha_actual)
+
+def condicion_antiguos_baratos(fecha_actual):
+    """
+    Proyectos con presupuesto < 10,000 y fecha de finalización anterior a 'fecha_actual'.
+    """
+    presupuesto_bajo = Proyecto.presupuesto < 10000
+    fecha_pasada = Proyecto.fecha_fin < fecha_actual
+    return presupuesto_bajo & fecha_pasada
+
+def condicion_obsoletos(fecha_limite):
+    """
+    Proyectos terminados antes de 'fecha_limite'.
+    """
+    fecha_fin_antigua = Proyecto.fecha_fin < fecha_limite
+    fecha_fin_definida = Proyecto.fecha_fin.is_null(False)
+    return fecha_fin_antigua & fecha_fin_definida
+
+# --- Plantillas compiladas (ver consultas_compiladas.py) ---
+@plantilla
+def aumentar_presupuesto_activos(fecha_actual):
+    return (Proyecto
+            .update(presupuesto=Proyecto.presupuesto * 1.10)
+            .where(condicion_activos(fecha_actual)))
+
+@plantilla
+def borrar_asignaciones_de_cliente(dni_cif):
+    proyectos_del_cliente = Proyecto.select(Proyecto.id_proyecto).where(Proyecto.id_cliente == dni_cif)
+    return EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto.in_(proyectos_del_cliente))
+
+@plantilla
+def borrar_proyectos_de_cliente(dni_cif):
+    return Proyecto.delete().where(Proyecto.id_cliente == dni_cif)
+
+@plantilla
+def borrar_asignaciones_archivadas_de_cliente(dni_cif):
+    archivados_del_cliente = (ProyectoArchivado
+                              .select(ProyectoArchivado.id_proyecto)
+                              .where(ProyectoArchivado.id_cliente == dni_cif))
+    return (EmpleadoProyectoArchivado
+            .delete()
+            .where(EmpleadoProyectoArchivado.id_proyecto.in_(archivados_del_cliente)))
+
+@plantilla
+def borrar_proyectos_archivados_de_cliente(dni_cif):
+    return ProyectoArchivado.delete().where(ProyectoArchivado.id_cliente == dni_cif)
+
+@plantilla
+def borrar_cliente(dni_cif):
+    return Cliente.delete().where(Cliente.dni_cif == dni_cif)
+
+# --- Actualizaciones en bloque ---
+def _por_clave(cambios):
+    # Acepta un dict o pares (clave, valor); si una clave se repite, gana el último valor
+    return dict(cambios.items() if isinstance(cambios, dict) else cambios)
+
+def _aplicar_en_bloque(modelo, instancias, campos, fallidos):
+    """
+    Aplica las instancias con bulk_update (un UPDATE ... CASE por lote, cada
+    lote en su transacción). Si un lote falla por integridad se repite fila
+    a fila para apuntar en 'fallidos' solo las claves que fallan.
+    Devuelve el número de filas actualizadas.
+    """
+    actualizadas = 0
+    for lote in chunked(instancias, TAMANO_LOTE_MASIVO):
+        try:
+            with db.atomic():
+                actualizadas += modelo.bulk_update(lote, fields=campos)
+        except IntegrityError:
+            for instancia in lote:
+                try:
+                    with db.atomic():
+                        actualizadas += modelo.bulk_update([instancia], fields=campos)
+                except IntegrityError as e:
+                    fallidos[instancia._pk] = f"Error de integridad: {e}"
+    return actualizadas
+
+def _existentes(campo_clave, claves, *campos):
+    # {clave: fila} de las claves que existen, con una consulta por lote
+    filas = {}
+    for lote in chunked(list(claves), TAMANO_LOTE_MASIVO):
+        consulta = (campo_clave.model
+                    .select(campo_clave, *campos)
+                    .where(campo_clave.in_(lote))
+                    .tuples())
+        filas.update((fila[0], fila[1:]) for fila in consulta)
+    return filas
+
+def _telefono(valor):
+    # Los teléfonos pueden llegar como números (p. ej. de un JSON): se pasan
+    # a texto. Cualquier otro tipo no es un teléfono válido
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return str(valor)
+    raise ValueError(f"Teléfono no válido: {valor!r}")
 
 # --- 1. Actualizar Teléfono de Cliente ---
 def actualizar_telefono_cliente(dni_cif, nuevo_telefono):
     """
     Actualiza el número de teléfono de un cliente específico
     utilizando el método .save().
+    Devuelve las filas actualizadas, o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
 
     try:
-        cliente = Cliente.get_or_none(Cliente.dni_cif == dni_cif)
+        cliente = obtener_cliente(dni_cif)
 
         if cliente:
             cliente.tlf = nuevo_telefono
-            cliente.save() 
+            filas_actualizadas = cliente.save()
             print(f"Teléfono del cliente '{cliente.nombre_cliente}' actualizado a {nuevo_telefono}.")
+            return filas_actualizadas
         else:
             print(f"Error: No se encontró ningún cliente con DNI/CIF {dni_cif}.")
 
@@ -29,29 +157,69 @@ def actualizar_telefono_cliente(dni_cif, nuevo_telefono):
     finally:
         cerrar_bd()
 
+# --- 1b. Actualizar Teléfonos de Clientes en bloque ---
+def actualizar_telefonos_clientes(cambios):
+    """
+    Actualiza el teléfono de muchos clientes a la vez. 'cambios' es un dict
+    o una lista de pares (dni_cif, nuevo_telefono).
+    Los cambios se aplican con UPDATE ... CASE por lotes; un cliente que no
+    existe o un teléfono no válido no impide aplicar el resto.
+    Devuelve {'actualizados', 'sin_cambios', 'fallidos': {dni_cif: motivo}}.
+    """
+    resultado = {'actualizados': 0, 'sin_cambios': 0, 'fallidos': {}}
+    if not conectar_bd():
+        return resultado
+
+    fallidos = resultado['fallidos']
+    try:
+        cambios = _por_clave(cambios)
+        max_longitud = Cliente.tlf.max_length
+        actuales = _existentes(Cliente.dni_cif, cambios, Cliente.tlf)
+
+        instancias = []
+        for dni_cif, nuevo_telefono in cambios.items():
+            try:
+                nuevo_telefono = _telefono(nuevo_telefono)
+            except ValueError as e:
+                fallidos[dni_cif] = str(e)
+                continue
+            if dni_cif not in actuales:
+                fallidos[dni_cif] = "No existe el cliente"
+            elif nuevo_telefono is not None and len(nuevo_telefono) > max_longitud:
+                fallidos[dni_cif] = f"Teléfono de más de {max_longitud} caracteres"
+            elif actuales[dni_cif][0] == nuevo_telefono:
+                resultado['sin_cambios'] += 1
+            else:
+                instancias.append(Cliente(dni_cif=dni_cif, tlf=nuevo_telefono))
+
+        resultado['actualizados'] = _aplicar_en_bloque(Cliente, instancias, [Cliente.tlf], fallidos)
+        print(f"Teléfonos actualizados: {resultado['actualizados']} clientes, "
+              f"{resultado['sin_cambios']} sin cambios, {len(fallidos)} fallidos.")
+
+    except Exception as e:
+        print(f"Error al actualizar los teléfonos de los clientes: {e}")
+    finally:
+        cerrar_bd()
+    return resultado
+
 # --- 2. Aumentar Presupuesto Proyectos Activos ---
 def aumentar_presupuesto_proyectos_activos():
     """
     Aumenta el presupuesto de todos los proyectos activos en un 10%.
     Un proyecto se considera activo si su fecha_fin es futura o es NULA.
     Utiliza una expresión aritmética en .update().
+    Devuelve las filas actualizadas, o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
 
     try:
         fecha_actual = datetime.date.today()
 
-        # Proyectos activos: fecha_fin futura O NULL
-        fecha_fin_futura = Proyecto.fecha_fin > fecha_actual
-        fecha_fin_nula = Proyecto.fecha_fin.is_null(True)
-        condicion_activos = fecha_fin_futura | fecha_fin_nula
-        
-        expresion_aumento = Proyecto.presupuesto * 1.10
-        query = Proyecto.update(presupuesto=expresion_aumento).where(condicion_activos)
-        filas_actualizadas = query.execute()
+        filas_actualizadas = aumentar_presupuesto_activos.ejecutar(fecha_actual)
         
         print(f"Se aumentó el presupuesto en un 10% a {filas_actualizadas} proyectos activos.")
+        return filas_actualizadas
 
     except Exception as e:
         print(f"Error al aumentar el presupuesto de los proyectos: {e}")
@@ -63,29 +231,29 @@ def reasignar_jefe_proyecto(id_proyecto, nuevo_jefe_dni):
     """
     Reasigna el jefe de proyecto para un proyecto específico.
     Utiliza .save() para actualizar el registro existente.
+    Devuelve las filas actualizadas, o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
 
     try:
-        proyecto = Proyecto.get_or_none(Proyecto.id_proyecto == id_proyecto)
+        proyecto = por_clave(Proyecto, id_proyecto)
         
-        es_jefe = Empleado.jefe == True
-        es_mismo_dni = Empleado.dni == nuevo_jefe_dni
-        nuevo_jefe = Empleado.get_or_none(es_mismo_dni & es_jefe)
+        nuevo_jefe = obtener_jefe(nuevo_jefe_dni)
 
         if not proyecto:
             print(f"Error: No se encontró el proyecto con ID {id_proyecto}.")
-            return
+            return None
         
         if not nuevo_jefe:
             print(f"Error: No se encontró al empleado {nuevo_jefe_dni} o no es jefe.")
-            return
+            return None
 
         proyecto.id_jefe_proyecto = nuevo_jefe
-        proyecto.save() 
+        filas_actualizadas = proyecto.save()
         
         print(f"El proyecto '{proyecto.titulo_proyecto}' ha sido reasignado a '{nuevo_jefe.nombre}'.")
+        return filas_actualizadas
 
     except IntegrityError:
         print(f"Error de integridad: El empleado '{nuevo_jefe.nombre}' ya es jefe de otro proyecto.")
@@ -94,25 +262,115 @@ def reasignar_jefe_proyecto(id_proyecto, nuevo_jefe_dni):
     finally:
         cerrar_bd()
 
+# --- 3b. Reasignar Jefes de Proyecto en bloque ---
+def reasignar_jefes_proyectos(cambios):
+    """
+    Reasigna el jefe de muchos proyectos a la vez. 'cambios' es un dict o
+    una lista de pares (id_proyecto, nuevo_jefe_dni).
+    Todos los jefes nuevos se validan (existen y son jefes) con una consulta
+    y los cambios se aplican con UPDATE ... CASE por lotes.
+    Un jefe solo puede dirigir un proyecto: si el nuevo jefe dirige otro
+    proyecto que en este mismo lote pasa a otro jefe, el cambio se aplica
+    después de liberarlo; si no, ese proyecto falla sin afectar al resto.
+    Devuelve {'actualizados', 'sin_cambios', 'fallidos': {id_proyecto: motivo}}.
+    """
+    resultado = {'actualizados': 0, 'sin_cambios': 0, 'fallidos': {}}
+    if not conectar_bd():
+        return resultado
+
+    fallidos = resultado['fallidos']
+    try:
+        cambios = _por_clave(cambios)
+
+        proyectos = _existentes(Proyecto.id_proyecto, cambios, Proyecto.id_jefe_proyecto)
+        jefes_validos = set()
+        for lote in chunked(list(set(cambios.values())), TAMANO_LOTE_MASIVO):
+            jefes_validos.update(dni for dni, in (Empleado
+                                                  .select(Empleado.dni)
+                                                  .where(Empleado.dni.in_(lote) & (Empleado.jefe == True))
+                                                  .tuples()))
+
+        pendientes = {}
+        asignados = {}
+        for id_proyecto, nuevo_jefe in cambios.items():
+            if id_proyecto not in proyectos:
+                fallidos[id_proyecto] = "No existe el proyecto"
+            elif nuevo_jefe not in jefes_validos:
+                fallidos[id_proyecto] = f"El empleado {nuevo_jefe} no existe o no es jefe"
+            elif proyectos[id_proyecto][0] == nuevo_jefe:
+                resultado['sin_cambios'] += 1
+            elif nuevo_jefe in asignados:
+                fallidos[id_proyecto] = f"El empleado {nuevo_jefe} ya se asigna al proyecto {asignados[nuevo_jefe]} en este lote"
+            else:
+                asignados[nuevo_jefe] = id_proyecto
+                pendientes[id_proyecto] = nuevo_jefe
+
+        # Proyecto que dirige hoy cada jefe nuevo (una consulta por lote)
+        ocupados = {}
+        for lote in chunked(list(pendientes.values()), TAMANO_LOTE_MASIVO):
+            ocupados.update(Proyecto
+                            .select(Proyecto.id_jefe_proyecto, Proyecto.id_proyecto)
+                            .where(Proyecto.id_jefe_proyecto.in_(lote))
+                            .tuples())
+
+        # Por rondas: en cada una van los cambios cuyo jefe nuevo está libre;
+        # al aplicarlos quedan libres los jefes anteriores de esos proyectos
+        while pendientes:
+            libres = {id_proyecto: jefe for id_proyecto, jefe in pendientes.items()
+                      if jefe not in ocupados}
+            if not libres:
+                break
+            instancias = [Proyecto(id_proyecto=id_proyecto, id_jefe_proyecto=jefe)
+                          for id_proyecto, jefe in libres.items()]
+            resultado['actualizados'] += _aplicar_en_bloque(
+                Proyecto, instancias, [Proyecto.id_jefe_proyecto], fallidos)
+            for id_proyecto, jefe in libres.items():
+                del pendientes[id_proyecto]
+                if id_proyecto not in fallidos:
+                    ocupados.pop(proyectos[id_proyecto][0], None)
+                    ocupados[jefe] = id_proyecto
+
+        for id_proyecto, jefe in pendientes.items():
+            fallidos[id_proyecto] = f"El empleado {jefe} ya es jefe del proyecto {ocupados[jefe]}"
+
+        print(f"Jefes reasignados: {resultado['actualizados']} proyectos, "
+              f"{resultado['sin_cambios']} sin cambios, {len(fallidos)} fallidos.")
+
+    except Exception as e:
+        print(f"Error al reasignar los jefes de proyecto: {e}")
+    finally:
+        cerrar_bd()
+    return resultado
+
 # --- 4. Eliminar Clientes sin Proyectos ---
 def eliminar_clientes_sin_proyectos():
     """
     Elimina los clientes que no tengan ningún proyecto asociado,
     utilizando delete() y una subconsulta.
+    Devuelve los clientes eliminados, o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
 
     try:
-        subconsulta_clientes_con_proyectos = Proyecto.select(Proyecto.id_cliente).distinct()
-
-        query = Cliente.delete().where(
-            Cliente.dni_cif.not_in(subconsulta_clientes_con_proyectos)
+        # Anti-join con NOT EXISTS correlacionado: cada cliente se comprueba
+        # con una búsqueda por índice en proyectos, en lugar de un NOT IN
+        # sobre todos los clientes con proyectos, que MySQL optimiza mal
+        proyectos_del_cliente = Proyecto.select(SQL('1')).where(
+            Proyecto.id_cliente == Cliente.dni_cif
+        )
+        # Los proyectos archivados también cuentan (y su FK impediría el borrado)
+        archivados_del_cliente = ProyectoArchivado.select(SQL('1')).where(
+            ProyectoArchivado.id_cliente == Cliente.dni_cif
         )
 
+        query = Cliente.delete().where(~fn.EXISTS(proyectos_del_cliente) &
+                                       ~fn.EXISTS(archivados_del_cliente))
+
         filas_eliminadas = query.execute()
 
         print(f"Se eliminaron {filas_eliminadas} clientes que no tenían proyectos asociados.")
+        return filas_eliminadas
 
     except Exception as e:
         print(f"Error al eliminar clientes sin proyectos: {e}")
@@ -124,22 +382,29 @@ def eliminar_proyectos_antiguos_baratos():
     """
     Elimina proyectos cuyo presupuesto sea < 10,000 Y
     cuya fecha de finalización ya haya pasado.
-    Utiliza delete() y una consulta condicional where().
+    Utiliza delete() y una consulta condicional where(); las asignaciones
+    de esos proyectos se borran antes, en la misma transacción (su FK
+    impediría borrar los proyectos).
+    Devuelve las filas eliminadas (asignaciones y proyectos), o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
         
     try:
-        fecha_actual = datetime.date.today()
+        condicion = condicion_antiguos_baratos(datetime.date.today())
+        proyectos_antiguos_baratos = Proyecto.select(Proyecto.id_proyecto).where(condicion)
 
-        presupuesto_bajo = Proyecto.presupuesto < 10000
-        fecha_pasada = Proyecto.fecha_fin < fecha_actual
-        condicion = presupuesto_bajo & fecha_pasada
-        
-        query = Proyecto.delete().where(condicion) 
-        filas_eliminadas = query.execute()
+        with db.atomic():
+            asignaciones_eliminadas = EmpleadoProyecto.delete().where(
+                EmpleadoProyecto.id_proyecto.in_(proyectos_antiguos_baratos)
+            ).execute()
+
+            query = Proyecto.delete().where(condicion) 
+            filas_eliminadas = query.execute()
         
-        print(f"Se eliminaron {filas_eliminadas} proyectos antiguos y con bajo presupuesto.")
+        print(f"Se eliminaron {filas_eliminadas} proyectos antiguos y con bajo presupuesto "
+              f"({asignaciones_eliminadas} asignaciones de empleados).")
+        return asignaciones_eliminadas + filas_eliminadas
 
     except Exception as e:
         print(f"Error al eliminar los proyectos: {e}")
@@ -151,43 +416,51 @@ def transaccion_limpieza_proyectos(id_proyecto_destino):
     """
     Realiza una transacción para:
     1. Reasignar empleados de proyectos obsoletos (terminados hace >5 años) 
-       a un nuevo proyecto activo.
+       a un nuevo proyecto activo. Un empleado que ya estaba en el destino
+       (o en varios proyectos obsoletos) queda asignado una sola vez.
     2. Eliminar esos proyectos obsoletos.
+    Devuelve las filas afectadas (asignaciones movidas y retiradas y
+    proyectos eliminados), o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
 
     try:
         # 1. Verificar que el proyecto destino existe
-        proyecto_destino = Proyecto.get_or_none(Proyecto.id_proyecto == id_proyecto_destino)
+        proyecto_destino = por_clave(Proyecto, id_proyecto_destino)
         if not proyecto_destino:
             print(f"Error: El proyecto destino con ID {id_proyecto_destino} no existe.")
-            return
+            return None
 
-        # 2. Calcular la fecha límite
-        fecha_limite = fn.NOW() - SQL('INTERVAL 5 YEAR')
+        # 2. Calcular la fecha límite (se calcula en Python para que
+        #    funcione igual en MySQL y en SQLite)
+        fecha_limite = restar_anios(datetime.date.today(), 5)
 
         # 3. Subconsulta: Obtener los IDs de los proyectos obsoletos
-        fecha_fin_antigua = Proyecto.fecha_fin < fecha_limite
-        fecha_fin_definida = Proyecto.fecha_fin.is_null(False)
+        # (el destino nunca se elimina, aunque esté obsoleto)
         subconsulta_proyectos_obsoletos = Proyecto.select(Proyecto.id_proyecto).where(
-            fecha_fin_antigua & fecha_fin_definida
+            condicion_obsoletos(fecha_limite) & (Proyecto.id_proyecto != proyecto_destino.id_proyecto)
         )
 
         # 4. Iniciar la transacción
         with db.atomic():
             print("Iniciando transacción...")
             
-            # --- Paso 1: Actualizar asignaciones de empleados ---
-            # Busca en EmpleadoProyecto las asignaciones a proyectos obsoletos
-            # y les asigna el nuevo id_proyecto_destino.
-            query_update = EmpleadoProyecto.update(
-                id_proyecto=proyecto_destino
-            ).where(
-                EmpleadoProyecto.id_proyecto.in_(subconsulta_proyectos_obsoletos)
-            )
-            empleados_reasignados = query_update.execute()
-            print(f"[Transacción] {empleados_reasignados} asignaciones de empleados actualizadas.")
+            # --- Paso 1: Pasar las asignaciones de empleados al destino ---
+            # Los empleados de los proyectos obsoletos se asignan al
+            # proyecto destino (sin duplicar los que ya están en él) y
+            # después se quitan sus asignaciones a los proyectos obsoletos.
+            asignaciones_obsoletas = EmpleadoProyecto.id_proyecto.in_(subconsulta_proyectos_obsoletos)
+            empleados_reasignados = con_upsert(EmpleadoProyecto.insert_from(
+                EmpleadoProyecto
+                .select(EmpleadoProyecto.id_empleado, Value(proyecto_destino.id_proyecto))
+                .where(asignaciones_obsoletas)
+                .distinct(),
+                [EmpleadoProyecto.id_empleado, EmpleadoProyecto.id_proyecto]
+            ), IGNORAR).as_rowcount().execute()
+            asignaciones_retiradas = EmpleadoProyecto.delete().where(asignaciones_obsoletas).execute()
+            print(f"[Transacción] {empleados_reasignados} empleados reasignados al proyecto destino, "
+                  f"{asignaciones_retiradas} asignaciones a proyectos obsoletos retiradas.")
 
             # --- Paso 2: Eliminar los proyectos obsoletos ---
             query_delete = Proyecto.delete().where(
@@ -197,6 +470,7 @@ def transaccion_limpieza_proyectos(id_proyecto_destino):
             print(f"[Transacción] {proyectos_eliminados} proyectos obsoletos eliminados.")
 
         print("Transacción completada exitosamente.")
+        return empleados_reasignados + asignaciones_retiradas + proyectos_eliminados
 
     except IntegrityError as e:
         # Esto podría pasar si un empleado reasignado ya estaba en el proyecto destino
@@ -212,44 +486,39 @@ def eliminar_cliente_y_proyectos(dni_cif):
     Elimina un cliente y todos sus datos asociados, incluidos 
     los proyectos que tuviera encargados.
     (Requiere borrado manual en cascada si no está en la BD).
+    Devuelve las filas eliminadas en total, o None si falla.
     """
     if not conectar_bd():
-        return
+        return None
 
     try:
         # 1. Buscar al cliente
-        cliente_a_borrar = Cliente.get_or_none(Cliente.dni_cif == dni_cif)
+        cliente_a_borrar = obtener_cliente(dni_cif)
         
         if not cliente_a_borrar:
             print(f"Error: No se encontró al cliente {dni_cif}.")
-            return
+            return None
         
         print(f"Iniciando borrado en cascada para el cliente: {cliente_a_borrar.nombre_cliente}...")
 
         with db.atomic():
-            proyectos_del_cliente = Proyecto.select(Proyecto.id_proyecto).where(
-                Proyecto.id_cliente == cliente_a_borrar
-            )
-
-            q_delete_asig = EmpleadoProyecto.delete().where(
-                EmpleadoProyecto.id_proyecto.in_(proyectos_del_cliente)
-            )
-            asignaciones_borradas = q_delete_asig.execute()
+            asignaciones_borradas = borrar_asignaciones_de_cliente.ejecutar(cliente_a_borrar.dni_cif)
             print(f"[Transacción] {asignaciones_borradas} asignaciones de empleados eliminadas.")
 
-            q_delete_proy = Proyecto.delete().where(
-                Proyecto.id_cliente == cliente_a_borrar
-            )
-            proyectos_borrados = q_delete_proy.execute()
+            proyectos_borrados = borrar_proyectos_de_cliente.ejecutar(cliente_a_borrar.dni_cif)
             print(f"[Transacción] {proyectos_borrados} proyectos eliminados.")
 
-            q_delete_cli = Cliente.delete().where(
-                Cliente.dni_cif == cliente_a_borrar.dni_cif
-            )
-            clientes_borrados = q_delete_cli.execute()
+            asignaciones_archivadas_borradas = borrar_asignaciones_archivadas_de_cliente.ejecutar(cliente_a_borrar.dni_cif)
+            archivados_borrados = borrar_proyectos_archivados_de_cliente.ejecutar(cliente_a_borrar.dni_cif)
+            if archivados_borrados:
+                print(f"[Transacción] {archivados_borrados} proyectos archivados eliminados.")
+
+            clientes_borrados = borrar_cliente.ejecutar(cliente_a_borrar.dni_cif)
             print(f"[Transacción] {clientes_borrados} cliente eliminado.")
         
         print(f"Cliente {dni_cif} y todos sus datos asociados fueron eliminados.")
+        return (asignaciones_borradas + proyectos_borrados + asignaciones_archivadas_borradas
+                + archivados_borrados + clientes_borrados)
 
     except IntegrityError as e:
         print(f"Error de integridad. No se pudieron borrar todos los datos. Rollback realizado. {e}")
@@ -258,6 +527,47 @@ def eliminar_cliente_y_proyectos(dni_cif):
     finally:
         cerrar_bd()
 
+# --- Operaciones con argumentos de ejemplo ---
+def operaciones_escritura():
+    """
+    Operaciones de este módulo con argumentos válidos para los datos
+    generados, del menos al más destructivo (las usan benchmarks.py y
+    comprobar_indices.py). Ejecutadas en este orden sobre datos recién
+    generados, todas terminan bien y devuelven un número de filas > 0.
+    """
+    with sesion():
+        cliente = Cliente.select(Cliente.dni_cif).order_by(Cliente.dni_cif).scalar()
+        proyecto = Proyecto.select(fn.MAX(Proyecto.id_proyecto)).scalar()
+        # Un jefe que no dirige ningún proyecto (el generador deja un 5% libre)
+        jefe_libre = (Empleado
+                      .select(Empleado.dni)
+                      .join(Proyecto, JOIN.LEFT_OUTER, on=(Proyecto.id_jefe_proyecto == Empleado.dni))
+                      .where(Empleado.jefe == True, Proyecto.id_proyecto.is_null())
+                      .limit(1)
+                      .scalar())
+        destino = (Proyecto
+                   .select(Proyecto.id_proyecto)
+                   .where(Proyecto.fecha_fin.is_null())
+                   .order_by(Proyecto.id_proyecto)
+                   .limit(1)
+                   .scalar())
+        # El cliente con más proyectos: el peor caso del borrado en cascada
+        cliente_grande = (Proyecto
+                          .select(Proyecto.id_cliente)
+                          .group_by(Proyecto.id_cliente)
+                          .order_by(fn.COUNT(SQL('*')).desc())
+                          .limit(1)
+                          .scalar())
+
+    return [
+        ('actualizar_telefono_cliente', actualizar_telefono_cliente, (cliente, '600000000')),
+        ('aumentar_presupuesto_proyectos_activos', aumentar_presupuesto_proyectos_activos, ()),
+        ('reasignar_jefe_proyecto', reasignar_jefe_proyecto, (proyecto, jefe_libre)),
+        ('eliminar_clientes_sin_proyectos', eliminar_clientes_sin_proyectos, ()),
+        ('eliminar_proyectos_antiguos_baratos', eliminar_proyectos_antiguos_baratos, ()),
+        ('transaccion_limpieza_proyectos', transaccion_limpieza_proyectos, (destino,)),
+        ('eliminar_cliente_y_proyectos', eliminar_cliente_y_proyectos, (cliente_grande,)),
+    ]
 
 if __name__ == '__main__':
     
@@ -0,0 +1,240 @@
+import argparse
+import time
+from collections import namedtuple
+from decimal import Decimal
+import numpy as np
+from conexion import bd_lectura, sesion
+from crear_tablas import Cliente, Proyecto, EmpleadoProyecto
+import consultas
+
+# Analítica en columnas con NumPy para los informes 1, 3 y 5 (totales,
+# proyecto más caro y proyecto más largo de cada cliente) y el número de
+# empleados de cada proyecto. Se leen las tablas una vez en arrays:
+#   - presupuestos en céntimos (int64), así las sumas son exactas
+#   - fechas como datetime64[D] (NaT para fecha_fin nula)
+#   - el cliente de cada proyecto como código categórico (int32): la
+#     posición del cliente en el orden por dni_cif de los informes
+# y los agrupamientos se hacen ordenando por código una vez, sin bucles
+# de Python por fila. Los resultados son los de filas_consulta_1/3/5().
+
+CENTIMO = Decimal('0.01')
+
+FilaTotal = namedtuple('FilaTotal', 'nombre_cliente total')
+FilaMasCaro = namedtuple('FilaMasCaro', 'nombre_cliente titulo_proyecto presupuesto')
+FilaMasLargo = namedtuple('FilaMasLargo', 'nombre_cliente titulo_proyecto duracion num_empleados')
+
+class Columnas:
+    """
+    Tablas Cliente, Proyecto y EmpleadoProyecto en arrays de NumPy.
+    Los clientes van en el orden de los informes (por dni_cif) y los
+    proyectos por id_proyecto.
+    """
+    def __init__(self, dni_cif, nombres, ids, codigos_cliente, titulos,
+                 centimos, fecha_inicio, fecha_fin, empleados_por_proyecto):
+        self.dni_cif = dni_cif
+        self.nombres = nombres
+        self.ids = ids
+        self.codigos_cliente = codigos_cliente
+        self.titulos = titulos
+        self.centimos = centimos
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.empleados_por_proyecto = empleados_por_proyecto
+
+    @property
+    def num_clientes(self):
+        return len(self.dni_cif)
+
+    @property
+    def num_proyectos(self):
+        return len(self.ids)
+
+def _filas(consulta):
+    # Valores tal cual los da el driver, sin convertirlos a Decimal/date
+    # objeto a objeto: la conversión se hace luego en bloque con NumPy
+    return bd_lectura().execute(consulta).fetchall()
+
+def _columnas(filas, num_columnas):
+    # Filas -> un array de objetos por columna
+    if not filas:
+        return [np.array([], dtype=object) for _ in range(num_columnas)]
+    return [np.array(columna, dtype=object) for columna in zip(*filas)]
+
+def cargar_columnas():
+    """
+    Lee las tres tablas (una consulta por tabla) y devuelve sus Columnas.
+    """
+    with sesion():
+        clientes = _filas(Cliente
+                          .select(Cliente.dni_cif, Cliente.nombre_cliente)
+                          .order_by(Cliente.dni_cif))
+        proyectos = _filas(Proyecto
+                           .select(Proyecto.id_proyecto, Proyecto.id_cliente, Proyecto.titulo_proyecto,
+                                   Proyecto.presupuesto, Proyecto.fecha_inicio, Proyecto.fecha_fin)
+                           .order_by(Proyecto.id_proyecto))
+        asignaciones = _filas(EmpleadoProyecto.select(EmpleadoProyecto.id_proyecto))
+
+    dni_cif, nombres = _columnas(clientes, 2)
+    ids, id_clientes, titulos, presupuestos, inicios, fines = _columnas(proyectos, 6)
+    del proyectos
+
+    # Código categórico: posición del cliente en el orden del informe
+    por_clave = np.argsort(dni_cif)
+    codigos_cliente = por_clave[np.searchsorted(dni_cif[por_clave], id_clientes)].astype(np.int32)
+
+    # presupuesto es DECIMAL(10,2): como float tiene precisión de sobra para
+    # que redondear a céntimos dé el valor exacto (SQLite ya lo guarda así)
+    centimos = np.rint(presupuestos.astype(np.float64) * 100).astype(np.int64)
+
+    ids = ids.astype(np.int64)
+    # Asignaciones por proyecto: posición de cada proyecto en 'ids' (ordenado)
+    id_asignaciones = np.array([id_proyecto for id_proyecto, in asignaciones], dtype=np.int64)
+    empleados_por_proyecto = np.bincount(np.searchsorted(ids, id_asignaciones), minlength=len(ids))
+
+    return Columnas(
+        dni_cif=dni_cif,
+        nombres=nombres,
+        ids=ids,
+        codigos_cliente=codigos_cliente,
+        titulos=titulos,
+        centimos=centimos,
+        # Fechas ISO (SQLite) o datetime.date (MySQL); None pasa a NaT
+        fecha_inicio=inicios.astype('datetime64[D]'),
+        fecha_fin=fines.astype('datetime64[D]'),
+        empleados_por_proyecto=empleados_por_proyecto,
+    )
+
+# --- Agrupamientos por cliente ---
+def _primero_por_cliente(columnas, orden):
+    """
+    'orden' son posiciones de proyectos ordenadas por código de cliente
+    (y dentro de cada cliente por el criterio del informe). Devuelve, por
+    cliente, la posición del primer proyecto de su grupo o -1 si no tiene.
+    """
+    codigos = columnas.codigos_cliente[orden]
+    clientes = np.arange(columnas.num_clientes)
+    inicio = np.searchsorted(codigos, clientes, side='left')
+    fin = np.searchsorted(codigos, clientes, side='right')
+    elegido = np.full(columnas.num_clientes, -1, dtype=np.int64)
+    tiene = fin > inicio
+    elegido[tiene] = orden[inicio[tiene]]
+    return elegido
+
+def totales_por_cliente(columnas):
+    """
+    Presupuesto total de cada cliente en céntimos (int64, 0 sin proyectos).
+    """
+    orden = np.argsort(columnas.codigos_cliente, kind='stable')
+    acumulado = np.concatenate(([0], np.cumsum(columnas.centimos[orden], dtype=np.int64)))
+    limites = np.searchsorted(columnas.codigos_cliente[orden], np.arange(columnas.num_clientes + 1))
+    return acumulado[limites[1:]] - acumulado[limites[:-1]]
+
+def mas_caro_por_cliente(columnas):
+    """
+    Posición del proyecto de mayor presupuesto de cada cliente (a igualdad,
+    el de menor id) o -1 si no tiene proyectos.
+    """
+    orden = np.lexsort((columnas.ids, -columnas.centimos, columnas.codigos_cliente))
+    return _primero_por_cliente(columnas, orden)
+
+def duraciones(columnas):
+    """
+    (días de cada proyecto, máscara de los que tienen ambas fechas y
+    duración no negativa).
+    """
+    validos = ~np.isnat(columnas.fecha_inicio) & ~np.isnat(columnas.fecha_fin)
+    dias = np.zeros(columnas.num_proyectos, dtype=np.int64)
+    dias[validos] = (columnas.fecha_fin[validos] - columnas.fecha_inicio[validos]).astype(np.int64)
+    return dias, validos & (dias >= 0)
+
+def mas_largo_por_cliente(columnas):
+    """
+    Posición del proyecto más largo de cada cliente (a igualdad, el de menor
+    id) entre los que tienen fechas válidas, o -1 si no tiene ninguno.
+    """
+    dias, validos = duraciones(columnas)
+    candidatos = np.flatnonzero(validos)
+    orden = candidatos[np.lexsort((columnas.ids[candidatos], -dias[candidatos],
+                                   columnas.codigos_cliente[candidatos]))]
+    return _primero_por_cliente(columnas, orden)
+
+# --- Filas con el formato de los informes ---
+def _euros(centimos):
+    return Decimal(int(centimos)).scaleb(-2)
+
+def filas_consulta_1(columnas):
+    totales = totales_por_cliente(columnas)
+    for nombre, total in zip(columnas.nombres, totales):
+        yield FilaTotal(nombre, _euros(total))
+
+def filas_consulta_3(columnas):
+    for nombre, posicion in zip(columnas.nombres, mas_caro_por_cliente(columnas)):
+        if posicion < 0:
+            yield FilaMasCaro(nombre, None, None)
+        else:
+            yield FilaMasCaro(nombre, columnas.titulos[posicion], _euros(columnas.centimos[posicion]))
+
+def filas_consulta_5(columnas):
+    dias, _ = duraciones(columnas)
+    for nombre, posicion in zip(columnas.nombres, mas_largo_por_cliente(columnas)):
+        if posicion < 0:
+            yield FilaMasLargo(nombre, None, None, 0)
+        else:
+            yield FilaMasLargo(nombre, columnas.titulos[posicion], int(dias[posicion]),
+                               int(columnas.empleados_por_proyecto[posicion]))
+
+INFORMES = {
+    1: filas_consulta_1,
+    3: filas_consulta_3,
+    5: filas_consulta_5,
+}
+
+# --- Comprobación frente a SQL ---
+def normalizar_fila(fila):
+    # Importes a céntimos exactos: SQLite devuelve las sumas como int o float
+    return tuple(Decimal(str(valor)).quantize(CENTIMO) if isinstance(valor, (float, Decimal)) else valor
+                 for valor in fila)
+
+def comprobar(columnas=None, numeros=None):
+    """
+    Compara cada informe calculado en columnas con su versión SQL
+    (consultas.filas_consulta_N). Devuelve {numero: [diferencias]} con
+    como mucho 10 pares (sql, numpy) por informe; vacío si coinciden.
+    """
+    if columnas is None:
+        columnas = cargar_columnas()
+    diferencias = {}
+    for numero in numeros or sorted(INFORMES):
+        sql = [normalizar_fila(fila) for fila in consultas.INFORMES[numero]()]
+        calculadas = [normalizar_fila(fila) for fila in INFORMES[numero](columnas)]
+        distintas = [(a, b) for a, b in zip(sql, calculadas) if a != b]
+        if len(sql) != len(calculadas):
+            distintas.append((f'{len(sql)} filas', f'{len(calculadas)} filas'))
+        if distintas:
+            diferencias[numero] = distintas[:10]
+    return diferencias
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Informes 1, 3 y 5 calculados en columnas con NumPy')
+    parser.add_argument('--comprobar', action='store_true', help='Comparar con los informes SQL')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    columnas = cargar_columnas()
+    carga = time.perf_counter() - inicio
+    print(f"Cargados {columnas.num_clientes} clientes y {columnas.num_proyectos} proyectos en {carga:.2f} s")
+
+    for numero, funcion in INFORMES.items():
+        inicio = time.perf_counter()
+        filas = list(funcion(columnas))
+        print(f"Informe {numero}: {len(filas)} filas en {time.perf_counter() - inicio:.3f} s")
+
+    if args.comprobar:
+        diferencias = comprobar(columnas)
+        for numero, distintas in diferencias.items():
+            print(f"Informe {numero}: {len(distintas)} diferencias, por ejemplo:")
+            for sql, calculada in distintas[:3]:
+                print(f"  SQL:   {sql}\n  NumPy: {calculada}")
+        if diferencias:
+            raise SystemExit(1)
+        print("Los informes coinciden con la versión SQL.")
@@ -0,0 +1,196 @@
+import argparse
+import datetime
+import time
+from peewee import *
+import conexion
+from conexion import db, sesion
+from crear_tablas import Proyecto, EmpleadoProyecto, ProyectoArchivado, EmpleadoProyectoArchivado
+from actualizacion_borrado import condicion_finalizados
+
+# Archivo de proyectos finalizados: los proyectos con fecha_fin pasada se
+# mueven por lotes, con sus asignaciones, de proyectos/empleados_proyecto
+# a proyectos_archivados/empleados_proyecto_archivados. Cada lote va en
+# una transacción (copiar al archivo y borrar de la tabla caliente), así
+# que un proyecto nunca está en las dos tablas ni en ninguna, y las FK del
+# archivo (cliente, jefe, empleados, proyecto archivado) se mantienen.
+# Si el proceso se interrumpe basta con volver a lanzarlo: lo ya archivado
+# ya no está en la tabla caliente.
+#
+# Las tablas calientes quedan con el trabajo en curso; los informes de
+# consultas.py pueden leer solo ellas o también el archivo (UNION ALL).
+# El resumen por cliente (resumen_clientes.py) cubre solo la tabla caliente.
+
+TAMANO_LOTE = 1000
+PAUSA = 0.0     # Segundos de espera entre lotes
+
+# Columnas de Proyecto y de EmpleadoProyecto, en el orden de sus tablas de archivo
+CAMPOS_PROYECTO = [(getattr(Proyecto, campo.name), campo) for campo in ProyectoArchivado._meta.sorted_fields]
+CAMPOS_ASIGNACION = [(getattr(EmpleadoProyecto, campo.name), campo)
+                     for campo in EmpleadoProyectoArchivado._meta.sorted_fields]
+
+# --- Contador de ids ---
+def _tabla_autoincrement():
+    # Solo SQLite: las tablas creadas antes de AutoFieldMonotono no tienen
+    # AUTOINCREMENT y reutilizan el id más alto si se borra
+    ddl = db.execute_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                         (Proyecto._meta.table_name,)).fetchone()
+    return ddl is not None and 'AUTOINCREMENT' in ddl[0].upper()
+
+def ajustar_contador_ids():
+    """
+    Sube el contador de id_proyecto por encima de todos los ids usados,
+    también de los que solo quedan en el archivo, para que la BD no dé a un
+    proyecto nuevo el id de uno archivado. Hace falta tras cargar las
+    tablas con ids explícitos (p. ej. snapshot.restaurar()).
+    """
+    tabla = Proyecto._meta.table_name
+    maximo = max(Proyecto.select(fn.MAX(Proyecto.id_proyecto)).scalar() or 0,
+                 ProyectoArchivado.select(fn.MAX(ProyectoArchivado.id_proyecto)).scalar() or 0)
+    if conexion.BACKEND == 'mysql':
+        # MySQL ignora un valor por debajo del máximo de la tabla
+        db.execute_sql(f'ALTER TABLE `{tabla}` AUTO_INCREMENT = {maximo + 1}')
+        return
+    if not _tabla_autoincrement():
+        return
+    actual = db.execute_sql('SELECT seq FROM sqlite_sequence WHERE name = ?', (tabla,)).fetchone()
+    if actual is None:
+        db.execute_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (tabla, maximo))
+    elif actual[0] < maximo:
+        db.execute_sql('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (maximo, tabla))
+
+# --- Archivar ---
+def _ids_lote(condicion, ultimo_id, tamano_lote):
+    consulta = (Proyecto
+                .select(Proyecto.id_proyecto)
+                .where(condicion & (Proyecto.id_proyecto > ultimo_id))
+                .order_by(Proyecto.id_proyecto)
+                .limit(tamano_lote))
+    if conexion.BACKEND == 'mysql':
+        # Bloquea los proyectos del lote hasta el final de su transacción
+        consulta = consulta.for_update()
+    return [id_proyecto for id_proyecto, in consulta.tuples()]
+
+def _archivar_lote(lote):
+    proyectos = Proyecto.id_proyecto.in_(lote)
+    asignaciones = EmpleadoProyecto.id_proyecto.in_(lote)
+    # Primero los padres: las asignaciones archivadas apuntan al proyecto archivado
+    ProyectoArchivado.insert_from(
+        Proyecto.select(*(caliente for caliente, _ in CAMPOS_PROYECTO)).where(proyectos),
+        [archivado for _, archivado in CAMPOS_PROYECTO]).execute()
+    movidas = (EmpleadoProyectoArchivado
+               .insert_from(EmpleadoProyecto
+                            .select(*(caliente for caliente, _ in CAMPOS_ASIGNACION))
+                            .where(asignaciones),
+                            [archivado for _, archivado in CAMPOS_ASIGNACION])
+               .as_rowcount()
+               .execute())
+    EmpleadoProyecto.delete().where(asignaciones).execute()
+    return Proyecto.delete().where(proyectos).execute(), movidas
+
+def archivar_finalizados(fecha=None, tamano_lote=TAMANO_LOTE, pausa=PAUSA, simulacion=False, progreso=True):
+    """
+    Mueve al archivo los proyectos finalizados a 'fecha' (por defecto hoy)
+    y sus asignaciones, por lotes de 'tamano_lote' proyectos recorridos por
+    id, cada lote en su transacción. Devuelve {'lotes', 'proyectos',
+    'asignaciones'} con lo archivado (o lo que se archivaría si simulacion).
+    """
+    fecha = fecha or datetime.date.today()
+    estado = {'lotes': 0, 'proyectos': 0, 'asignaciones': 0}
+
+    with sesion():
+        if conexion.BACKEND == 'sqlite' and not _tabla_autoincrement():
+            raise ValueError(f"La tabla {Proyecto._meta.table_name} no tiene AUTOINCREMENT: SQLite "
+                             "podría dar a un proyecto nuevo el id de uno archivado. Hay que "
+                             "recrearla (p. ej. exportar y restaurar una instantánea con snapshot.py)")
+        condicion = condicion_finalizados(fecha)
+
+        if simulacion:
+            pendientes = Proyecto.select(Proyecto.id_proyecto).where(condicion)
+            estado['proyectos'] = pendientes.count()
+            estado['asignaciones'] = (EmpleadoProyecto.select()
+                                      .where(EmpleadoProyecto.id_proyecto.in_(pendientes))
+                                      .count())
+            print(f"[archivo] Simulación: se archivarían {estado['proyectos']} proyectos "
+                  f"con {estado['asignaciones']} asignaciones (finalizados a {fecha}).")
+            return estado
+
+        # Los ids archivados salen de la tabla caliente: el contador tiene
+        # que quedar por encima de ellos
+        ajustar_contador_ids()
+        inicio = time.perf_counter()
+        ultimo_id = 0
+        while True:
+            with db.atomic():
+                lote = _ids_lote(condicion, ultimo_id, tamano_lote)
+                if not lote:
+                    break
+                proyectos, asignaciones = _archivar_lote(lote)
+            estado['proyectos'] += proyectos
+            estado['asignaciones'] += asignaciones
+            estado['lotes'] += 1
+            ultimo_id = lote[-1]
+            if progreso:
+                print(f"[archivo] Lote {estado['lotes']}: {estado['proyectos']} proyectos archivados "
+                      f"hasta el id {ultimo_id} ({time.perf_counter() - inicio:.1f} s)")
+            if pausa:
+                time.sleep(pausa)
+
+    print(f"[archivo] {estado['proyectos']} proyectos y {estado['asignaciones']} asignaciones archivados.")
+    return estado
+
+# --- Lectura: solo la tabla caliente o también el archivo ---
+def fuente_proyectos(con_archivo=False):
+    """
+    (fuente, columnas) de los proyectos para montar una consulta: sin
+    archivo, el modelo Proyecto (columnas = Proyecto.campo); con archivo,
+    la UNION ALL de las dos tablas como subconsulta (columnas = fuente.c).
+    """
+    if not con_archivo:
+        return Proyecto, Proyecto
+    fuente = (Proyecto.select(*(caliente for caliente, _ in CAMPOS_PROYECTO)) +
+              ProyectoArchivado.select(*(archivado for _, archivado in CAMPOS_PROYECTO))).alias('todos_proyectos')
+    return fuente, fuente.c
+
+def fuente_asignaciones(con_archivo=False):
+    """
+    Igual que fuente_proyectos() para EmpleadoProyecto.
+    """
+    if not con_archivo:
+        return EmpleadoProyecto, EmpleadoProyecto
+    fuente = (EmpleadoProyecto.select(*(caliente for caliente, _ in CAMPOS_ASIGNACION)) +
+              EmpleadoProyectoArchivado.select(*(archivado for _, archivado in CAMPOS_ASIGNACION))
+              ).alias('todas_asignaciones')
+    return fuente, fuente.c
+
+def seleccionar(fuente, *columnas):
+    """
+    SELECT de 'columnas' sobre una fuente de fuente_proyectos() o
+    fuente_asignaciones().
+    """
+    if isinstance(fuente, type) and issubclass(fuente, Model):
+        return fuente.select(*columnas)
+    return fuente.select_from(*columnas)
+
+def filas_por_tabla():
+    with sesion():
+        return {modelo._meta.table_name: modelo.select().count()
+                for modelo in (Proyecto, EmpleadoProyecto, ProyectoArchivado, EmpleadoProyectoArchivado)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archivo de proyectos finalizados')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_archivar = subparsers.add_parser('archivar', help='Mover al archivo los proyectos finalizados')
+    p_archivar.add_argument('--dias', type=int, default=0,
+                            help='Archivar solo los finalizados hace al menos estos días')
+    p_archivar.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Proyectos por lote/transacción')
+    p_archivar.add_argument('--pausa', type=float, default=PAUSA, help='Segundos de espera entre lotes')
+    p_archivar.add_argument('--simulacion', action='store_true', help='Solo contar lo que se archivaría')
+    subparsers.add_parser('estado', help='Filas en las tablas calientes y en el archivo')
+    args = parser.parse_args()
+
+    if args.comando == 'archivar':
+        fecha = datetime.date.today() - datetime.timedelta(days=args.dias)
+        archivar_finalizados(fecha, args.lote, args.pausa, args.simulacion)
+    else:
+        for tabla, filas in filas_por_tabla().items():
+            print(f"{tabla:<32} {filas:>10} filas")
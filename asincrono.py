@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from conexion import CONFIG, db, sesion
+from instrumentacion import operacion
+import consultas
+import inserciones
+import actualizacion_borrado
+
+# Fachada asyncio sobre las operaciones de consultas.py, inserciones.py y
+# actualizacion_borrado.py. Cada llamada se ejecuta en un pool acotado de
+# hilos; cada hilo toma su propia conexión (del pool de MySQL, o una
+# conexión SQLite propia) la primera vez que la necesita y la conserva
+# hasta cerrar el ejecutor. El bucle de eventos nunca se bloquea.
+#
+# Contrapresión: como mucho hay 'max_pendientes' llamadas en vuelo (en
+# ejecución o en cola); las siguientes esperan en el 'await' hasta que
+# termine alguna, en lugar de acumularse sin límite en la cola del pool.
+#
+# Las operaciones de inserciones.py y actualizacion_borrado.py siguen
+# imprimiendo sus mensajes; los informes devuelven sus filas (namedtuples)
+# en lugar de imprimirlas.
+
+# No conviene tener más hilos que conexiones en el pool de MySQL
+MAX_HILOS = min(8, int(CONFIG['max_conexiones']))
+
+class EjecutorAsincrono:
+    """
+    Ejecuta funciones bloqueantes de acceso a datos en un pool de hilos,
+    cada una dentro de una sesión sobre la conexión de su hilo.
+    Se puede usar con 'async with EjecutorAsincrono() as ejecutor:'.
+    """
+    def __init__(self, max_hilos=MAX_HILOS, max_pendientes=None):
+        self.max_hilos = max_hilos
+        self.max_pendientes = max_pendientes or 2 * max_hilos
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos,
+                                        thread_name_prefix='empresa-bd')
+        # Un semáforo por bucle de eventos: un asyncio.Semaphore queda ligado
+        # al primer bucle que espera en él, y el ejecutor puede usarse desde
+        # varios (p. ej. en sucesivos asyncio.run())
+        self._semaforos = weakref.WeakKeyDictionary()
+        self._bloqueo = threading.Lock()
+
+    def _semaforo(self):
+        bucle = asyncio.get_running_loop()
+        with self._bloqueo:
+            semaforo = self._semaforos.get(bucle)
+            if semaforo is None:
+                semaforo = self._semaforos[bucle] = asyncio.Semaphore(self.max_pendientes)
+        return semaforo
+
+    def _en_hilo(self, funcion, args, kwargs, transaccion):
+        # La conexión abierta aquí se queda en el hilo: la sesión no la cierra
+        db.connect(reuse_if_open=True)
+        with sesion(transaccion=transaccion):
+            return funcion(*args, **kwargs)
+
+    async def ejecutar(self, funcion, *args, transaccion=False, **kwargs):
+        """
+        Ejecuta funcion(*args, **kwargs) en el pool y devuelve su resultado.
+        Con transaccion=True toda la llamada va en una única transacción.
+        """
+        async with self._semaforo():
+            bucle = asyncio.get_running_loop()
+            return await bucle.run_in_executor(
+                self._pool, partial(self._en_hilo, funcion, args, kwargs, transaccion))
+
+    async def informe(self, numero):
+        """
+        Devuelve la lista de filas del informe consulta_<numero>.
+        """
+        return await self.ejecutar(_filas_informe, numero)
+
+    def _cerrar_conexiones(self):
+        # Una tarea por hilo: la barrera impide que un mismo hilo coja dos
+        barrera = threading.Barrier(self.max_hilos)
+
+        def cerrar_conexion_del_hilo():
+            if not db.is_closed():
+                db.close()
+            barrera.wait()
+
+        for tarea in [self._pool.submit(cerrar_conexion_del_hilo) for _ in range(self.max_hilos)]:
+            tarea.result()
+
+    async def cerrar(self):
+        """
+        Devuelve las conexiones de los hilos y detiene el pool.
+        """
+        bucle = asyncio.get_running_loop()
+        await bucle.run_in_executor(None, self._cerrar_conexiones)
+        self._pool.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+def _filas_informe(numero):
+    # Sin la atribución explícita la instrumentación no vería el informe
+    with operacion(f'consulta_{numero}'):
+        return list(consultas.INFORMES[numero]())
+
+# --- Ejecutor compartido y funciones asíncronas ---
+_ejecutor = None
+
+def ejecutor():
+    """
+    Ejecutor compartido por las funciones asíncronas de este módulo.
+    Se crea la primera vez que se usa y sirve para cualquier bucle de eventos.
+    """
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = EjecutorAsincrono()
+    return _ejecutor
+
+async def cerrar_ejecutor():
+    global _ejecutor
+    if _ejecutor is not None:
+        await _ejecutor.cerrar()
+        _ejecutor = None
+
+def _asincrona(funcion):
+    @wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        return await ejecutor().ejecutar(funcion, *args, **kwargs)
+    return envoltura
+
+async def informe(numero):
+    return await ejecutor().informe(numero)
+
+# inserciones.py
+insertar_clientes = _asincrona(inserciones.insertar_clientes)
+insertar_empleados = _asincrona(inserciones.insertar_empleados)
+insertar_proyecto = _asincrona(inserciones.insertar_proyecto)
+asignar_empleado_a_proyecto = _asincrona(inserciones.asignar_empleado_a_proyecto)
+insertar_proyectos_prueba = _asincrona(inserciones.insertar_proyectos_prueba)
+
+# actualizacion_borrado.py
+actualizar_telefono_cliente = _asincrona(actualizacion_borrado.actualizar_telefono_cliente)
+actualizar_telefonos_clientes = _asincrona(actualizacion_borrado.actualizar_telefonos_clientes)
+aumentar_presupuesto_proyectos_activos = _asincrona(actualizacion_borrado.aumentar_presupuesto_proyectos_activos)
+reasignar_jefe_proyecto = _asincrona(actualizacion_borrado.reasignar_jefe_proyecto)
+reasignar_jefes_proyectos = _asincrona(actualizacion_borrado.reasignar_jefes_proyectos)
+eliminar_clientes_sin_proyectos = _asincrona(actualizacion_borrado.eliminar_clientes_sin_proyectos)
+eliminar_proyectos_antiguos_baratos = _asincrona(actualizacion_borrado.eliminar_proyectos_antiguos_baratos)
+transaccion_limpieza_proyectos = _asincrona(actualizacion_borrado.transaccion_limpieza_proyectos)
+eliminar_cliente_y_proyectos = _asincrona(actualizacion_borrado.eliminar_cliente_y_proyectos)
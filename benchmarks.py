@@ -0,0 +1,529 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import time
+from peewee import *
+import conexion
+from conexion import sesion
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+from generador_datos import ESCALAS, SEMILLA, poblar
+import consultas
+import actualizacion_borrado
+from actualizacion_borrado import actualizar_telefono_cliente
+
+# Cliente temporal que usan los benchmarks que modifican datos
+CLIENTE_BENCHMARK = 'BENCH0001'
+
+def cronometrar(funcion, *args, **kwargs):
+    """
+    Ejecuta la función descartando lo que imprima y devuelve
+    (segundos transcurridos, resultado).
+    """
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+    return segundos, resultado
+
+@contextlib.contextmanager
+def cliente_temporal():
+    """
+    Crea el cliente de benchmark y lo borra al terminar.
+    """
+    with sesion():
+        Cliente.delete().where(Cliente.dni_cif == CLIENTE_BENCHMARK).execute()
+        Cliente.create(dni_cif=CLIENTE_BENCHMARK, nombre_cliente='Cliente Benchmark',
+                       tlf='000000000', email='benchmark@empresa.com')
+    try:
+        yield CLIENTE_BENCHMARK
+    finally:
+        with sesion():
+            Cliente.delete().where(Cliente.dni_cif == CLIENTE_BENCHMARK).execute()
+
+# --- Benchmark: sesión frente a conexión por llamada ---
+def benchmark_sesion(n=10000):
+    """
+    Compara n llamadas a actualizar_telefono_cliente abriendo y cerrando
+    la conexión en cada llamada (comportamiento de siempre) con las mismas
+    n llamadas dentro de una sesión, con y sin transacción compartida.
+    """
+    def actualizar_n():
+        for i in range(n):
+            actualizar_telefono_cliente(CLIENTE_BENCHMARK, f'{i:09d}')
+
+    def actualizar_n_en_sesion(transaccion):
+        with sesion(transaccion=transaccion):
+            actualizar_n()
+
+    print(f"\n--- Benchmark: {n} actualizaciones de teléfono ---")
+    resultados = {}
+    with cliente_temporal():
+        for nombre, funcion, args in [
+            ('por_llamada', actualizar_n, ()),
+            ('sesion', actualizar_n_en_sesion, (False,)),
+            ('sesion_transaccion', actualizar_n_en_sesion, (True,)),
+        ]:
+            segundos, _ = cronometrar(funcion, *args)
+            resultados[nombre] = segundos
+            print(f"{nombre:<20} {segundos:8.3f} s | {segundos / n * 1000:.3f} ms/llamada")
+    return resultados
+
+# --- Benchmark: informes concurrentes con la fachada asyncio ---
+def benchmark_asincrono(max_hilos=None):
+    """
+    Compara el tiempo total de los 5 informes ejecutados uno tras otro
+    con el de los 5 lanzados a la vez con asincrono.EjecutorAsincrono.
+    """
+    from asincrono import EjecutorAsincrono, MAX_HILOS
+
+    def en_serie():
+        with sesion():
+            return [list(consultas.INFORMES[numero]()) for numero in sorted(consultas.INFORMES)]
+
+    async def concurrentes():
+        async with EjecutorAsincrono(max_hilos or MAX_HILOS) as ejecutor:
+            return await asyncio.gather(*(ejecutor.informe(numero)
+                                          for numero in sorted(consultas.INFORMES)))
+
+    print("\n--- Benchmark: 5 informes en serie frente a concurrentes (asyncio) ---")
+    serie, filas_serie = cronometrar(en_serie)
+    concurrente, filas_concurrentes = cronometrar(asyncio.run, concurrentes())
+    assert filas_serie == filas_concurrentes, "Los informes concurrentes no coinciden con los de la serie"
+
+    print(f"{'serie':<20} {serie:8.3f} s")
+    print(f"{'concurrente':<20} {concurrente:8.3f} s | x{serie / concurrente:.2f}")
+    return {'serie': serie, 'concurrente': concurrente}
+
+# --- Benchmark: informes 1, 3 y 5 en SQL, fila a fila y con NumPy ---
+def _informes_fila_a_fila():
+    # Una pasada por los proyectos acumulando Decimal y fechas en diccionarios
+    with sesion():
+        clientes = list(Cliente.select(Cliente.dni_cif, Cliente.nombre_cliente)
+                        .order_by(Cliente.dni_cif).tuples())
+        empleados = {}
+        for id_proyecto, in EmpleadoProyecto.select(EmpleadoProyecto.id_proyecto).tuples().iterator():
+            empleados[id_proyecto] = empleados.get(id_proyecto, 0) + 1
+
+        totales, mas_caro, mas_largo = {}, {}, {}
+        for (id_proyecto, id_cliente, titulo, presupuesto, inicio, fin) in (Proyecto
+                .select(Proyecto.id_proyecto, Proyecto.id_cliente, Proyecto.titulo_proyecto,
+                        Proyecto.presupuesto, Proyecto.fecha_inicio, Proyecto.fecha_fin)
+                .order_by(Proyecto.id_proyecto).tuples().iterator()):
+            totales[id_cliente] = totales.get(id_cliente, 0) + presupuesto
+            # Por orden de id: a igualdad se queda el primero
+            if id_cliente not in mas_caro or presupuesto > mas_caro[id_cliente][1]:
+                mas_caro[id_cliente] = (titulo, presupuesto)
+            if inicio is not None and fin is not None and fin >= inicio:
+                dias = (fin - inicio).days
+                if id_cliente not in mas_largo or dias > mas_largo[id_cliente][1]:
+                    mas_largo[id_cliente] = (titulo, dias, empleados.get(id_proyecto, 0))
+
+    return {
+        1: [(nombre, totales.get(dni_cif, 0)) for dni_cif, nombre in clientes],
+        3: [(nombre, *mas_caro.get(dni_cif, (None, None))) for dni_cif, nombre in clientes],
+        5: [(nombre, *mas_largo.get(dni_cif, (None, None, 0))) for dni_cif, nombre in clientes],
+    }
+
+def benchmark_analitica():
+    """
+    Compara los informes 1, 3 y 5 calculados por la BD (consultas.py),
+    fila a fila en Python y en columnas con NumPy (analitica.py), y
+    comprueba que los tres dan las mismas filas.
+    """
+    import analitica
+
+    def sql():
+        with sesion():
+            return {numero: list(consultas.INFORMES[numero]()) for numero in analitica.INFORMES}
+
+    def numpy_calculo(columnas):
+        return {numero: list(funcion(columnas)) for numero, funcion in analitica.INFORMES.items()}
+
+    print("\n--- Benchmark: informes 1, 3 y 5 en SQL, fila a fila y con NumPy ---")
+    t_sql, filas_sql = cronometrar(sql)
+    t_filas, filas_python = cronometrar(_informes_fila_a_fila)
+    t_carga, columnas = cronometrar(analitica.cargar_columnas)
+    t_numpy, filas_numpy = cronometrar(numpy_calculo, columnas)
+
+    for numero in analitica.INFORMES:
+        esperadas = [analitica.normalizar_fila(fila) for fila in filas_sql[numero]]
+        assert esperadas == [analitica.normalizar_fila(fila) for fila in filas_python[numero]], \
+            f"Informe {numero}: la versión fila a fila no coincide con SQL"
+        assert esperadas == [analitica.normalizar_fila(fila) for fila in filas_numpy[numero]], \
+            f"Informe {numero}: la versión NumPy no coincide con SQL"
+
+    resultados = {'sql': t_sql, 'fila_a_fila': t_filas, 'numpy_carga': t_carga,
+                  'numpy_calculo': t_numpy, 'numpy': t_carga + t_numpy}
+    for nombre, segundos in resultados.items():
+        print(f"{nombre:<20} {segundos:8.3f} s")
+    return resultados
+
+# --- Benchmark: paginación por clave frente a OFFSET ---
+def benchmark_paginacion(tamano=20, orden='presupuesto', paginas=(1, 10, 100, 1000, 10000)):
+    """
+    Recorre el listado de proyectos entero con paginacion.paginar_proyectos
+    midiendo cada página, y compara el tiempo de las páginas indicadas con
+    el de pedir esas mismas páginas con LIMIT/OFFSET.
+    """
+    import paginacion
+
+    campos = paginacion.ORDENES_PROYECTOS[orden]
+    print(f"\n--- Benchmark: paginación de proyectos por {orden}, {tamano} filas por página ---")
+    tiempos, filas = {}, {}
+    with sesion():
+        cursor, numero = None, 0
+        while True:
+            numero += 1
+            segundos, pagina = cronometrar(paginacion.paginar_proyectos, cursor, tamano, orden)
+            if numero in paginas:
+                tiempos[numero], filas[numero] = segundos, pagina.filas
+            if pagina.siguiente is None:
+                break
+            cursor = pagina.siguiente
+
+        print(f"{numero} páginas recorridas\n{'página':>8} {'clave':>12} {'OFFSET':>12}")
+        resultados = {}
+        for numero in sorted(tiempos):
+            consulta = (paginacion.consulta_proyectos()
+                        .order_by(*campos)
+                        .limit(tamano)
+                        .offset((numero - 1) * tamano)
+                        .namedtuples())
+            segundos, por_offset = cronometrar(list, consulta)
+            assert por_offset == filas[numero], f"La página {numero} no coincide con OFFSET"
+            resultados[numero] = {'clave': tiempos[numero], 'offset': segundos}
+            print(f"{numero:>8} {tiempos[numero] * 1000:9.2f} ms {segundos * 1000:9.2f} ms")
+    return resultados
+
+# --- Benchmark: consultas con el SQL precompilado ---
+def benchmark_compiladas(n=10000):
+    """
+    Coste por llamada de construir la consulta y generar su SQL con peewee
+    frente a enlazar los valores en la plantilla compilada, para las
+    formas de consultas_compiladas; y n búsquedas por clave completas con
+    get_or_none() frente a por_clave().
+    """
+    from consultas_compiladas import plantilla_por_clave, por_clave
+
+    with sesion():
+        ids = [id_proyecto for id_proyecto, in Proyecto.select(Proyecto.id_proyecto).limit(n).tuples()]
+        dni_cif = Cliente.select(Cliente.dni_cif).limit(1).scalar()
+    if not ids or dni_cif is None:
+        print("La BD no tiene proyectos ni clientes")
+        return {}
+    hoy = datetime.date.today()
+    bd = conexion.db
+
+    formas = [
+        ('get_or_none(Proyecto)', plantilla_por_clave(Proyecto), ids[0],
+         lambda valor: Proyecto.select().where(Proyecto.id_proyecto == valor).limit(1)),
+        ('aumentar_presupuesto', actualizacion_borrado.aumentar_presupuesto_activos, hoy,
+         lambda valor: Proyecto.update(presupuesto=Proyecto.presupuesto * 1.10)
+                               .where(actualizacion_borrado.condicion_activos(valor))),
+        ('borrar_asignaciones', actualizacion_borrado.borrar_asignaciones_de_cliente, dni_cif,
+         lambda valor: EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto.in_(
+             Proyecto.select(Proyecto.id_proyecto).where(Proyecto.id_cliente == valor)))),
+        ('borrar_proyectos', actualizacion_borrado.borrar_proyectos_de_cliente, dni_cif,
+         lambda valor: Proyecto.delete().where(Proyecto.id_cliente == valor)),
+        ('borrar_cliente', actualizacion_borrado.borrar_cliente, dni_cif,
+         lambda valor: Cliente.delete().where(Cliente.dni_cif == valor)),
+    ]
+
+    print(f"\n--- Benchmark: SQL precompilado, {n} llamadas ---")
+    print(f"{'forma':<24} {'peewee':>10} {'plantilla':>10}  (µs/llamada)")
+    resultados = {}
+    for nombre, compilada, valor, construir in formas:
+        assert compilada.enlazar(bd, valor) == construir(valor).sql(), f"{nombre}: el SQL no coincide"
+        t_peewee, _ = cronometrar(lambda: [construir(valor).sql() for _ in range(n)])
+        t_plantilla, _ = cronometrar(lambda: [compilada.enlazar(bd, valor) for _ in range(n)])
+        resultados[nombre] = {'peewee': t_peewee / n, 'plantilla': t_plantilla / n}
+        print(f"{nombre:<24} {t_peewee / n * 1e6:10.1f} {t_plantilla / n * 1e6:10.1f}")
+
+    with sesion():
+        t_get, instancias = cronometrar(lambda: [Proyecto.get_or_none(Proyecto.id_proyecto == id_proyecto)
+                                                 for id_proyecto in ids])
+        t_clave, compiladas = cronometrar(lambda: [por_clave(Proyecto, id_proyecto) for id_proyecto in ids])
+    assert [p.__data__ for p in instancias] == [p.__data__ for p in compiladas]
+    resultados['busqueda_por_clave'] = {'peewee': t_get / len(ids), 'plantilla': t_clave / len(ids)}
+    print(f"{'búsqueda completa':<24} {t_get / len(ids) * 1e6:10.1f} {t_clave / len(ids) * 1e6:10.1f}"
+          f"  ({len(ids)} proyectos)")
+    return resultados
+
+# --- Benchmark: cola de escritura diferida de asignaciones ---
+@contextlib.contextmanager
+def proyectos_temporales(num_proyectos):
+    """
+    Crea 'num_proyectos' proyectos de benchmark (con un jefe temporal cada
+    uno) del cliente de benchmark y lo borra todo al terminar, asignaciones
+    incluidas.
+    """
+    jefes = [f'BENCHJ{numero:05d}' for numero in range(num_proyectos)]
+    with cliente_temporal() as cliente:
+        with sesion():
+            Empleado.insert_many([{'dni': dni, 'nombre': 'Jefe Benchmark', 'jefe': True,
+                                   'email': f'{dni.lower()}@benchmark.empresa.com'} for dni in jefes]).execute()
+            proyectos = [Proyecto.create(titulo_proyecto='Proyecto Benchmark', fecha_inicio=datetime.date.today(),
+                                         presupuesto=0, id_cliente=cliente, id_jefe_proyecto=dni).id_proyecto
+                         for dni in jefes]
+        try:
+            yield proyectos
+        finally:
+            with sesion():
+                EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto.in_(proyectos)).execute()
+                Proyecto.delete().where(Proyecto.id_proyecto.in_(proyectos)).execute()
+                Empleado.delete().where(Empleado.dni.in_(jefes)).execute()
+
+def benchmark_asignaciones(n=5000):
+    """
+    Escribe n asignaciones nuevas como asignar_empleado_a_proyecto (un
+    EmpleadoProyecto.create por llamada, con su conexión y su transacción)
+    y con cola_asignaciones.ColaAsignaciones (encolar todas y flush()).
+    """
+    from cola_asignaciones import ColaAsignaciones
+
+    with sesion():
+        empleados = [dni for dni, in Empleado.select(Empleado.dni).order_by(Empleado.dni).limit(n).tuples()]
+    if not empleados:
+        print("La BD no tiene empleados")
+        return {}
+
+    def por_llamada(asignaciones):
+        for id_empleado, id_proyecto in asignaciones:
+            if not conexion.conectar_bd():
+                return
+            try:
+                with conexion.db.atomic():
+                    EmpleadoProyecto.create(id_empleado=id_empleado, id_proyecto=id_proyecto)
+            finally:
+                conexion.cerrar_bd()
+
+    def con_cola(asignaciones):
+        with ColaAsignaciones() as cola:
+            cola.asignar_varias(asignaciones)
+            resultados = cola.flush()
+        return resultados
+
+    print(f"\n--- Benchmark: {n} asignaciones empleado-proyecto ---")
+    resultados = {}
+    with proyectos_temporales(-(-n // len(empleados))) as proyectos:
+        asignaciones = [(id_empleado, id_proyecto) for id_proyecto in proyectos for id_empleado in empleados][:n]
+        for nombre, funcion in [('por_llamada', por_llamada), ('cola', con_cola)]:
+            with sesion():
+                EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto.in_(proyectos)).execute()
+            segundos, _ = cronometrar(funcion, asignaciones)
+            with sesion():
+                escritas = EmpleadoProyecto.select().where(EmpleadoProyecto.id_proyecto.in_(proyectos)).count()
+            assert escritas == len(asignaciones), f"{nombre}: {escritas} asignaciones escritas de {len(asignaciones)}"
+            resultados[nombre] = segundos
+            print(f"{nombre:<20} {segundos:8.3f} s | {len(asignaciones) / segundos:10.0f} asignaciones/s")
+    print(f"{'mejora':<20} x{resultados['por_llamada'] / resultados['cola']:.1f}")
+    return resultados
+
+# --- Benchmark: instantánea binaria frente a volcado SQL ---
+def benchmark_snapshot(directorio):
+    """
+    Exporta la BD SQLite configurada con snapshot.py y como volcado SQL de
+    texto (iterdump, el equivalente de 'sqlite3 .dump' o mysqldump), restaura
+    ambos en ficheros nuevos de 'directorio' y compara tiempos y tamaños.
+    La restauración de la instantánea se verifica contra el fichero.
+    """
+    import sqlite3
+    import snapshot
+
+    if conexion.BACKEND != 'sqlite':
+        raise RuntimeError("El benchmark de instantáneas usa ficheros SQLite: ejecutar con EMPRESA_DB_BACKEND=sqlite")
+
+    original = conexion.DB_NAME
+    ruta_snapshot = os.path.join(directorio, 'empresa.snap')
+    ruta_sql = os.path.join(directorio, 'empresa.sql')
+    destino_snapshot = os.path.join(directorio, 'restaurada_snapshot.db')
+    destino_sql = os.path.join(directorio, 'restaurada_sql.db')
+    for ruta in (destino_snapshot, destino_sql):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    def volcar_sql():
+        with sqlite3.connect(original) as origen, open(ruta_sql, 'w', encoding='utf-8') as fichero:
+            for sentencia in origen.iterdump():
+                fichero.write(sentencia + '\n')
+
+    def restaurar_sql():
+        with open(ruta_sql, encoding='utf-8') as fichero:
+            destino = sqlite3.connect(destino_sql)
+            destino.executescript(fichero.read())
+            destino.close()
+
+    print("\n--- Benchmark: instantánea binaria frente a volcado SQL ---")
+    t_exportar, filas = cronometrar(snapshot.exportar, ruta_snapshot)
+    t_volcar, _ = cronometrar(volcar_sql)
+
+    conexion.cambiar_base(destino_snapshot)
+    try:
+        t_restaurar, _ = cronometrar(snapshot.restaurar, ruta_snapshot)
+        diferencias = snapshot.verificar(ruta_snapshot)
+    finally:
+        conexion.cambiar_base(original)
+    assert not diferencias, f"La restauración no coincide con la instantánea: {diferencias[:5]}"
+    t_restaurar_sql, _ = cronometrar(restaurar_sql)
+
+    resultados = {
+        'filas': filas,
+        'snapshot': {'bytes': os.path.getsize(ruta_snapshot), 'exportar_s': t_exportar, 'restaurar_s': t_restaurar},
+        'sql': {'bytes': os.path.getsize(ruta_sql), 'exportar_s': t_volcar, 'restaurar_s': t_restaurar_sql},
+    }
+    print(f"{sum(filas.values())} filas: {filas}")
+    print(f"{'':<10} {'tamaño':>12} {'exportar':>10} {'restaurar':>10}")
+    for nombre in ('snapshot', 'sql'):
+        datos = resultados[nombre]
+        print(f"{nombre:<10} {datos['bytes'] / 2**20:8.1f} MiB {datos['exportar_s']:8.2f} s "
+              f"{datos['restaurar_s']:8.2f} s")
+    return resultados
+
+# --- Benchmark de escalado ---
+def benchmark_escalas(escalas, semilla=SEMILLA, salida=None):
+    """
+    Para cada escala genera los datos sintéticos en la BD SQLite configurada
+    (borrando lo que hubiera) y cronometra los cinco informes de consultas.py
+    y todas las operaciones de actualizacion_borrado.py. Si alguna
+    operación falla o no afecta a ninguna fila se lanza RuntimeError.
+    Devuelve los resultados y, si se indica 'salida', los guarda en JSON.
+    """
+    if conexion.BACKEND != 'sqlite':
+        raise RuntimeError("El benchmark de escalado recrea las tablas: ejecutar con EMPRESA_DB_BACKEND=sqlite")
+
+    informe = {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'backend': conexion.BACKEND,
+        'python': platform.python_version(),
+        'semilla': semilla,
+        'escalas': {},
+    }
+    for escala in escalas:
+        num_proyectos = ESCALAS[escala] if escala in ESCALAS else int(escala)
+        print(f"\n--- Escala {escala}: {num_proyectos} proyectos ---")
+
+        segundos, filas = cronometrar(poblar, num_proyectos, semilla)
+        print(f"{'generacion':<40} {segundos:8.3f} s | {filas}")
+        tiempos = {}
+
+        with sesion():
+            for numero in range(1, 6):
+                nombre = f'consulta_{numero}'
+                tiempos[nombre], _ = cronometrar(getattr(consultas, nombre))
+                print(f"{nombre:<40} {tiempos[nombre]:8.3f} s")
+
+        filas_afectadas = {}
+        for nombre, funcion, args in actualizacion_borrado.operaciones_escritura():
+            tiempos[nombre], filas_afectadas[nombre] = cronometrar(funcion, *args)
+            print(f"{nombre:<40} {tiempos[nombre]:8.3f} s | {filas_afectadas[nombre]} filas")
+
+        # Un tiempo solo vale si la operación hizo su trabajo: una que falla
+        # (devuelve None) o no cambia nada mediría otra cosa
+        fallidas = [nombre for nombre, afectadas in filas_afectadas.items() if not afectadas]
+        if fallidas:
+            raise RuntimeError(f"Escala {escala}: operaciones fallidas o sin filas afectadas: "
+                               f"{', '.join(fallidas)}")
+
+        informe['escalas'][escala] = {
+            'proyectos': num_proyectos,
+            'filas': filas,
+            'generacion_s': segundos,
+            'operaciones_s': tiempos,
+            'filas_afectadas': filas_afectadas,
+        }
+
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as fichero:
+            json.dump(informe, fichero, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {salida}")
+    return informe
+
+def comparar_resultados(ruta_anterior, ruta_actual, umbral=1.2):
+    """
+    Compara dos ficheros de resultados de benchmark_escalas y marca como
+    regresión cualquier operación que tarde más de 'umbral' veces lo anterior.
+    Devuelve la lista de regresiones (escala, operación, anterior, actual).
+    """
+    with open(ruta_anterior, encoding='utf-8') as fichero:
+        anterior = json.load(fichero)
+    with open(ruta_actual, encoding='utf-8') as fichero:
+        actual = json.load(fichero)
+
+    regresiones = []
+    for escala, datos in actual['escalas'].items():
+        previos = anterior['escalas'].get(escala)
+        if not previos:
+            continue
+        print(f"\n--- Escala {escala} ---")
+        for nombre, segundos in datos['operaciones_s'].items():
+            antes = previos['operaciones_s'].get(nombre)
+            if not antes:
+                continue
+            ratio = segundos / antes
+            marca = ' <-- REGRESIÓN' if ratio > umbral else ''
+            print(f"{nombre:<40} {antes:8.3f} s -> {segundos:8.3f} s (x{ratio:.2f}){marca}")
+            if ratio > umbral:
+                regresiones.append((escala, nombre, antes, segundos))
+    return regresiones
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks de la BD Empresa')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    p_sesion = subparsers.add_parser('sesion', help='Sesión frente a conexión por llamada')
+    p_sesion.add_argument('-n', type=int, default=10000, help='Número de actualizaciones')
+
+    p_asincrono = subparsers.add_parser('asincrono', help='5 informes concurrentes (asyncio) frente a en serie')
+    p_asincrono.add_argument('--hilos', type=int, help='Hilos del pool (por defecto asincrono.MAX_HILOS)')
+
+    p_snapshot = subparsers.add_parser('snapshot', help='Instantánea binaria frente a volcado SQL (SQLite)')
+    p_snapshot.add_argument('--directorio', default='.', help='Dónde escribir los ficheros y las BDs restauradas')
+
+    p_compiladas = subparsers.add_parser('compiladas', help='SQL precompilado frente a generarlo en cada llamada')
+    p_compiladas.add_argument('-n', type=int, default=10000, help='Llamadas por forma de consulta')
+
+    p_asignaciones = subparsers.add_parser('asignaciones', help='Cola de escritura diferida frente a una asignación por llamada')
+    p_asignaciones.add_argument('-n', type=int, default=5000, help='Número de asignaciones')
+
+    subparsers.add_parser('analitica', help='Informes 1, 3 y 5 en SQL, fila a fila y con NumPy')
+
+    p_paginacion = subparsers.add_parser('paginacion', help='Paginación por clave frente a OFFSET')
+    p_paginacion.add_argument('--tamano', type=int, default=20, help='Filas por página')
+    p_paginacion.add_argument('--orden', choices=['id', 'presupuesto'], default='presupuesto')
+
+    p_escalas = subparsers.add_parser('escalas', help='Informes y operaciones a distintas escalas (SQLite)')
+    p_escalas.add_argument('escalas', nargs='*', default=['1k', '100k'],
+                           help=f"Escalas ({', '.join(ESCALAS)}) o número de proyectos")
+    p_escalas.add_argument('--semilla', type=int, default=SEMILLA)
+    p_escalas.add_argument('--salida', default='resultados_benchmark.json', help='Fichero JSON de resultados')
+
+    p_comparar = subparsers.add_parser('comparar', help='Compara dos ficheros de resultados')
+    p_comparar.add_argument('anterior')
+    p_comparar.add_argument('actual')
+    p_comparar.add_argument('--umbral', type=float, default=1.2)
+
+    args = parser.parse_args()
+    if args.benchmark == 'sesion':
+        benchmark_sesion(args.n)
+    elif args.benchmark == 'asincrono':
+        benchmark_asincrono(args.hilos)
+    elif args.benchmark == 'compiladas':
+        benchmark_compiladas(args.n)
+    elif args.benchmark == 'asignaciones':
+        benchmark_asignaciones(args.n)
+    elif args.benchmark == 'analitica':
+        benchmark_analitica()
+    elif args.benchmark == 'snapshot':
+        benchmark_snapshot(args.directorio)
+    elif args.benchmark == 'paginacion':
+        benchmark_paginacion(args.tamano, args.orden)
+    elif args.benchmark == 'escalas':
+        benchmark_escalas(args.escalas, args.semilla, args.salida)
+    elif args.benchmark == 'comparar':
+        regresiones = comparar_resultados(args.anterior, args.actual, args.umbral)
+        if regresiones:
+            raise SystemExit(1)
@@ -0,0 +1,150 @@
+import argparse
+import time
+from peewee import *
+from peewee import SelectBase
+import conexion
+from conexion import db, sesion
+from crear_tablas import (Cliente, Proyecto, EmpleadoProyecto, ResumenCliente,
+                          ProyectoArchivado, EmpleadoProyectoArchivado)
+
+# Borrado en cascada de muchos clientes a la vez: asignaciones de sus
+# proyectos, proyectos y clientes, por lotes de clientes y con una
+# transacción por lote. Cada lote cuesta un número fijo de sentencias,
+# independiente de cuántos clientes, proyectos o asignaciones tenga.
+#
+# Con cascada_bd=True solo se borran los clientes y la BD borra el resto
+# (requiere las FK ON DELETE CASCADE, ver borrado_cascada en conexion.py).
+
+TAMANO_LOTE = 500
+# Límite de parámetros por sentencia (SQLite admite 32766, MySQL 65535)
+MAX_PARAMETROS = 30000
+
+# Claves del recuento de filas borradas
+TABLAS = ('empleados_proyecto', 'proyectos', 'empleados_proyecto_archivados',
+          'proyectos_archivados', 'clientes')
+
+def _lotes_de_clientes(clientes, tamano_lote):
+    """
+    Genera lotes de dni_cif a partir de una lista de claves o de una
+    consulta que devuelva dni_cif. La consulta se recorre por orden de
+    clave desde el último cliente del lote anterior, así que se puede
+    ir borrando mientras se recorre.
+    """
+    if isinstance(clientes, SelectBase):
+        ultimo = ''
+        while True:
+            lote = [dni_cif for dni_cif, in (Cliente
+                                             .select(Cliente.dni_cif)
+                                             .where(Cliente.dni_cif.in_(clientes) &
+                                                    (Cliente.dni_cif > ultimo))
+                                             .order_by(Cliente.dni_cif)
+                                             .limit(tamano_lote)
+                                             .tuples())]
+            if not lote:
+                return
+            yield lote
+            ultimo = lote[-1]
+    else:
+        yield from chunked(sorted(set(clientes)), tamano_lote)
+
+def _borrar_lote(lote, cascada_bd):
+    # Proyectos de los clientes del lote (índice de id_cliente)
+    proyectos = [id_proyecto for id_proyecto, in (Proyecto
+                                                  .select(Proyecto.id_proyecto)
+                                                  .where(Proyecto.id_cliente.in_(lote))
+                                                  .tuples())]
+    bloques = list(chunked(proyectos, MAX_PARAMETROS))
+    borradas = dict.fromkeys(TABLAS, 0)
+    # Proyectos archivados (archivo.py) de los clientes del lote y sus asignaciones
+    archivados = ProyectoArchivado.id_cliente.in_(lote)
+    asignaciones_archivadas = EmpleadoProyectoArchivado.id_proyecto.in_(
+        ProyectoArchivado.select(ProyectoArchivado.id_proyecto).where(archivados))
+
+    if cascada_bd:
+        borradas['empleados_proyecto_archivados'] = (EmpleadoProyectoArchivado.select()
+                                                     .where(asignaciones_archivadas).count())
+        borradas['proyectos_archivados'] = ProyectoArchivado.select().where(archivados).count()
+        # La BD borra proyectos y asignaciones: se cuentan antes de borrar
+        for bloque in bloques:
+            borradas['empleados_proyecto'] += (EmpleadoProyecto.select()
+                                               .where(EmpleadoProyecto.id_proyecto.in_(bloque))
+                                               .count())
+        borradas['proyectos'] = len(proyectos)
+        borradas['clientes'] = Cliente.delete().where(Cliente.dni_cif.in_(lote)).execute()
+        # El borrado en cascada de la BD no pasa por los avisos de escritura
+        ResumenCliente.delete().where(ResumenCliente.id_cliente.in_(lote)).execute()
+        return borradas
+
+    for bloque in bloques:
+        borradas['empleados_proyecto'] += (EmpleadoProyecto.delete()
+                                           .where(EmpleadoProyecto.id_proyecto.in_(bloque))
+                                           .execute())
+    for bloque in bloques:
+        borradas['proyectos'] += Proyecto.delete().where(Proyecto.id_proyecto.in_(bloque)).execute()
+    borradas['empleados_proyecto_archivados'] = (EmpleadoProyectoArchivado.delete()
+                                                 .where(asignaciones_archivadas).execute())
+    borradas['proyectos_archivados'] = ProyectoArchivado.delete().where(archivados).execute()
+    borradas['clientes'] = Cliente.delete().where(Cliente.dni_cif.in_(lote)).execute()
+    return borradas
+
+def eliminar_clientes(clientes, tamano_lote=TAMANO_LOTE, cascada_bd=None, progreso=False):
+    """
+    Elimina los clientes indicados (lista de dni_cif o consulta que
+    devuelva dni_cif) con sus proyectos y las asignaciones de esos
+    proyectos. Cada lote de clientes va en su propia transacción: si uno
+    falla se deshace solo ese lote y se relanza el error.
+    Devuelve el número de filas borradas por tabla.
+    """
+    if cascada_bd is None:
+        cascada_bd = conexion.BORRADO_CASCADA
+
+    totales = dict.fromkeys(TABLAS, 0)
+    inicio = time.perf_counter()
+    with sesion():
+        for lote in _lotes_de_clientes(clientes, tamano_lote):
+            with db.atomic():
+                borradas = _borrar_lote(lote, cascada_bd)
+            for tabla, filas in borradas.items():
+                totales[tabla] += filas
+            if progreso:
+                print(f"[eliminar_clientes] {totales['clientes']} clientes, "
+                      f"{totales['proyectos']} proyectos, {totales['empleados_proyecto']} asignaciones "
+                      f"eliminados ({time.perf_counter() - inicio:.1f} s)")
+    return totales
+
+def clientes_sin_proyectos():
+    """
+    Consulta con los dni_cif de los clientes sin proyectos, ni activos ni
+    archivados (anti-join).
+    """
+    return (Cliente
+            .select(Cliente.dni_cif)
+            .join(Proyecto, JOIN.LEFT_OUTER, on=(Proyecto.id_cliente == Cliente.dni_cif))
+            .join(ProyectoArchivado, JOIN.LEFT_OUTER, on=(ProyectoArchivado.id_cliente == Cliente.dni_cif))
+            .where(Proyecto.id_proyecto.is_null() & ProyectoArchivado.id_proyecto.is_null()))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Borrado en cascada de muchos clientes')
+    parser.add_argument('clientes', nargs='*', help='DNI/CIF de los clientes a eliminar')
+    parser.add_argument('--fichero', help='Fichero con un DNI/CIF por línea')
+    parser.add_argument('--sin-proyectos', action='store_true', help='Eliminar los clientes sin proyectos')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Clientes por lote/transacción')
+    parser.add_argument('--cascada-bd', action='store_true',
+                        help='Delegar en las FK ON DELETE CASCADE de la BD')
+    args = parser.parse_args()
+
+    clientes = list(args.clientes)
+    if args.fichero:
+        with open(args.fichero, encoding='utf-8') as fichero:
+            clientes += [linea.strip() for linea in fichero if linea.strip()]
+    if args.sin_proyectos:
+        if clientes:
+            parser.error('--sin-proyectos no se combina con una lista de clientes')
+        clientes = clientes_sin_proyectos()
+    elif not clientes:
+        parser.error('Indicar los clientes, --fichero o --sin-proyectos')
+
+    totales = eliminar_clientes(clientes, args.lote, args.cascada_bd or None, progreso=True)
+    print(f"Eliminados: {totales['clientes']} clientes, {totales['proyectos']} proyectos, "
+          f"{totales['empleados_proyecto']} asignaciones, {totales['proyectos_archivados']} proyectos "
+          f"archivados con {totales['empleados_proyecto_archivados']} asignaciones.")
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+from conexion import db
+from crear_tablas import Cliente, Empleado, al_escribir, claves_afectadas
+from consultas_compiladas import por_clave
+
+# Caché en memoria (LRU + TTL) de Cliente y Empleado por clave primaria.
+# Es opcional: mientras no se llame a activar_cache(), obtener_cliente() y
+# obtener_empleado() equivalen a un get_or_none() por clave.
+#
+# Invalidación: todo UPDATE/DELETE (y todo upsert) sobre los modelos pasa
+# por los avisos de crear_tablas.py. Si el WHERE es por clave primaria (lo
+# que hace .save(), delete_instance() o el borrado en cascada de un cliente)
+# solo se invalidan esas claves; cualquier otra escritura vacía la caché
+# del modelo.
+# Dentro de una transacción que ha escrito en un modelo no se guardan filas
+# nuevas de ese modelo, para no cachear datos que aún pueden deshacerse.
+# Las escrituras de otros procesos no se ven: el TTL limita ese desfase.
+# Quien escriba sin pasar por los modelos tiene que llamar a vaciar_caches().
+
+CAPACIDAD = 10000       # Filas por modelo
+TTL = 300               # Segundos que una fila puede servirse desde la caché
+
+class CacheLRU:
+    """
+    Diccionario LRU con caducidad por entrada y contadores de aciertos,
+    fallos, expulsiones (por capacidad) y caducadas (por TTL).
+    """
+    def __init__(self, capacidad=CAPACIDAD, ttl=TTL):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._bloqueo = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.caducadas = 0
+
+    def obtener(self, clave):
+        """
+        Devuelve (True, valor) si la clave está en caché y no ha caducado,
+        (False, None) en otro caso.
+        """
+        with self._bloqueo:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, caduca = entrada
+                if caduca > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+                self.caducadas += 1
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor):
+        with self._bloqueo:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+
+    def invalidar(self, clave):
+        with self._bloqueo:
+            self._datos.pop(clave, None)
+
+    def vaciar(self):
+        with self._bloqueo:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._bloqueo:
+            consultas = self.aciertos + self.fallos
+            return {
+                'tamano': len(self._datos),
+                'capacidad': self.capacidad,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'caducadas': self.caducadas,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
+
+# Cachés activas por modelo; vacío = caché desactivada
+_caches = {}
+# Modelos escritos en la transacción en curso de cada hilo
+_escritos = threading.local()
+
+def activar_cache(capacidad=CAPACIDAD, ttl=TTL, modelos=(Cliente, Empleado)):
+    for modelo in modelos:
+        _caches[modelo] = CacheLRU(capacidad, ttl)
+
+def desactivar_cache():
+    _caches.clear()
+
+def vaciar_caches():
+    """
+    Vacía las cachés activas sin desactivarlas. Para cargas que escriben
+    sin pasar por los avisos de escritura (p. ej. snapshot.restaurar()).
+    """
+    for cache in _caches.values():
+        cache.vaciar()
+
+def estadisticas_cache():
+    return {modelo.__name__: cache.estadisticas() for modelo, cache in _caches.items()}
+
+def _modelos_escritos():
+    # Al terminar la transacción se olvidan los modelos escritos en ella
+    if not hasattr(_escritos, 'modelos') or not db.in_transaction():
+        _escritos.modelos = set()
+    return _escritos.modelos
+
+@al_escribir
+def _invalidar(modelo, operacion, consulta):
+    cache = _caches.get(modelo)
+    if cache is None:
+        return
+    # Un INSERT normal no deja filas obsoletas (los fallos no se cachean),
+    # pero un upsert sí puede modificar filas existentes
+    if operacion == 'insert' and getattr(consulta, '_on_conflict', None) is None:
+        return
+    if db.in_transaction():
+        _modelos_escritos().add(modelo)
+    claves = claves_afectadas(consulta)
+    if claves is None:
+        cache.vaciar()
+    else:
+        for clave in claves:
+            cache.invalidar(clave)
+
+def obtener_por_clave(modelo, clave):
+    """
+    Devuelve la instancia del modelo con esa clave primaria, o None.
+    Con la caché activa solo se consulta la BD en caso de fallo.
+    Cada llamada devuelve una instancia nueva, así que modificarla no
+    altera lo guardado en caché.
+    """
+    cache = _caches.get(modelo)
+    if cache is None:
+        return por_clave(modelo, clave)
+
+    encontrado, datos = cache.obtener(clave)
+    if encontrado:
+        return modelo(**datos)
+
+    instancia = por_clave(modelo, clave)
+    if instancia is not None and modelo not in _modelos_escritos():
+        cache.guardar(clave, dict(instancia.__data__))
+    return instancia
+
+def obtener_cliente(dni_cif):
+    return obtener_por_clave(Cliente, dni_cif)
+
+def obtener_empleado(dni):
+    return obtener_por_clave(Empleado, dni)
+
+def obtener_jefe(dni):
+    """
+    Devuelve el empleado si existe y es jefe, o None.
+    """
+    empleado = obtener_empleado(dni)
+    return empleado if empleado is not None and empleado.jefe else None
@@ -0,0 +1,282 @@
+import argparse
+import datetime
+import threading
+from contextlib import contextmanager
+from peewee import *
+from peewee import Node
+import conexion
+from conexion import db, sesion
+from crear_tablas import (Cliente, Empleado, Proyecto, EmpleadoProyecto, Cambio, antes_de_escribir,
+                          filas_insertadas, insert_en_generador, nombre_campo, olvidar_tablas,
+                          tabla_existe, valor_escrito)
+
+# Registro de cambios (tabla registro_cambios).
+# Cada INSERT/UPDATE/DELETE sobre clientes, empleados, proyectos y
+# asignaciones (.save()/.create(), insert_many() de las cargas, los UPDATE
+# y DELETE en bloque de actualizacion_borrado.py, las plantillas de
+# consultas_compiladas...) apunta una fila por cada fila tocada, con su
+# clave y el cliente, proyecto y empleado a los que afecta, dentro de la
+# misma transacción que la escritura: si la escritura se deshace, su
+# registro también.
+# Un UPDATE que cambia la clave o el cliente de una fila se apunta con los
+# valores de antes y con los de después. Las filas que no se pueden
+# identificar (un UPDATE de la clave con una expresión, un upsert de
+# proyectos desde un generador) se apuntan con clave None: quien lea el
+# registro tiene que dar por cambiada toda la tabla.
+# Los proyectos insertados se identifican después de escribir por su jefe,
+# que es único: así se conocen los ids que ha asignado la BD.
+# Como resumen_clientes, crear_tablas.py importa este módulo antes de la
+# primera escritura (MODULOS_MANTENIMIENTO), y el registro solo está activo
+# si la tabla existe.
+
+# Filas del registro por executemany y claves por lista IN al buscar las
+# filas afectadas
+TAMANO_LOTE = 1000
+
+# Columnas que se apuntan de cada modelo: su clave y, en proyectos y
+# asignaciones, el cliente o el proyecto al que pertenecen
+COLUMNAS = {
+    Cliente: (Cliente.dni_cif,),
+    Empleado: (Empleado.dni,),
+    Proyecto: (Proyecto.id_proyecto, Proyecto.id_cliente),
+    EmpleadoProyecto: (EmpleadoProyecto.id_empleado, EmpleadoProyecto.id_proyecto),
+}
+
+_diferido = threading.local()
+
+# --- Escritura del registro ---
+CAMPOS_REGISTRO = [Cambio.tabla, Cambio.operacion, Cambio.clave, Cambio.id_cliente,
+                   Cambio.id_proyecto, Cambio.id_empleado, Cambio.fecha]
+
+def _registro(modelo, operacion, fila, fecha):
+    # Fila de registro_cambios en el orden de CAMPOS_REGISTRO
+    tabla = modelo._meta.table_name
+    if fila is None:
+        return (tabla, operacion, None, None, None, None, fecha)
+    if modelo is Cliente:
+        return (tabla, operacion, fila[0], fila[0], None, None, fecha)
+    if modelo is Empleado:
+        return (tabla, operacion, fila[0], None, None, fila[0], fecha)
+    if modelo is Proyecto:
+        id_proyecto, id_cliente = fila
+        return (tabla, operacion, str(id_proyecto), id_cliente, id_proyecto, None, fecha)
+    id_empleado, id_proyecto = fila
+    return (tabla, operacion, f"{id_empleado}|{id_proyecto}", None, id_proyecto, id_empleado, fecha)
+
+def _guardar(cambios):
+    """
+    Inserta en el registro los cambios [(modelo, operacion, fila)], sin
+    repetir ninguno. fila=None apunta filas sin identificar.
+    """
+    fecha = datetime.datetime.now()
+    registros = [_registro(modelo, operacion, fila, fecha) for modelo, operacion, fila in dict.fromkeys(cambios)]
+    if not registros:
+        return
+    # Un INSERT de varias filas por lote a partir del SQL de una fila:
+    # generar con peewee el INSERT de miles de filas costaría más que la
+    # propia escritura registrada. Va por db.execute_sql, así que cuenta en
+    # la instrumentación y en los presupuestos de consultas
+    sql, _ = Cambio.insert_many([[None] * len(CAMPOS_REGISTRO)], fields=CAMPOS_REGISTRO).sql()
+    cabecera, fila = sql.rsplit(' VALUES ', 1)
+    for lote in chunked(registros, TAMANO_LOTE):
+        db.execute_sql(f"{cabecera} VALUES {', '.join([fila] * len(lote))}",
+                       [valor for registro in lote for valor in registro])
+
+def marcar_recarga(*modelos, operacion='insert'):
+    """
+    Apunta en el registro que las tablas de 'modelos' (por defecto las
+    cuatro) han cambiado por completo, para escrituras que no pasan por
+    los avisos (la restauración de una instantánea, por ejemplo).
+    """
+    if _registro_activo(ignorar_diferido=True):
+        _guardar([(modelo, operacion, None) for modelo in (modelos or COLUMNAS)])
+
+# --- Filas afectadas por cada escritura ---
+def _registro_activo(ignorar_diferido=False):
+    if not ignorar_diferido and getattr(_diferido, 'activo', False):
+        return False
+    return tabla_existe(Cambio)
+
+def _seleccionar(modelo, campo, valores):
+    # Filas (COLUMNAS) de 'modelo' con 'campo' en 'valores', por lotes
+    filas = set()
+    for lote in chunked(sorted(valores), TAMANO_LOTE):
+        filas.update(modelo.select(*COLUMNAS[modelo]).where(campo.in_(lote)).tuples())
+    return filas
+
+def _borradas_en_cascada(modelo, filas):
+    """
+    [(modelo, fila)] que la BD borra por su cuenta (ON DELETE CASCADE) al
+    borrar esas filas: esos borrados no pasan por los avisos.
+    """
+    if not conexion.BORRADO_CASCADA or not filas:
+        return []
+    if modelo is Cliente:
+        proyectos = _seleccionar(Proyecto, Proyecto.id_cliente, {dni_cif for dni_cif, in filas})
+        return [(Proyecto, fila) for fila in proyectos] + _borradas_en_cascada(Proyecto, proyectos)
+    if modelo is Proyecto:
+        asignaciones = _seleccionar(EmpleadoProyecto, EmpleadoProyecto.id_proyecto,
+                                    {id_proyecto for id_proyecto, _ in filas})
+        return [(EmpleadoProyecto, fila) for fila in asignaciones]
+    return []
+
+def _tras_update(consulta, columnas, filas):
+    """
+    Filas con los valores que tendrán después del UPDATE, o None si alguna
+    columna registrada se actualiza con una expresión.
+    """
+    posiciones = {campo.name: posicion for posicion, campo in enumerate(columnas)}
+    nuevos = {}
+    for campo, valor in consulta._update.items():
+        posicion = posiciones.get(nombre_campo(campo))
+        if posicion is None:
+            continue
+        valor = valor_escrito(valor)
+        if isinstance(valor, Node):
+            return None
+        nuevos[posicion] = valor
+    if not nuevos:
+        return filas
+    return {tuple(nuevos.get(posicion, valor) for posicion, valor in enumerate(fila)) for fila in filas}
+
+def _insert_proyectos(consulta):
+    upsert = getattr(consulta, '_on_conflict', None) is not None
+    generador = insert_en_generador(consulta)
+    # Con filas de un generador el conjunto se llena al escribir
+    claves = filas_insertadas(consulta, (Proyecto.id_proyecto, Proyecto.id_jefe_proyecto))
+
+    # Un upsert puede modificar proyectos que ya existen (por la clave
+    # primaria o por el jefe, que es único); si las filas vienen de un
+    # generador no se pueden buscar antes de escribir
+    existentes = set()
+    if upsert and not generador:
+        existentes = (_seleccionar(Proyecto, Proyecto.id_proyecto,
+                                   {id_proyecto for id_proyecto, _ in claves if id_proyecto is not None}) |
+                      _seleccionar(Proyecto, Proyecto.id_jefe_proyecto,
+                                   {jefe for _, jefe in claves if jefe is not None}))
+
+    def posterior():
+        # Los ids que asigna la BD no se conocen hasta escribir: los
+        # proyectos se buscan después por su jefe
+        jefes = {jefe for _, jefe in claves}
+        cambios = []
+        if None in jefes:
+            cambios.append((Proyecto, 'insert', None))
+            jefes.discard(None)
+        ids_existentes = {id_proyecto for id_proyecto, _ in existentes}
+        despues = (_seleccionar(Proyecto, Proyecto.id_jefe_proyecto, jefes) |
+                   _seleccionar(Proyecto, Proyecto.id_proyecto, ids_existentes))
+        cambios += [(Proyecto, 'update', fila) for fila in existentes]
+        cambios += [(Proyecto, 'update' if fila[0] in ids_existentes else 'insert', fila)
+                    for fila in despues]
+        if upsert and generador:
+            cambios.append((Proyecto, 'update', None))
+        _guardar(cambios)
+    return posterior
+
+@antes_de_escribir(Cliente, Empleado, Proyecto, EmpleadoProyecto)
+def _registrar(modelo, operacion, consulta):
+    if not _registro_activo():
+        return None
+    columnas = COLUMNAS[modelo]
+
+    if operacion == 'insert':
+        if modelo is Proyecto:
+            return _insert_proyectos(consulta)
+        # Las demás tablas tienen clave natural: está en las filas insertadas
+        filas = filas_insertadas(consulta, columnas)
+        return lambda: _guardar([(modelo, 'insert', fila) for fila in filas])
+
+    # UPDATE/DELETE: filas que cumplen el WHERE antes de escribir
+    seleccion = modelo.select(*columnas)
+    if consulta._where is not None:
+        seleccion = seleccion.where(consulta._where)
+    filas = set(seleccion.tuples())
+    if not filas:
+        return None
+    cambios = [(modelo, operacion, fila) for fila in filas]
+
+    if operacion == 'delete':
+        cambios += [(hijo, 'delete', fila) for hijo, fila in _borradas_en_cascada(modelo, filas)]
+    else:
+        despues = _tras_update(consulta, columnas, filas)
+        if despues is None:
+            cambios.append((modelo, 'update', None))
+        else:
+            cambios += [(modelo, 'update', fila) for fila in despues]
+    return lambda: _guardar(cambios)
+
+@contextmanager
+def registro_diferido(*modelos):
+    """
+    Desactiva el registro en este hilo durante el bloque y al salir apunta
+    las tablas de 'modelos' (por defecto las cuatro) como cambiadas por
+    completo. Para cargas masivas, donde registrar fila a fila duplicaría
+    el trabajo y los lectores del registro van a recalcular todo igualmente.
+    """
+    _diferido.activo = True
+    try:
+        yield
+    finally:
+        _diferido.activo = False
+        # También si la carga falla a medias: lo ya escrito ha cambiado
+        with sesion():
+            marcar_recarga(*modelos)
+
+# --- Lectura del registro ---
+def ultimo_cambio():
+    """
+    Id del último cambio registrado (0 si no hay ninguno): el punto de
+    control a partir del cual leer los siguientes.
+    """
+    return Cambio.select(fn.MAX(Cambio.id)).scalar() or 0
+
+def cambios_desde(punto_control, hasta=None):
+    """
+    Cambios con id mayor que 'punto_control' (y hasta 'hasta', si se
+    indica), en el orden en que se registraron.
+    """
+    consulta = Cambio.select().where(Cambio.id > punto_control)
+    if hasta is not None:
+        consulta = consulta.where(Cambio.id <= hasta)
+    return consulta.order_by(Cambio.id)
+
+def recortar(punto_control):
+    """
+    Borra del registro los cambios hasta 'punto_control' incluido, cuando
+    todos sus lectores ya los han procesado. Devuelve las filas borradas.
+    """
+    return Cambio.delete().where(Cambio.id <= punto_control).execute()
+
+def resumen_cambios(punto_control=0):
+    """
+    {(tabla, operacion): nº de cambios} registrados después de 'punto_control'.
+    """
+    consulta = (Cambio
+                .select(Cambio.tabla, Cambio.operacion, fn.COUNT(SQL('*')))
+                .where(Cambio.id > punto_control)
+                .group_by(Cambio.tabla, Cambio.operacion)
+                .order_by(Cambio.tabla, Cambio.operacion))
+    return {(tabla, operacion): total for tabla, operacion, total in consulta.tuples()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Registro de cambios de clientes, empleados, proyectos y asignaciones')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('crear', help='Crear la tabla del registro')
+    p_resumen = subparsers.add_parser('resumen', help='Cambios registrados por tabla y operación')
+    p_resumen.add_argument('--desde', type=int, default=0, help='Solo los cambios posteriores a este id')
+    p_recortar = subparsers.add_parser('recortar', help='Borrar los cambios ya procesados')
+    p_recortar.add_argument('hasta', type=int, help='Último id que se puede borrar')
+    args = parser.parse_args()
+
+    with sesion():
+        if args.comando == 'crear':
+            db.create_tables([Cambio])
+            olvidar_tablas()
+            print("Tabla registro_cambios creada.")
+        elif args.comando == 'resumen':
+            for (tabla, operacion), total in resumen_cambios(args.desde).items():
+                print(f"{tabla:<20} {operacion:<7} {total:>10}")
+            print(f"Último cambio: {ultimo_cambio()}")
+        else:
+            print(f"{recortar(args.hasta)} cambios borrados del registro.")
@@ -0,0 +1,255 @@
+import argparse
+import csv
+import json
+import os
+import time
+from itertools import islice
+from peewee import *
+from conexion import db, sesion
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto, IGNORAR, con_upsert
+
+# Tamaño de lote por defecto: filas por transacción
+TAMANO_LOTE = 5000
+# Límite de parámetros por sentencia (SQLite admite 32766, MySQL 65535)
+MAX_PARAMETROS = 30000
+
+VALORES_VERDADEROS = {'1', 'true', 't', 'si', 'sí', 's', 'yes', 'y'}
+
+# --- Lectura en streaming ---
+def leer_registros(ruta):
+    """
+    Genera los registros de un fichero CSV (con cabecera) o JSONL
+    de uno en uno, sin cargar el fichero entero en memoria.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    with open(ruta, encoding='utf-8', newline='') as fichero:
+        if extension == '.csv':
+            yield from csv.DictReader(fichero)
+        elif extension in ('.jsonl', '.ndjson'):
+            for linea in fichero:
+                if linea.strip():
+                    yield json.loads(linea)
+        else:
+            raise ValueError(f"Formato no soportado: '{extension}' (usar .csv o .jsonl)")
+
+def por_lotes(registros, tamano):
+    """
+    Agrupa un iterable en listas de como mucho 'tamano' elementos.
+    """
+    iterador = iter(registros)
+    while True:
+        lote = list(islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+def _texto(valor):
+    # En CSV todo llega como texto: la cadena vacía equivale a NULL
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return valor or None
+    return valor
+
+def _booleano(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in VALORES_VERDADEROS
+    return bool(valor)
+
+def _filas_modelo(modelo, lote):
+    """
+    Normaliza un lote de registros a diccionarios con solo
+    las columnas del modelo.
+    """
+    campos = modelo._meta.fields
+    filas = []
+    for registro in lote:
+        fila = {}
+        for nombre, valor in registro.items():
+            campo = campos.get(nombre)
+            if campo is None:
+                continue
+            fila[nombre] = _booleano(valor) if isinstance(campo, BooleanField) else _texto(valor)
+        filas.append(fila)
+    return filas
+
+# --- Resolución de claves ajenas en bloque ---
+def _claves_existentes(campo, claves, *condiciones):
+    """
+    Devuelve el subconjunto de 'claves' que existen en la tabla del campo,
+    con una única consulta IN por lote.
+    """
+    claves = {clave for clave in claves if clave is not None}
+    if not claves:
+        return set()
+    consulta = campo.model.select(campo).where(campo.in_(list(claves)), *condiciones)
+    return {clave for clave, in consulta.tuples()}
+
+def _preparar_proyectos(filas):
+    clientes = _claves_existentes(Cliente.dni_cif, (f.get('id_cliente') for f in filas))
+    jefes = _claves_existentes(Empleado.dni, (f.get('id_jefe_proyecto') for f in filas),
+                               Empleado.jefe == True)
+    validas = [f for f in filas
+               if f.get('id_cliente') in clientes and f.get('id_jefe_proyecto') in jefes]
+    return validas, len(filas) - len(validas)
+
+def _preparar_asignaciones(lote):
+    filas = _filas_modelo(EmpleadoProyecto, lote)
+
+    # El proyecto puede venir por id_proyecto o por titulo_proyecto
+    titulos = {_texto(r.get('titulo_proyecto')) for r, f in zip(lote, filas)
+               if f.get('id_proyecto') is None}
+    titulos.discard(None)
+    ids_por_titulo = {}
+    if titulos:
+        consulta = (Proyecto
+                    .select(Proyecto.titulo_proyecto, fn.MIN(Proyecto.id_proyecto))
+                    .where(Proyecto.titulo_proyecto.in_(list(titulos)))
+                    .group_by(Proyecto.titulo_proyecto)
+                    .tuples())
+        ids_por_titulo = dict(consulta)
+    for registro, fila in zip(lote, filas):
+        if fila.get('id_proyecto') is None:
+            fila['id_proyecto'] = ids_por_titulo.get(_texto(registro.get('titulo_proyecto')))
+        elif isinstance(fila['id_proyecto'], str):
+            # Un id mal escrito deja la fila sin proyecto: se rechaza
+            try:
+                fila['id_proyecto'] = int(fila['id_proyecto'])
+            except ValueError:
+                fila['id_proyecto'] = None
+
+    empleados = _claves_existentes(Empleado.dni, (f.get('id_empleado') for f in filas))
+    proyectos = _claves_existentes(Proyecto.id_proyecto, (f.get('id_proyecto') for f in filas))
+    validas = [f for f in filas
+               if f.get('id_empleado') in empleados and f.get('id_proyecto') in proyectos]
+    return validas, len(filas) - len(validas)
+
+def preparar_sin_claves(modelo):
+    def preparar(lote):
+        return _filas_modelo(modelo, lote), 0
+    return preparar
+
+# --- Carga genérica ---
+def _insertar(modelo, filas, en_conflicto, objetivo):
+    filas_por_sentencia = max(1, MAX_PARAMETROS // len(filas[0]))
+    for bloque in chunked(filas, filas_por_sentencia):
+        consulta = modelo.insert_many(bloque)
+        if en_conflicto is not None:
+            consulta = con_upsert(consulta, en_conflicto, objetivo)
+        consulta.execute()
+
+def _insertar_fila_a_fila(modelo, filas, en_conflicto, objetivo):
+    """
+    Inserta las filas de una en una, cada una en su savepoint, para que
+    una fila con error de integridad no se lleve por delante el resto del
+    lote. Devuelve (insertadas, fallidas, primer error).
+    """
+    insertadas, fallidas, error = 0, 0, None
+    with db.atomic():
+        for fila in filas:
+            try:
+                with db.atomic():
+                    _insertar(modelo, [fila], en_conflicto, objetivo)
+                insertadas += 1
+            except IntegrityError as e:
+                fallidas += 1
+                error = error or e
+    return insertadas, fallidas, error
+
+def cargar(modelo, registros, preparar, tamano_lote=TAMANO_LOTE, progreso=True,
+           en_conflicto=None, objetivo=None):
+    """
+    Inserta los registros en el modelo por lotes de 'tamano_lote' filas,
+    con una transacción por lote. Solo hay un lote en memoria cada vez.
+    Con 'en_conflicto' las filas que ya existen se ignoran ('ignorar') o
+    se actualizan con los campos indicados (ver con_upsert), así que
+    repetir una carga no hace fallar ningún lote.
+    Si un lote falla por integridad (p. ej. una clave duplicada) se repite
+    fila a fila y solo se descartan las filas que fallan.
+    Devuelve un diccionario con filas insertadas (o ya existentes, en modo
+    upsert), rechazadas (clave ajena inexistente o mal escrita), fallidas
+    (error de integridad), segundos y filas por segundo.
+    """
+    nombre = modelo.__name__
+    resultado = {'insertadas': 0, 'rechazadas': 0, 'fallidas': 0}
+    inicio = time.perf_counter()
+
+    with sesion():
+        for lote in por_lotes(registros, tamano_lote):
+            filas, rechazadas = preparar(lote)
+            resultado['rechazadas'] += rechazadas
+            if filas:
+                try:
+                    with db.atomic():
+                        _insertar(modelo, filas, en_conflicto, objetivo)
+                    resultado['insertadas'] += len(filas)
+                except IntegrityError:
+                    # Se repite el lote fila a fila para separar las que fallan
+                    insertadas, fallidas, error = _insertar_fila_a_fila(modelo, filas, en_conflicto, objetivo)
+                    resultado['insertadas'] += insertadas
+                    resultado['fallidas'] += fallidas
+                    print(f"[{nombre}] Error de integridad en {fallidas} de {len(filas)} filas del lote, "
+                          f"descartadas (por ejemplo: {error})")
+
+            if progreso:
+                segundos = time.perf_counter() - inicio
+                procesadas = sum(resultado.values())
+                print(f"[{nombre}] {procesadas} filas procesadas "
+                      f"({procesadas / segundos if segundos else 0:.0f} filas/s)")
+
+    resultado['segundos'] = time.perf_counter() - inicio
+    resultado['filas_por_segundo'] = (
+        resultado['insertadas'] / resultado['segundos'] if resultado['segundos'] else 0)
+    print(f"[{nombre}] Carga finalizada: {resultado['insertadas']} insertadas, "
+          f"{resultado['rechazadas']} rechazadas, {resultado['fallidas']} fallidas "
+          f"en {resultado['segundos']:.2f} s ({resultado['filas_por_segundo']:.0f} filas/s)")
+    return resultado
+
+def cargar_clientes(ruta, tamano_lote=TAMANO_LOTE, progreso=True, en_conflicto=None, objetivo=None):
+    return cargar(Cliente, leer_registros(ruta), preparar_sin_claves(Cliente),
+                  tamano_lote, progreso, en_conflicto, objetivo)
+
+def cargar_empleados(ruta, tamano_lote=TAMANO_LOTE, progreso=True, en_conflicto=None, objetivo=None):
+    return cargar(Empleado, leer_registros(ruta), preparar_sin_claves(Empleado),
+                  tamano_lote, progreso, en_conflicto, objetivo)
+
+def cargar_proyectos(ruta, tamano_lote=TAMANO_LOTE, progreso=True, en_conflicto=None, objetivo=None):
+    """
+    Los proyectos cuyo cliente no existe o cuyo jefe no existe
+    o no es jefe se rechazan.
+    """
+    preparar = lambda lote: _preparar_proyectos(_filas_modelo(Proyecto, lote))
+    return cargar(Proyecto, leer_registros(ruta), preparar, tamano_lote, progreso,
+                  en_conflicto, objetivo)
+
+def cargar_asignaciones(ruta, tamano_lote=TAMANO_LOTE, progreso=True, en_conflicto=None, objetivo=None):
+    """
+    Cada asignación identifica el proyecto por id_proyecto o por titulo_proyecto.
+    """
+    return cargar(EmpleadoProyecto, leer_registros(ruta), _preparar_asignaciones,
+                  tamano_lote, progreso, en_conflicto, objetivo)
+
+CARGADORES = {
+    'clientes': cargar_clientes,
+    'empleados': cargar_empleados,
+    'proyectos': cargar_proyectos,
+    'asignaciones': cargar_asignaciones,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Carga masiva de ficheros CSV/JSONL en la BD Empresa')
+    parser.add_argument('tabla', choices=list(CARGADORES))
+    parser.add_argument('fichero', help='Fichero .csv (con cabecera) o .jsonl')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote/transacción')
+    parser.add_argument('--sin-progreso', action='store_true', help='No mostrar el progreso por lote')
+    parser.add_argument('--en-conflicto',
+                        help="Upsert: 'ignorar' o lista de campos a actualizar separados por comas")
+    parser.add_argument('--objetivo', help='Campos únicos que definen el conflicto (solo SQLite), separados por comas')
+    args = parser.parse_args()
+
+    en_conflicto = args.en_conflicto
+    if en_conflicto and en_conflicto != IGNORAR:
+        en_conflicto = en_conflicto.split(',')
+    objetivo = args.objetivo.split(',') if args.objetivo else None
+
+    CARGADORES[args.tabla](args.fichero, tamano_lote=args.lote, progreso=not args.sin_progreso,
+                           en_conflicto=en_conflicto, objetivo=objetivo)
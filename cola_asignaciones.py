@@ -0,0 +1,293 @@
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, wait
+from peewee import *
+from conexion import db, sesion
+from crear_tablas import EmpleadoProyecto, IGNORAR, con_upsert
+
+# Cola de escritura diferida (write-behind) para las asignaciones
+# empleado-proyecto.
+# asignar() no escribe: deja la asignación en la cola y devuelve al momento
+# un Future. Un hilo escritor con su propia conexión vacía la cola en
+# INSERT de varias filas, un lote por transacción, cuando se juntan
+# 'tamano_lote' asignaciones o cuando la más antigua lleva 'intervalo'
+# segundos esperando, lo que pase antes. El Future se resuelve cuando su
+# lote ya está confirmado en la BD: quien necesite la asignación escrita
+# espera con future.result(); flush() espera a todo lo encolado hasta ese
+# momento.
+#
+# Resultado de cada petición (future.result()):
+#   INSERTADA   la asignación se ha escrito
+#   YA_EXISTIA  ya estaba en la BD: no se escribe otra vez
+#   DUPLICADA   repetía otra petición que seguía en la cola: se resuelve
+#               cuando se resuelve la original
+# Si la asignación no se puede escribir (empleado o proyecto inexistentes)
+# el Future lleva la excepción (IntegrityError); el resto del lote se
+# escribe igualmente.
+# El escritor abre una sesión por lote, así que una conexión perdida solo
+# afecta a su lote. Si el escritor no puede seguir (p. ej. no consigue
+# conectar), la cola se cierra: las asignaciones pendientes fallan con ese
+# error y asignar() lanza RuntimeError.
+
+TAMANO_LOTE = 500       # Asignaciones por INSERT y por transacción
+INTERVALO = 0.2         # Segundos que puede esperar una asignación en la cola
+MAX_PENDIENTES = 20000  # Con la cola llena, asignar() espera a que el escritor vacíe un lote
+
+INSERTADA = 'insertada'
+YA_EXISTIA = 'ya_existia'
+DUPLICADA = 'duplicada'
+
+CAMPOS = [EmpleadoProyecto.id_empleado, EmpleadoProyecto.id_proyecto]
+
+def _clave(valor):
+    return valor._pk if isinstance(valor, Model) else valor
+
+def _existentes(claves):
+    # Asignaciones de 'claves' que ya están en la BD
+    empleados = sorted({id_empleado for id_empleado, _ in claves})
+    proyectos = sorted({id_proyecto for _, id_proyecto in claves})
+    consulta = (EmpleadoProyecto
+                .select(*CAMPOS)
+                .where(EmpleadoProyecto.id_empleado.in_(empleados) &
+                       EmpleadoProyecto.id_proyecto.in_(proyectos))
+                .tuples())
+    return set(consulta) & set(claves)
+
+def _insertar(claves):
+    """
+    Escribe las asignaciones en una transacción. Devuelve {clave: resultado}.
+    """
+    with db.atomic():
+        existentes = _existentes(claves)
+        nuevas = [clave for clave in claves if clave not in existentes]
+        if nuevas:
+            # Si otro proceso escribe la misma asignación entre tanto, se ignora
+            con_upsert(EmpleadoProyecto.insert_many(nuevas, fields=CAMPOS), IGNORAR).execute()
+    return {clave: YA_EXISTIA if clave in existentes else INSERTADA for clave in claves}
+
+class ColaAsignaciones:
+    """
+    Cola de escritura diferida de asignaciones empleado-proyecto (ver el
+    comentario del módulo). Se puede usar como 'with ColaAsignaciones() as cola:';
+    al salir se escribe todo lo pendiente y se para el hilo escritor.
+    """
+    def __init__(self, tamano_lote=TAMANO_LOTE, intervalo=INTERVALO, max_pendientes=MAX_PENDIENTES):
+        if tamano_lote < 1 or max_pendientes < tamano_lote:
+            raise ValueError("Hace falta 1 <= tamano_lote <= max_pendientes")
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        # recibidas, duplicadas, insertadas, ya_existian, fallidas y lotes escritos
+        self.estadisticas = Counter()
+        self._condicion = threading.Condition()
+        self._pendientes = {}   # (id_empleado, id_proyecto) -> (Future, instante en que se encoló)
+        self._en_vuelo = {}     # Lote que está escribiendo el hilo: (id_empleado, id_proyecto) -> Future
+        self._vaciar = False
+        self._cerrada = False
+        self._error = None      # Error que ha parado el hilo escritor
+        self._escritor = threading.Thread(target=self._escribir_lotes, name='cola-asignaciones', daemon=True)
+        self._escritor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    # --- Productores ---
+    def asignar(self, id_empleado, id_proyecto):
+        """
+        Encola la asignación y devuelve un Future con su resultado
+        (INSERTADA, YA_EXISTIA o DUPLICADA), que se resuelve cuando está
+        escrita. Acepta claves o instancias de Empleado y Proyecto.
+        """
+        clave = (_clave(id_empleado), _clave(id_proyecto))
+        with self._condicion:
+            while not self._cerrada and len(self._pendientes) >= self.max_pendientes:
+                self._condicion.wait()
+            if self._cerrada:
+                raise RuntimeError("La cola de asignaciones está cerrada") from self._error
+            self.estadisticas['recibidas'] += 1
+
+            if clave in self._pendientes:
+                original = self._pendientes[clave][0]
+            else:
+                original = self._en_vuelo.get(clave)
+            if original is not None:
+                self.estadisticas['duplicadas'] += 1
+                return self._duplicada(original)
+
+            futuro = Future()
+            self._pendientes[clave] = (futuro, time.monotonic())
+            # Avisa al escritor cuando empieza a correr el plazo y cuando hay un lote lleno
+            if len(self._pendientes) == 1 or len(self._pendientes) >= self.tamano_lote:
+                self._condicion.notify_all()
+            return futuro
+
+    def asignar_varias(self, asignaciones):
+        """
+        Encola los pares (id_empleado, id_proyecto) y devuelve sus Future.
+        """
+        return [self.asignar(id_empleado, id_proyecto) for id_empleado, id_proyecto in asignaciones]
+
+    @staticmethod
+    def _duplicada(original):
+        # Se resuelve con la original: al terminar, la asignación ya está escrita
+        futuro = Future()
+        def resolver(hecho):
+            if hecho.exception() is not None:
+                futuro.set_exception(hecho.exception())
+            else:
+                futuro.set_result(DUPLICADA)
+        original.add_done_callback(resolver)
+        return futuro
+
+    def flush(self, timeout=None):
+        """
+        Escribe ya todo lo encolado hasta ahora y espera a que esté
+        confirmado (como mucho 'timeout' segundos). Devuelve un Counter con
+        los resultados de esas peticiones ('fallida' las que no se han
+        podido escribir, 'sin_terminar' si se agotó el tiempo).
+        """
+        with self._condicion:
+            futuros = [futuro for futuro, _ in self._pendientes.values()] + list(self._en_vuelo.values())
+            if self._pendientes:
+                self._vaciar = True
+                self._condicion.notify_all()
+        hechos, sin_terminar = wait(futuros, timeout)
+        resultados = Counter('fallida' if futuro.exception() is not None else futuro.result()
+                             for futuro in hechos)
+        if sin_terminar:
+            resultados['sin_terminar'] = len(sin_terminar)
+        return resultados
+
+    def cerrar(self, timeout=None):
+        """
+        Deja de aceptar asignaciones, escribe las pendientes y para el hilo
+        escritor.
+        """
+        with self._condicion:
+            self._cerrada = True
+            self._condicion.notify_all()
+        self._escritor.join(timeout)
+
+    def pendientes(self):
+        """
+        Asignaciones encoladas o en escritura que aún no están confirmadas.
+        """
+        with self._condicion:
+            return len(self._pendientes) + len(self._en_vuelo)
+
+    # --- Hilo escritor ---
+    def _espera(self):
+        # None: esperar sin límite; 0: hay un lote listo
+        if not self._pendientes:
+            return 0 if self._cerrada else None
+        if self._vaciar or self._cerrada or len(self._pendientes) >= self.tamano_lote:
+            return 0
+        _, primera = next(iter(self._pendientes.values()))
+        return max(0.0, primera + self.intervalo - time.monotonic())
+
+    def _siguiente_lote(self):
+        with self._condicion:
+            while True:
+                espera = self._espera()
+                if espera == 0:
+                    break
+                self._condicion.wait(espera)
+            if not self._pendientes:
+                return None     # Cerrada y sin nada pendiente
+
+            # Las más antiguas primero (los dict conservan el orden de llegada)
+            claves = list(self._pendientes)[:self.tamano_lote]
+            self._en_vuelo = {clave: self._pendientes.pop(clave)[0] for clave in claves}
+            if not self._pendientes:
+                self._vaciar = False
+            # Hay sitio: los productores que esperaban pueden seguir
+            self._condicion.notify_all()
+            return dict(self._en_vuelo)
+
+    def _escribir_lotes(self):
+        try:
+            while True:
+                lote = self._siguiente_lote()
+                if lote is None:
+                    return
+                # Una sesión por lote: tras perder la conexión, el siguiente
+                # lote abre otra
+                with sesion():
+                    resultados = self._escribir(list(lote))
+                # Los Future se resuelven con el lote ya confirmado
+                for clave, futuro in lote.items():
+                    resultado = resultados[clave]
+                    if isinstance(resultado, Exception):
+                        self.estadisticas['fallidas'] += 1
+                        futuro.set_exception(resultado)
+                    else:
+                        self.estadisticas['insertadas' if resultado == INSERTADA else 'ya_existian'] += 1
+                        futuro.set_result(resultado)
+                with self._condicion:
+                    self._en_vuelo = {}
+                    self.estadisticas['lotes'] += 1
+        except Exception as e:
+            self._abortar(e)
+
+    def _abortar(self, error):
+        # El escritor no puede seguir: se cierra la cola y todo lo que
+        # esperaba (encolado o en escritura) falla con el error
+        with self._condicion:
+            self._cerrada = True
+            self._error = error
+            futuros = [futuro for futuro, _ in self._pendientes.values()] + list(self._en_vuelo.values())
+            self._pendientes = {}
+            self._en_vuelo = {}
+            self._condicion.notify_all()
+        for futuro in futuros:
+            if not futuro.done():
+                self.estadisticas['fallidas'] += 1
+                futuro.set_exception(error)
+
+    def _escribir(self, claves):
+        """
+        {clave: resultado o excepción} de escribir el lote. Si el lote falla
+        por integridad se repite fila a fila para separar las que fallan.
+        """
+        try:
+            return _insertar(claves)
+        except IntegrityError:
+            pass
+        except Exception as e:
+            return {clave: e for clave in claves}
+
+        resultados = {}
+        for clave in claves:
+            try:
+                resultados.update(_insertar([clave]))
+            except Exception as e:
+                resultados[clave] = e
+        return resultados
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Asignar empleados a proyectos con la cola de escritura diferida')
+    parser.add_argument('asignaciones', nargs='+', metavar='DNI:ID_PROYECTO',
+                        help='Asignaciones a escribir, p. ej. 22222222Y:1')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Asignaciones por INSERT')
+    args = parser.parse_args()
+
+    pares = []
+    for texto in args.asignaciones:
+        dni, _, id_proyecto = texto.partition(':')
+        if not dni or not id_proyecto.isdigit():
+            parser.error(f"Asignación no válida: '{texto}' (usar DNI:ID_PROYECTO)")
+        pares.append((dni, int(id_proyecto)))
+
+    with ColaAsignaciones(tamano_lote=args.lote) as cola:
+        futuros = cola.asignar_varias(pares)
+    for (dni, id_proyecto), futuro in zip(pares, futuros):
+        if futuro.exception() is not None:
+            print(f"{dni} -> {id_proyecto}: error ({futuro.exception()})")
+        else:
+            print(f"{dni} -> {id_proyecto}: {futuro.result()}")
+    print(dict(cola.estadisticas))
@@ -0,0 +1,112 @@
+import contextlib
+import os
+import re
+from playhouse.test_utils import count_queries
+import conexion
+from conexion import db, sesion
+import consultas
+import inserciones
+import actualizacion_borrado
+
+# Comprobador de índices: ejecuta cada operación del proyecto dentro de
+# una transacción que se deshace al final, captura las sentencias que lanza
+# y pasa cada una por EXPLAIN para detectar recorridos completos de tabla.
+
+# Solo se analizan estas sentencias (los INSERT no recorren tablas)
+SENTENCIAS_ANALIZADAS = ('SELECT', 'UPDATE', 'DELETE')
+
+# Recorridos completos inevitables: los informes listan todas las filas
+# de estas tablas, así que un índice no evitaría leerlas
+ESCANEOS_ESPERADOS = {
+    'consulta_1': {'clientes', 'proyectos'},
+    'consulta_2': {'proyectos', 'empleados_proyecto'},
+    'consulta_3': {'clientes', 'proyectos'},
+    'consulta_4': {'proyectos', 'empleados_proyecto'},
+    'consulta_5': {'clientes', 'proyectos'},
+    # Borrar los clientes sin proyectos exige revisar todos los clientes
+    'eliminar_clientes_sin_proyectos': {'clientes'},
+}
+
+_RE_ALIAS = re.compile(r'[`"](\w+)[`"] AS [`"](\w+)[`"]')
+
+def operaciones():
+    """
+    Lista de (nombre, función, argumentos) con todas las operaciones
+    de consultas.py, inserciones.py y actualizacion_borrado.py.
+    """
+    lista = [(f'consulta_{n}', getattr(consultas, f'consulta_{n}'), ()) for n in range(1, 6)]
+    lista += [(nombre, getattr(inserciones, nombre), ()) for nombre in (
+        'insertar_clientes', 'insertar_empleados', 'insertar_proyecto',
+        'asignar_empleado_a_proyecto', 'insertar_proyectos_prueba')]
+    lista += actualizacion_borrado.operaciones_escritura()
+    return lista
+
+def capturar_sentencias(funcion, *args):
+    """
+    Ejecuta la función sin dejar cambios en la BD y devuelve la lista
+    de (sql, params) que ha lanzado.
+    """
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), sesion():
+        with count_queries() as contador:
+            with db.atomic() as transaccion:
+                try:
+                    funcion(*args)
+                finally:
+                    transaccion.rollback()
+    return [registro.msg for registro in contador.get_queries()]
+
+def tablas_recorridas(sql, params):
+    """
+    Devuelve las tablas que el plan de ejecución recorre completas.
+    """
+    alias = {alias: tabla for tabla, alias in _RE_ALIAS.findall(sql)}
+    recorridas = set()
+
+    if conexion.BACKEND == 'sqlite':
+        # Filas (id, padre, -, detalle); 'SCAN t1' es un recorrido completo,
+        # 'SEARCH ...' o 'SCAN ... USING INDEX' usan índice
+        for fila in db.execute_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+            detalle = fila[-1]
+            if detalle.startswith('SCAN ') and 'INDEX' not in detalle:
+                nombre = detalle.split()[1]
+                recorridas.add(alias.get(nombre, nombre))
+    else:
+        # En MySQL type = 'ALL' es un recorrido completo
+        cursor = db.execute_sql('EXPLAIN ' + sql, params)
+        columnas = [columna[0] for columna in cursor.description]
+        for fila in cursor.fetchall():
+            plan = dict(zip(columnas, fila))
+            if plan.get('type') == 'ALL' and plan.get('table'):
+                recorridas.add(alias.get(plan['table'], plan['table']))
+
+    # Solo interesan las tablas reales, no las subconsultas derivadas
+    tablas = set(db.get_tables())
+    return {tabla for tabla in recorridas if tabla in tablas}
+
+def comprobar_indices():
+    """
+    Analiza todas las operaciones y devuelve la lista de recorridos
+    completos no esperados como (operacion, tabla, sql).
+    """
+    hallazgos = []
+    with sesion():
+        for nombre, funcion, args in operaciones():
+            esperados = ESCANEOS_ESPERADOS.get(nombre, set())
+            for sql, params in capturar_sentencias(funcion, *args):
+                if not sql.lstrip().upper().startswith(SENTENCIAS_ANALIZADAS):
+                    continue
+                for tabla in sorted(tablas_recorridas(sql, params)):
+                    if tabla in esperados:
+                        continue
+                    hallazgos.append((nombre, tabla, sql))
+                    print(f"[{nombre}] Recorrido completo de '{tabla}':\n    {sql}")
+
+    if hallazgos:
+        print(f"\n{len(hallazgos)} recorridos completos de tabla sin índice.")
+    else:
+        print("\nNingún recorrido completo de tabla inesperado.")
+    return hallazgos
+
+if __name__ == '__main__':
+    if comprobar_indices():
+        raise SystemExit(1)
@@ -1,27 +1,435 @@
-from peewee import MySQLDatabase
+import configparser
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import quote
+from peewee import Cast, InterfaceError, OperationalError, SqliteDatabase, fn
+from playhouse.pool import PooledMySQLDatabase
 
 # Configuración de la conexión a la BD
-# MODIFICAR CREDENCIALES ANTES DE USAR
-DB_NAME = 'Empresa'
-DB_USER = 'ayoze'
-DB_PASS = '9978'
-DB_HOST = '127.0.0.1'       # IP de MySQL
-DB_PORT = 3306              # Puerto de MySQL
-
-db = MySQLDatabase(
-    DB_NAME,
-    user=DB_USER,
-    password=DB_PASS,
-    host=DB_HOST,
-    port=DB_PORT
-)
+# Los valores se leen, por orden de prioridad, de:
+#   1. Variables de entorno EMPRESA_DB_* (p. ej. EMPRESA_DB_USER)
+#   2. Sección [bd] del fichero INI indicado en EMPRESA_DB_CONFIG
+#   3. Los valores por defecto de CONFIG_POR_DEFECTO
+CONFIG_POR_DEFECTO = {
+    'backend': 'mysql',         # 'mysql' o 'sqlite' (ejecuciones locales y benchmarks)
+    'name': 'Empresa',          # En SQLite es la ruta del fichero (o ':memory:')
+    'user': 'root',
+    'pass': '',
+    'host': '127.0.0.1',        # IP de MySQL
+    'port': '3306',             # Puerto de MySQL
+    'max_conexiones': '20',     # Tamaño máximo del pool
+    'stale_timeout': '300',     # Segundos tras los que se recicla una conexión
+    'timeout_espera': '10',     # Segundos esperando una conexión libre del pool
+    'borrado_cascada': '0',     # 1 = las FK hacia clientes y proyectos se crean con ON DELETE CASCADE
+    'replicas': '',             # Réplicas de lectura separadas por comas: ficheros (SQLite) o host[:puerto] (MySQL)
+    'retraso_replicas': '1',    # Segundos tras una escritura en los que el hilo sigue leyendo del primario
+    'reintento_replicas': '30', # Segundos sin usar una réplica que ha fallado
+}
+
+def leer_configuracion():
+    """
+    Devuelve un diccionario con la configuración de la BD combinando
+    valores por defecto, fichero INI y variables de entorno.
+    """
+    config = dict(CONFIG_POR_DEFECTO)
+
+    ruta_fichero = os.environ.get('EMPRESA_DB_CONFIG')
+    if ruta_fichero:
+        parser = configparser.ConfigParser()
+        parser.read(ruta_fichero, encoding='utf-8')
+        if parser.has_section('bd'):
+            config.update(parser.items('bd'))
+
+    for clave in CONFIG_POR_DEFECTO:
+        valor = os.environ.get(f'EMPRESA_DB_{clave.upper()}')
+        if valor is not None:
+            config[clave] = valor
+
+    return config
+
+class MySQLConCursorServidor(PooledMySQLDatabase):
+    """
+    Pool MySQL que, dentro de cursor_servidor(), entrega cursores sin
+    buffer (SSCursor de pymysql): las filas se leen del socket a medida
+    que se piden en lugar de copiarse todas a memoria al ejecutar.
+    """
+    def cursor(self, *args, **kwargs):
+        if not getattr(_sesion, 'cursor_servidor', False):
+            return super().cursor(*args, **kwargs)
+        from pymysql.cursors import SSCursor
+        if self.is_closed():
+            self.connect()
+        return self._state.conn.cursor(SSCursor)
+
+def crear_bd(config):
+    """
+    Crea el objeto de base de datos a partir de la configuración.
+    En MySQL se usa un pool de conexiones: conectar_bd() toma una
+    conexión del pool y cerrar_bd() la devuelve. Antes de entregar
+    una conexión reutilizada el pool hace un ping para comprobar que
+    sigue viva y descarta las que superan el stale_timeout.
+    """
+    backend = config['backend'].lower()
+
+    if backend == 'sqlite':
+        # Un nombre 'file:...' es una URI de sqlite3 (lo usan las réplicas)
+        return SqliteDatabase(config['name'], uri=config['name'].startswith('file:'), pragmas={
+            'foreign_keys': 1,
+            'journal_mode': 'wal',
+        })
+
+    if backend == 'mysql':
+        return MySQLConCursorServidor(
+            config['name'],
+            user=config['user'],
+            password=config['pass'],
+            host=config['host'],
+            port=int(config['port']),
+            max_connections=int(config['max_conexiones']),
+            stale_timeout=int(config['stale_timeout']),
+            timeout=int(config['timeout_espera'])
+        )
+
+    raise ValueError(f"Backend de base de datos no soportado: '{backend}'")
+
+CONFIG = leer_configuracion()
+BACKEND = CONFIG['backend'].lower()
+DB_NAME = CONFIG['name']
+BORRADO_CASCADA = CONFIG['borrado_cascada'].strip().lower() in ('1', 'true', 'si', 'sí')
+
+db = crear_bd(CONFIG)
+
+# Funciones que se llaman tras cambiar_base() (p. ej. para olvidar lo que
+# se sabía de la base anterior)
+_avisos_cambio_base = []
+
+def al_cambiar_base(funcion):
+    """
+    Registra funcion() para que se llame cada vez que cambiar_base() apunta
+    db a otra base. Se puede usar como decorador.
+    """
+    _avisos_cambio_base.append(funcion)
+    return funcion
+
+def cambiar_base(nombre):
+    """
+    Apunta el db compartido a otra base de datos del mismo servidor (en
+    SQLite, a otro fichero), con el resto de la configuración igual.
+    Cierra la conexión del hilo y, en MySQL, vacía el pool, porque sus
+    conexiones son de la base anterior. Afecta a todo el proceso: no debe
+    usarse con otros hilos trabajando contra la BD.
+    """
+    global DB_NAME
+    # Las réplicas son de la base anterior: se deja de leer de ellas
+    configurar_replicas([])
+    if not db.is_closed():
+        db.close()
+    if hasattr(db, 'close_all'):
+        db.close_all()
+    db.init(nombre)
+    DB_NAME = nombre
+    for aviso in _avisos_cambio_base:
+        aviso()
+
+def dias_entre(fecha_inicio, fecha_fin):
+    """
+    Expresión SQL con los días transcurridos entre dos fechas,
+    adaptada al backend configurado.
+    """
+    if BACKEND == 'sqlite':
+        return Cast(fn.julianday(fecha_fin) - fn.julianday(fecha_inicio), 'INTEGER')
+    return fn.DATEDIFF(fecha_fin, fecha_inicio)
+
+# --- Sesión / unidad de trabajo ---
+# Estado por hilo: cuántas sesiones anidadas hay abiertas en este hilo.
+_sesion = threading.local()
+
+def en_sesion():
+    """
+    Indica si el hilo actual está dentro de una sesión abierta con sesion().
+    """
+    return getattr(_sesion, 'profundidad', 0) > 0
+
+@contextmanager
+def sesion(transaccion=False):
+    """
+    Abre una sesión que comparten todas las funciones llamadas dentro de ella.
+    Mientras la sesión está abierta, conectar_bd() y cerrar_bd() reutilizan
+    la conexión de la sesión en lugar de abrir y cerrar una propia.
+    Con transaccion=True todo el bloque se ejecuta en una única transacción
+    (los db.atomic() internos pasan a ser savepoints).
+    Se puede usar como 'with sesion():' o como decorador '@sesion()'.
+    """
+    # Solo se cierra al salir la conexión que haya abierto la propia sesión
+    abre_conexion = not en_sesion() and db.is_closed()
+    if abre_conexion:
+        db.connect(reuse_if_open=True)
+    _sesion.profundidad = getattr(_sesion, 'profundidad', 0) + 1
+    try:
+        if transaccion:
+            with db.atomic():
+                yield db
+        else:
+            yield db
+    finally:
+        _sesion.profundidad -= 1
+        if not en_sesion():
+            _sesion.escribio = False
+            enrutador.cerrar_replicas()
+        if abre_conexion and not db.is_closed():
+            db.close()
+
+@contextmanager
+def cursor_servidor():
+    """
+    Las sentencias ejecutadas en este hilo dentro del bloque usan un cursor
+    de servidor (sin buffer) en MySQL. En SQLite no cambia nada: sqlite3 ya
+    va leyendo las filas según se piden.
+    Mientras no se termine de leer ese cursor no se puede lanzar ninguna
+    otra sentencia por la misma conexión.
+    """
+    anterior = getattr(_sesion, 'cursor_servidor', False)
+    _sesion.cursor_servidor = True
+    try:
+        yield
+    finally:
+        _sesion.cursor_servidor = anterior
+
+# --- Réplicas de lectura ---
+class EnrutadorLecturas:
+    """
+    Reparte las lecturas entre el primario (db) y las réplicas. Una lectura
+    va al primario si el hilo está en una transacción, si ha escrito en la
+    sesión actual o hace menos de 'retraso' segundos (así ve lo que acaba de
+    escribir aunque la réplica vaya por detrás) o si no hay ninguna réplica
+    disponible; si no, a la siguiente réplica por turno. Una réplica que
+    falla al conectar o al ejecutar se aparta durante 'reintento' segundos
+    y esa lectura se repite en el primario.
+    El resto de atributos son los del primario, así que se puede pasar
+    como base de datos de cualquier consulta de lectura.
+    """
+    def __init__(self, primario, replicas=None, retraso=1.0, reintento=30.0):
+        self.primario = primario
+        self.replicas = dict(replicas or {})    # nombre -> Database
+        self.retraso = retraso
+        self.reintento = reintento
+        self.lecturas = Counter()               # nombre (o 'primario') -> lecturas
+        self._apartadas = {}                    # nombre -> instante en que se vuelve a probar
+        self._turno = itertools.count()
+        self._bloqueo = threading.Lock()
+
+    def __getattr__(self, nombre):
+        return getattr(self.primario, nombre)
+
+    def _leer_del_primario(self):
+        if self.primario.in_transaction() or getattr(_sesion, 'escribio', False):
+            return True
+        if getattr(_sesion, 'escritura_en_transaccion', False):
+            # La transacción de la última escritura ya ha terminado: el
+            # retraso de las réplicas cuenta desde ahora, no desde la escritura
+            _sesion.escritura_en_transaccion = False
+            _sesion.ultima_escritura = time.monotonic()
+        return time.monotonic() - getattr(_sesion, 'ultima_escritura', float('-inf')) < self.retraso
+
+    def _siguiente_replica(self):
+        nombres = list(self.replicas)
+        ahora = time.monotonic()
+        for _ in nombres:
+            nombre = nombres[next(self._turno) % len(nombres)]
+            if self._apartadas.get(nombre, 0) <= ahora:
+                return nombre
+        return None
+
+    def _apartar(self, nombre):
+        with self._bloqueo:
+            self._apartadas[nombre] = time.monotonic() + self.reintento
+        replica = self.replicas[nombre]
+        try:
+            replica.close()
+        except Exception:
+            pass
+
+    def _contar(self, nombre):
+        with self._bloqueo:
+            self.lecturas[nombre] += 1
+
+    def destino(self):
+        """
+        Nombre de la réplica que atendería ahora una lectura de este hilo,
+        o 'primario'.
+        """
+        if not self.replicas or self._leer_del_primario():
+            return 'primario'
+        return self._siguiente_replica() or 'primario'
+
+    def _leer(self, ejecutar):
+        fijo = getattr(_sesion, 'lectura_fija', None)
+        if fijo is not None:
+            # Dentro de lectura_consistente() no se cambia de destino aunque
+            # falle: mezclar réplicas daría datos incoherentes entre sí
+            nombre, bd = fijo
+            self._contar(nombre)
+            return ejecutar(bd)
+        nombre = self.destino()
+        if nombre != 'primario':
+            try:
+                cursor = ejecutar(self.replicas[nombre])
+            except (OperationalError, InterfaceError):
+                self._apartar(nombre)
+            else:
+                self._contar(nombre)
+                return cursor
+        self._contar('primario')
+        return ejecutar(self.primario)
+
+    def execute(self, query, **opciones):
+        return self._leer(lambda bd: bd.execute(query, **opciones))
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        return self._leer(lambda bd: bd.execute_sql(sql, params, *args, **kwargs))
+
+    @contextmanager
+    def fijar(self):
+        """
+        Las lecturas de este hilo dentro del bloque van todas al mismo
+        destino (la réplica que toque por turno, o el primario) y dentro de
+        una transacción, así que ven la misma versión de los datos.
+        """
+        if getattr(_sesion, 'lectura_fija', None) is not None:
+            yield
+            return
+        nombre = self.destino()
+        if nombre != 'primario':
+            try:
+                self.replicas[nombre].connect(reuse_if_open=True)
+            except (OperationalError, InterfaceError):
+                self._apartar(nombre)
+                nombre = 'primario'
+        bd = self.primario if nombre == 'primario' else self.replicas[nombre]
+        _sesion.lectura_fija = (nombre, bd)
+        try:
+            with bd.atomic():
+                yield
+        finally:
+            _sesion.lectura_fija = None
+
+    def apartadas(self):
+        """
+        Réplicas que se han dejado de usar por un fallo y aún no se han
+        vuelto a probar.
+        """
+        ahora = time.monotonic()
+        return [nombre for nombre, hasta in self._apartadas.items() if hasta > ahora]
+
+    def cerrar_replicas(self):
+        # Conexiones de este hilo a las réplicas
+        for replica in self.replicas.values():
+            if not replica.is_closed():
+                replica.close()
+
+def _config_replica(config, replica):
+    """
+    Configuración de una réplica: la del primario con otro fichero (SQLite)
+    u otro host[:puerto] (MySQL).
+    """
+    config = dict(config)
+    if config['backend'].lower() == 'sqlite':
+        # mode=rw: si el fichero no existe falla la conexión en lugar de
+        # crear una BD vacía
+        config['name'] = f"file:{quote(replica)}?mode=rw"
+    else:
+        host, _, puerto = replica.partition(':')
+        config['host'] = host
+        config['port'] = puerto or config['port']
+    return config
+
+# Funciones a las que se pasa cada réplica que se crea (p. ej. la
+# instrumentación, que también tiene que medir las lecturas de las réplicas)
+_avisos_replicas = []
+
+def al_crear_replica(funcion):
+    """
+    Registra funcion(replica) para que se llame con cada réplica nueva.
+    Se puede usar como decorador.
+    """
+    _avisos_replicas.append(funcion)
+    return funcion
+
+def configurar_replicas(replicas):
+    """
+    Sustituye las réplicas de lectura por las indicadas (ficheros en SQLite,
+    host[:puerto] en MySQL; una lista vacía hace que todo se lea del
+    primario). Pensada para pruebas locales con varios ficheros SQLite y
+    para cambiar_base().
+    """
+    enrutador.cerrar_replicas()
+    enrutador.replicas = {replica: crear_bd(_config_replica(CONFIG, replica)) for replica in replicas}
+    enrutador._apartadas.clear()
+    for replica in enrutador.replicas.values():
+        for aviso in _avisos_replicas:
+            aviso(replica)
+
+def sincronizar_replicas():
+    """
+    Solo SQLite: copia el primario sobre cada réplica con la API de backup
+    de sqlite3. En las pruebas locales hace las veces de la replicación.
+    """
+    if BACKEND != 'sqlite':
+        raise ValueError("sincronizar_replicas() es solo para SQLite: en MySQL replica el servidor")
+    enrutador.cerrar_replicas()
+    with sesion():
+        for replica in enrutador.replicas:
+            destino = sqlite3.connect(replica)
+            try:
+                db.connection().backup(destino)
+            finally:
+                destino.close()
+
+def lectura_consistente():
+    """
+    Bloque de lecturas que deben ver los mismos datos (p. ej. varias
+    consultas cuyos resultados se cruzan entre sí): todas van al mismo
+    destino y en una única transacción. Ver EnrutadorLecturas.fijar().
+    """
+    return enrutador.fijar()
+
+def bd_lectura():
+    """
+    Base de datos para las consultas de solo lectura: el enrutador si hay
+    réplicas configuradas y db si no.
+    """
+    return enrutador if enrutador.replicas else db
+
+def marcar_escritura():
+    """
+    Anota que el hilo actual acaba de escribir en el primario: sus lecturas
+    siguen yendo al primario hasta que acabe la sesión, o durante
+    retraso_replicas segundos si no hay sesión.
+    """
+    _sesion.ultima_escritura = time.monotonic()
+    _sesion.escritura_en_transaccion = db.in_transaction()
+    if en_sesion():
+        _sesion.escribio = True
+
+enrutador = EnrutadorLecturas(db, retraso=float(CONFIG['retraso_replicas']),
+                              reintento=float(CONFIG['reintento_replicas']))
+configurar_replicas([replica.strip() for replica in CONFIG['replicas'].split(',') if replica.strip()])
 
 def conectar_bd():
     """
     Intenta conectar a la base de datos "Empresa" utilizando try-except.
+    Con el pool de MySQL la conexión se toma prestada del pool.
+    Dentro de una sesión se reutiliza la conexión de la sesión.
     """
+    if en_sesion():
+        return True
     try:
-        db.connect()
+        db.connect(reuse_if_open=True)
         print(f"Conexión exitosa a la base de datos '{DB_NAME}'")
         return True
     except Exception as e:
@@ -31,7 +439,12 @@ def conectar_bd():
 def cerrar_bd():
     """
     Cierra la conexión a la base de datos.
+    Con el pool de MySQL la conexión se devuelve al pool.
+    Dentro de una sesión no hace nada: la cierra la propia sesión.
     """
+    if en_sesion():
+        return
+    enrutador.cerrar_replicas()
     if not db.is_closed():
         db.close()
-        print(f"Conexión a '{DB_NAME}' cerrada.")
\ No newline at end of file
+        print(f"Conexión a '{DB_NAME}' cerrada.")
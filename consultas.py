@@ -1,89 +1,299 @@
 from peewee import *
-from conexion import conectar_bd, cerrar_bd
-from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+from conexion import conectar_bd, cerrar_bd, cursor_servidor, dias_entre, sesion
+from crear_tablas import Cliente, Empleado
+from archivo import fuente_proyectos, fuente_asignaciones, seleccionar
+from decimal import Decimal
+import argparse
+import csv
 import datetime
+import json
+import os
 
-def consulta_1():
+# --- Presupuesto de consultas ---
+# Cada informe declara cuántas sentencias SQL puede lanzar como máximo.
+# El número es fijo: no depende de cuántos clientes o proyectos haya.
+# Lo comprueban las pruebas (tests/test_consultas.py) con assert_query_count.
+def presupuesto_consultas(maximo):
+    """
+    Decorador que declara el presupuesto de consultas de un informe en
+    el atributo 'presupuesto_consultas' de la función.
+    """
+    def decorador(funcion):
+        funcion.presupuesto_consultas = maximo
+        return funcion
+    return decorador
+
+# --- Informes en streaming ---
+# filas_consulta_N() genera las filas del informe N como namedtuples de una
+# en una: no se construyen instancias de modelo ni se guarda el resultado.
+# En MySQL se leen con un cursor de servidor, así que la memoria no crece
+# con el tamaño de las tablas y la primera fila llega en cuanto la BD la
+# produce. Mientras se recorre un informe no se puede lanzar otra sentencia
+# por la misma conexión: hay que consumirlo entero (o cerrarlo) antes.
+def _en_streaming(consulta):
+    with sesion():
+        with cursor_servidor():
+            filas = consulta.namedtuples().execute()
+        try:
+            yield from filas.iterator()
+        finally:
+            # En MySQL cerrar el cursor descarta las filas que queden por leer
+            filas.cursor.close()
+
+CENTIMO = Decimal('0.01')
+
+def _total_decimal(valor):
+    # COALESCE no conserva la conversión de DecimalField: SQLite suma los
+    # DECIMAL como REAL y el total se redondea a los céntimos de presupuesto
+    if isinstance(valor, float):
+        return Decimal(str(valor)).quantize(CENTIMO)
+    return valor if isinstance(valor, Decimal) else Decimal(valor)
+
+# --- SELECT de cada informe ---
+# Con 'clientes' o 'proyectos' el informe se limita a esas claves (lo usa
+# el refresco incremental de cambios.py); las filas de cada clave salen
+# iguales que en el informe completo.
+def select_informe_1(archivo=False, clientes=None):
+    proyectos, P = fuente_proyectos(archivo)
+    # LEFT JOIN + GROUP BY: los clientes sin proyectos salen con total 0
+    total_presupuesto = fn.COALESCE(fn.SUM(P.presupuesto), 0).python_value(_total_decimal)
+    consulta = (Cliente
+                .select(Cliente.nombre_cliente, total_presupuesto.alias('total'))
+                .join(proyectos, JOIN.LEFT_OUTER, on=(P.id_cliente == Cliente.dni_cif))
+                .group_by(Cliente.dni_cif, Cliente.nombre_cliente)
+                .order_by(Cliente.dni_cif))
+    if clientes is not None:
+        consulta = consulta.where(Cliente.dni_cif.in_(list(clientes)))
+    return consulta
+
+def select_informe_2(archivo=False, proyectos=None):
+    # Ventana COUNT(*) OVER (PARTITION BY id_empleado): el total de proyectos
+    # de cada empleado se calcula en la misma pasada sobre la tabla M:N
+    elegidos = proyectos
+    proyectos, P = fuente_proyectos(archivo)
+    asignaciones, A = fuente_asignaciones(archivo)
+    num_proyectos = fn.COUNT(SQL('*')).over(partition_by=[A.id_empleado])
+    participaciones = seleccionar(asignaciones, A.id_empleado, A.id_proyecto,
+                                  num_proyectos.alias('num_proyectos'))
+    if elegidos is not None:
+        # Todas las asignaciones de los empleados de esos proyectos: la
+        # ventana tiene que seguir contando sus proyectos en todo el informe
+        empleados, E = fuente_asignaciones(archivo)
+        participaciones = participaciones.where(A.id_empleado.in_(
+            seleccionar(empleados, E.id_empleado).where(E.id_proyecto.in_(list(elegidos)))))
+    participaciones = participaciones.alias('participaciones')
+
+    consulta = (seleccionar(proyectos, P.id_proyecto, P.titulo_proyecto,
+                            Empleado.nombre.alias('nombre_empleado'),
+                            participaciones.c.num_proyectos)
+                .join(participaciones, JOIN.LEFT_OUTER,
+                      on=(participaciones.c.id_proyecto == P.id_proyecto))
+                .join(Empleado, JOIN.LEFT_OUTER,
+                      on=(Empleado.dni == participaciones.c.id_empleado))
+                .order_by(P.id_proyecto, Empleado.dni))
+    if elegidos is not None:
+        consulta = consulta.where(P.id_proyecto.in_(list(elegidos)))
+    return consulta
+
+def select_informe_3(archivo=False, clientes=None):
+    # ROW_NUMBER() por cliente ordenado por presupuesto; a igualdad gana el de menor id
+    proyectos, P = fuente_proyectos(archivo)
+    posicion = fn.ROW_NUMBER().over(
+        partition_by=[P.id_cliente],
+        order_by=[P.presupuesto.desc(), P.id_proyecto])
+    ranking = seleccionar(proyectos, P.id_cliente, P.titulo_proyecto,
+                          P.presupuesto, posicion.alias('posicion'))
+    if clientes is not None:
+        ranking = ranking.where(P.id_cliente.in_(list(clientes)))
+    ranking = ranking.alias('ranking')
+
+    consulta = (Cliente
+                .select(Cliente.nombre_cliente, ranking.c.titulo_proyecto, ranking.c.presupuesto)
+                .join(ranking, JOIN.LEFT_OUTER,
+                      on=((ranking.c.id_cliente == Cliente.dni_cif) & (ranking.c.posicion == 1)))
+                .order_by(Cliente.dni_cif))
+    if clientes is not None:
+        consulta = consulta.where(Cliente.dni_cif.in_(list(clientes)))
+    return consulta
+
+def select_informe_4(archivo=False, proyectos=None):
+    elegidos = proyectos
+    proyectos, P = fuente_proyectos(archivo)
+    asignaciones, A = fuente_asignaciones(archivo)
+    # Los JOIN llevan su ON explícito: no hace falta volver a Proyecto con switch()
+    consulta = (seleccionar(proyectos, P.titulo_proyecto, Empleado.nombre.alias('nombre_jefe'),
+                            fn.COUNT(A.id_empleado).alias('num_empleados'))
+                .join(Empleado, on=(P.id_jefe_proyecto == Empleado.dni))
+                .join(asignaciones, JOIN.LEFT_OUTER, on=(A.id_proyecto == P.id_proyecto))
+                .group_by(P.id_proyecto, P.titulo_proyecto, Empleado.nombre)
+                .order_by(P.id_proyecto))
+    if elegidos is not None:
+        consulta = consulta.where(P.id_proyecto.in_(list(elegidos)))
+    return consulta
+
+def select_informe_5(archivo=False, clientes=None):
+    # Solo cuentan los proyectos con ambas fechas y duración no negativa
+    proyectos, P = fuente_proyectos(archivo)
+    asignaciones, A = fuente_asignaciones(archivo)
+    duracion = dias_entre(P.fecha_inicio, P.fecha_fin)
+    posicion = fn.ROW_NUMBER().over(
+        partition_by=[P.id_cliente],
+        order_by=[duracion.desc(), P.id_proyecto])
+    ranking = (seleccionar(proyectos, P.id_proyecto, P.id_cliente, P.titulo_proyecto,
+                           duracion.alias('duracion'), posicion.alias('posicion'))
+               .where(P.fecha_fin.is_null(False) &
+                      P.fecha_inicio.is_null(False) &
+                      (duracion >= 0)))
+    if clientes is not None:
+        ranking = ranking.where(P.id_cliente.in_(list(clientes)))
+    ranking = ranking.alias('ranking')
+
+    # Subconsulta correlacionada: solo se cuentan las asignaciones del proyecto elegido
+    num_empleados = (seleccionar(asignaciones, fn.COUNT(SQL('*')))
+                     .where(A.id_proyecto == ranking.c.id_proyecto))
+
+    consulta = (Cliente
+                .select(Cliente.nombre_cliente, ranking.c.titulo_proyecto,
+                        ranking.c.duracion, num_empleados.alias('num_empleados'))
+                .join(ranking, JOIN.LEFT_OUTER,
+                      on=((ranking.c.id_cliente == Cliente.dni_cif) & (ranking.c.posicion == 1)))
+                .order_by(Cliente.dni_cif))
+    if clientes is not None:
+        consulta = consulta.where(Cliente.dni_cif.in_(list(clientes)))
+    return consulta
+
+# --- Filas de cada informe ---
+def filas_consulta_1(archivo=False):
+    """
+    (nombre_cliente, total): presupuesto total de cada cliente.
+    Con archivo=True cuentan también los proyectos archivados (igual en
+    el resto de informes).
+    """
+    return _en_streaming(select_informe_1(archivo))
+
+def filas_consulta_2(archivo=False):
+    """
+    (id_proyecto, titulo_proyecto, nombre_empleado, num_proyectos): una fila
+    por asignación, ordenadas por proyecto; los proyectos sin empleados
+    salen una vez con nombre_empleado None.
+    """
+    return _en_streaming(select_informe_2(archivo))
+
+def filas_consulta_3(archivo=False):
+    """
+    (nombre_cliente, titulo_proyecto, presupuesto): proyecto más caro de
+    cada cliente; título None si no tiene proyectos.
+    """
+    return _en_streaming(select_informe_3(archivo))
+
+def filas_consulta_4(archivo=False):
+    """
+    (titulo_proyecto, nombre_jefe, num_empleados) de cada proyecto.
+    """
+    return _en_streaming(select_informe_4(archivo))
+
+def filas_consulta_5(archivo=False):
+    """
+    (nombre_cliente, titulo_proyecto, duracion, num_empleados): proyecto más
+    largo de cada cliente; título None si no tiene ninguno con fechas válidas.
+    """
+    return _en_streaming(select_informe_5(archivo))
+
+INFORMES = {
+    1: filas_consulta_1,
+    2: filas_consulta_2,
+    3: filas_consulta_3,
+    4: filas_consulta_4,
+    5: filas_consulta_5,
+}
+
+# --- Salida a fichero ---
+def _valor_json(valor):
+    # Decimal y fechas se escriben como texto para no perder precisión
+    return str(valor)
+
+def exportar_informe(filas, ruta):
+    """
+    Escribe las filas de un informe en un fichero CSV (con cabecera) o
+    JSONL según la extensión, de una en una. Devuelve las filas escritas.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in ('.csv', '.jsonl', '.ndjson'):
+        raise ValueError(f"Formato no soportado: '{extension}' (usar .csv o .jsonl)")
+
+    escritas = 0
+    with open(ruta, 'w', encoding='utf-8', newline='') as fichero:
+        escritor = csv.writer(fichero) if extension == '.csv' else None
+        for fila in filas:
+            if escritor is not None:
+                if escritas == 0:
+                    escritor.writerow(fila._fields)
+                escritor.writerow(fila)
+            else:
+                fichero.write(json.dumps(fila._asdict(), default=_valor_json, ensure_ascii=False))
+                fichero.write('\n')
+            escritas += 1
+    return escritas
+
+# --- Informes por pantalla ---
+@presupuesto_consultas(1)
+def consulta_1(archivo=False):
     print("\n--- 1. Presupuesto total de los proyectos de cada cliente ---")
-    # Usamos backref 'proyectos' definido en Proyecto.id_cliente
-    clientes = Cliente.select()
-    for cliente in clientes:
-        total_presupuesto = 0
-        # Iteramos sobre los proyectos del cliente usando el backref
-        for proyecto in cliente.proyectos:
-            total_presupuesto += proyecto.presupuesto
-        
-        print(f"Cliente: {cliente.nombre_cliente} | Presupuesto Total: {total_presupuesto}")
-
-def consulta_2():
+    for nombre_cliente, total in filas_consulta_1(archivo):
+        print(f"Cliente: {nombre_cliente} | Presupuesto Total: {total}")
+
+@presupuesto_consultas(1)
+def consulta_2(archivo=False):
     print("\n--- 2. Empleados asignados a cada proyecto y número total de proyectos en los que participan ---")
-    proyectos = Proyecto.select()
-    for proyecto in proyectos:
-        print(f"Proyecto: {proyecto.titulo_proyecto}")
-        # Usamos backref 'asignaciones' definido en EmpleadoProyecto.id_proyecto
-        for asignacion in proyecto.asignaciones:
-            empleado = asignacion.id_empleado
-            # Usamos backref 'participaciones' definido en EmpleadoProyecto.id_empleado para contar
-            num_proyectos = empleado.participaciones.count()
-            print(f"  - Empleado: {empleado.nombre} | Total Proyectos: {num_proyectos}")
-
-def consulta_3():
+    proyecto_actual = None
+    for id_proyecto, titulo_proyecto, nombre_empleado, num_proyectos in filas_consulta_2(archivo):
+        if id_proyecto != proyecto_actual:
+            proyecto_actual = id_proyecto
+            print(f"Proyecto: {titulo_proyecto}")
+        if nombre_empleado is not None:
+            print(f"  - Empleado: {nombre_empleado} | Total Proyectos: {num_proyectos}")
+
+@presupuesto_consultas(1)
+def consulta_3(archivo=False):
     print("\n--- 3. Proyecto con el presupuesto más alto de cada cliente ---")
-    clientes = Cliente.select()
-    for cliente in clientes:
-        proyecto_mas_caro = None
-        max_presupuesto = -1
-        
-        for proyecto in cliente.proyectos:
-            if proyecto.presupuesto > max_presupuesto:
-                max_presupuesto = proyecto.presupuesto
-                proyecto_mas_caro = proyecto
-        
-        if proyecto_mas_caro:
-            print(f"Cliente: {cliente.nombre_cliente} | Proyecto Más Caro: {proyecto_mas_caro.titulo_proyecto} ({max_presupuesto})")
+    for nombre_cliente, titulo_proyecto, max_presupuesto in filas_consulta_3(archivo):
+        if titulo_proyecto is not None:
+            print(f"Cliente: {nombre_cliente} | Proyecto Más Caro: {titulo_proyecto} ({max_presupuesto})")
         else:
-            print(f"Cliente: {cliente.nombre_cliente} | Sin proyectos")
+            print(f"Cliente: {nombre_cliente} | Sin proyectos")
 
-def consulta_4():
+@presupuesto_consultas(1)
+def consulta_4(archivo=False):
     print("\n--- 4. Listar todos los proyectos con su jefe de proyecto y el número de empleados asignados ---")
-    proyectos = Proyecto.select()
-    for proyecto in proyectos:
-        jefe = proyecto.id_jefe_proyecto
-        # Contamos las asignaciones usando el backref 'asignaciones'
-        num_empleados = proyecto.asignaciones.count()
-        print(f"Proyecto: {proyecto.titulo_proyecto} | Jefe: {jefe.nombre} | Num Empleados: {num_empleados}")
-
-def consulta_5():
+    for titulo_proyecto, nombre_jefe, num_empleados in filas_consulta_4(archivo):
+        print(f"Proyecto: {titulo_proyecto} | Jefe: {nombre_jefe} | Num Empleados: {num_empleados}")
+
+@presupuesto_consultas(1)
+def consulta_5(archivo=False):
     print("\n--- 5. Proyecto más largo de cada cliente con el total de empleados que han trabajado en él ---")
-    clientes = Cliente.select()
-    for cliente in clientes:
-        proyecto_mas_largo = None
-        max_duracion = -1
-        
-        for proyecto in cliente.proyectos:
-            if proyecto.fecha_fin and proyecto.fecha_inicio:
-                duracion = (proyecto.fecha_fin - proyecto.fecha_inicio).days
-                if duracion > max_duracion:
-                    max_duracion = duracion
-                    proyecto_mas_largo = proyecto
-            else:
-                # Si no tiene fecha fin, podríamos considerar la fecha actual o ignorarlo.
-                # Para este ejercicio, si falta fecha, no calculamos duración o asumimos 0.
-                pass
-        
-        if proyecto_mas_largo:
-            num_empleados = proyecto_mas_largo.asignaciones.count()
-            print(f"Cliente: {cliente.nombre_cliente} | Proyecto Más Largo: {proyecto_mas_largo.titulo_proyecto} ({max_duracion} días) | Empleados: {num_empleados}")
+    for nombre_cliente, titulo_proyecto, max_duracion, num_empleados in filas_consulta_5(archivo):
+        if titulo_proyecto is not None:
+            print(f"Cliente: {nombre_cliente} | Proyecto Más Largo: {titulo_proyecto} ({max_duracion} días) | Empleados: {num_empleados}")
         else:
-             print(f"Cliente: {cliente.nombre_cliente} | Sin proyectos o sin fechas válidas")
+             print(f"Cliente: {nombre_cliente} | Sin proyectos o sin fechas válidas")
 
 if __name__ == "__main__":
-    if conectar_bd():
+    parser = argparse.ArgumentParser(description='Informes de la BD Empresa')
+    parser.add_argument('--informe', type=int, choices=sorted(INFORMES),
+                        help='Ejecutar solo este informe (por defecto, todos)')
+    parser.add_argument('--salida', help='Fichero .csv o .jsonl donde escribir el informe en lugar de mostrarlo')
+    parser.add_argument('--archivo', action='store_true', help='Incluir los proyectos archivados')
+    args = parser.parse_args()
+
+    if args.salida:
+        if args.informe is None:
+            parser.error('--salida requiere --informe')
+        escritas = exportar_informe(INFORMES[args.informe](args.archivo), args.salida)
+        print(f"Informe {args.informe}: {escritas} filas escritas en {args.salida}")
+    elif conectar_bd():
         try:
-            consulta_1()
-            consulta_2()
-            consulta_3()
-            consulta_4()
-            consulta_5()
+            numeros = [args.informe] if args.informe else sorted(INFORMES)
+            for numero in numeros:
+                globals()[f'consulta_{numero}'](args.archivo)
         finally:
             cerrar_bd()
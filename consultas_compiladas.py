@@ -0,0 +1,206 @@
+import inspect
+import threading
+from peewee import *
+from peewee import SelectBase
+from conexion import bd_lectura, db
+from crear_tablas import ejecutar_con_avisos
+
+# Caché de SQL precompilado para las consultas cortas que más se repiten
+# (búsquedas por clave primaria, el UPDATE de proyectos activos, los
+# DELETE del borrado en cascada de un cliente).
+# Una plantilla se construye una sola vez con Parametro en lugar de los
+# valores, y su SQL se genera la primera vez que se usa con cada dialecto
+# (SQLite, MySQL...). Cada llamada solo convierte los valores nuevos y
+# ejecuta el SQL guardado: ni se rehace el árbol de expresiones de peewee
+# ni se vuelve a generar el SQL.
+# Las escrituras pasan igualmente por los avisos de crear_tablas: mientras
+# se ejecuta la plantilla, sus Parametro valen lo indicado en la llamada,
+# así que los avisos pueden usar la consulta (su WHERE, por ejemplo) como
+# si se hubiera construido con esos valores.
+
+_enlazados = threading.local()
+
+class _Hueco:
+    # Lugar de un Parametro en la lista de parámetros del SQL compilado
+    __slots__ = ('parametro', 'convertir')
+
+    def __init__(self, parametro, convertir):
+        self.parametro = parametro
+        self.convertir = convertir
+
+class Parametro(Value):
+    """
+    Valor de una plantilla que se indica en cada llamada. Fuera de una
+    ejecución de la plantilla, 'value' es el propio Parametro.
+    """
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.converter = None
+        self.multi = False
+
+    @property
+    def value(self):
+        # Por id(): los nodos de peewee redefinen == para construir expresiones
+        return getattr(_enlazados, 'valores', {}).get(id(self), self)
+
+    def __sql__(self, ctx):
+        valor = self.value
+        if valor is not self:
+            return ctx.value(valor)
+        # Compilando: se guarda el conversor del campo para aplicarlo al enlazar
+        return ctx.value(_Hueco(self, ctx.state.converter), converter=False)
+
+    def __repr__(self):
+        return f"Parametro({self.nombre!r})"
+
+def _dialecto(bd):
+    bd = getattr(bd, 'primario', bd)    # EnrutadorLecturas
+    for clase, nombre in ((SqliteDatabase, 'sqlite'), (MySQLDatabase, 'mysql'),
+                          (PostgresqlDatabase, 'postgresql')):
+        if isinstance(bd, clase):
+            return nombre
+    return type(bd).__name__
+
+class Plantilla:
+    """
+    Consulta con parámetros cuyo SQL se compila una vez por dialecto.
+    'construir' recibe un Parametro por cada argumento y devuelve la
+    consulta de peewee (SELECT, UPDATE o DELETE); se llama una sola vez,
+    la primera vez que se usa la plantilla.
+    """
+    def __init__(self, construir, nombre=None):
+        self.nombre = nombre or construir.__name__
+        self._construir = construir
+        self._parametros = [Parametro(nombre) for nombre in inspect.signature(construir).parameters]
+        self._consulta = None
+        self._compiladas = {}   # dialecto -> (sql, parámetros, huecos)
+        self.compilaciones = 0
+        self.ejecuciones = 0
+
+    @property
+    def consulta(self):
+        if self._consulta is None:
+            self._consulta = self._construir(*self._parametros)
+        return self._consulta
+
+    def compilar(self, bd):
+        """
+        (sql, parámetros, huecos) de la plantilla en el dialecto de 'bd'.
+        'huecos' son las posiciones de los parámetros que se rellenan en
+        cada llamada: (posición, índice del argumento, conversor del campo).
+        """
+        dialecto = _dialecto(bd)
+        compilada = self._compiladas.get(dialecto)
+        if compilada is None:
+            sql, parametros = bd.get_sql_context().sql(self.consulta).query()
+            indices = {id(parametro): indice for indice, parametro in enumerate(self._parametros)}
+            huecos = [(posicion, indices[id(valor.parametro)], valor.convertir)
+                      for posicion, valor in enumerate(parametros) if isinstance(valor, _Hueco)]
+            compilada = self._compiladas[dialecto] = (sql, parametros, huecos)
+            self.compilaciones += 1
+        return compilada
+
+    def enlazar(self, bd, *args):
+        """
+        (sql, parámetros) listos para ejecutar en 'bd' con esos valores.
+        """
+        if len(args) != len(self._parametros):
+            nombres = ', '.join(parametro.nombre for parametro in self._parametros)
+            raise TypeError(f"La plantilla {self.nombre} espera {len(self._parametros)} valores "
+                            f"({nombres}) y recibió {len(args)}")
+        sql, parametros, huecos = self.compilar(bd)
+        parametros = list(parametros)
+        for posicion, indice, convertir in huecos:
+            parametros[posicion] = convertir(args[indice]) if convertir else args[indice]
+        self.ejecuciones += 1
+        return sql, parametros
+
+    def cursor(self, *args):
+        """
+        Ejecuta la plantilla (un SELECT) con esos valores y devuelve el
+        cursor del driver. Lee de las réplicas si las hay.
+        """
+        bd = bd_lectura()
+        sql, parametros = self.enlazar(bd, *args)
+        return bd.execute_sql(sql, parametros)
+
+    def ejecutar(self, *args):
+        """
+        Ejecuta la plantilla (un UPDATE o DELETE) en el primario con esos
+        valores, con los avisos de escritura, y devuelve las filas afectadas.
+        """
+        consulta = self.consulta
+        if isinstance(consulta, SelectBase):
+            raise TypeError(f"La plantilla {self.nombre} es un SELECT: usar cursor()")
+        sql, parametros = self.enlazar(db, *args)
+
+        anteriores = getattr(_enlazados, 'valores', {})
+        _enlazados.valores = {**anteriores, **{id(parametro): valor
+                                               for parametro, valor in zip(self._parametros, args)}}
+        try:
+            return ejecutar_con_avisos(
+                consulta, db,
+                lambda: consulta.handle_result(db, db.execute_sql(sql, parametros)))
+        finally:
+            _enlazados.valores = anteriores
+
+_plantillas = []
+
+def plantilla(construir):
+    """
+    Decorador que convierte una función que construye una consulta con
+    parámetros en una Plantilla (ver Plantilla).
+    """
+    nueva = Plantilla(construir)
+    _plantillas.append(nueva)
+    return nueva
+
+# --- Búsqueda por clave primaria ---
+_por_clave = {}
+
+def plantilla_por_clave(modelo):
+    """
+    Plantilla del SELECT de todos los campos de 'modelo' por su clave
+    primaria (el de modelo.get_or_none(pk == valor)).
+    """
+    nueva = _por_clave.get(modelo)
+    if nueva is None:
+        def construir(clave):
+            return modelo.select().where(modelo._meta.primary_key == clave).limit(1)
+        nueva = _por_clave[modelo] = Plantilla(construir, f"por_clave({modelo.__name__})")
+        _plantillas.append(nueva)
+    return nueva
+
+def por_clave(modelo, clave):
+    """
+    Equivale a modelo.get_or_none(modelo._meta.primary_key == clave) con el
+    SQL ya compilado: devuelve la instancia o None.
+    """
+    compilada = plantilla_por_clave(modelo)
+    fila = compilada.cursor(clave).fetchone()
+    if fila is None:
+        return None
+    campos = compilada.consulta._returning
+    instancia = modelo(__no_default__=1, **{campo.name: campo.python_value(valor)
+                                            for campo, valor in zip(campos, fila)})
+    instancia._dirty.clear()
+    return instancia
+
+# --- Estado de la caché ---
+def estadisticas():
+    """
+    {plantilla: {'dialectos', 'compilaciones', 'ejecuciones'}} de las
+    plantillas usadas hasta ahora.
+    """
+    return {compilada.nombre: {'dialectos': sorted(compilada._compiladas),
+                               'compilaciones': compilada.compilaciones,
+                               'ejecuciones': compilada.ejecuciones}
+            for compilada in _plantillas if compilada.ejecuciones or compilada._compiladas}
+
+def vaciar():
+    """
+    Olvida el SQL compilado de todas las plantillas (se vuelve a generar
+    en el siguiente uso).
+    """
+    for compilada in _plantillas:
+        compilada._compiladas.clear()
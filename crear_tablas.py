@@ -1,10 +1,282 @@
+import datetime
+import importlib
+import threading
 from peewee import *
-from conexion import db, conectar_bd, cerrar_bd
+from peewee import Expression, ModelDelete, ModelInsert, ModelUpdate, Node, NodeList, SelectBase
+from conexion import db, al_cambiar_base, bd_lectura, conectar_bd, cerrar_bd, marcar_escritura, BORRADO_CASCADA
+
+# --- Avisos de escritura ---
+# Funciones que se llaman al ejecutar cualquier INSERT, UPDATE o DELETE
+# sobre un modelo, venga de .save()/.create(), de Model.insert*(),
+# Model.update()/delete() o de delete_instance(). Las usan, por ejemplo,
+# la caché de claves primarias y el resumen por cliente.
+escuchas_escritura = []
+escuchas_previas = []
+
+# Módulos que mantienen datos derivados de las tablas (registran sus avisos
+# al importarse). Se importan antes de la primera escritura, así que están
+# activos aunque quien escribe solo haya importado este módulo.
+MODULOS_MANTENIMIENTO = ('resumen_clientes', 'cambios')
+_mantenimiento_cargado = False
+_bloqueo_mantenimiento = threading.Lock()
+
+def cargar_mantenimiento():
+    """
+    Importa (una sola vez) los módulos de MODULOS_MANTENIMIENTO.
+    """
+    global _mantenimiento_cargado
+    if _mantenimiento_cargado:
+        return
+    with _bloqueo_mantenimiento:
+        if not _mantenimiento_cargado:
+            for nombre in MODULOS_MANTENIMIENTO:
+                importlib.import_module(nombre)
+            _mantenimiento_cargado = True
+
+# Caché de table_exists() por base de datos: las tablas derivadas (el
+# resumen, el registro de cambios) solo se mantienen si existen
+_tablas_existentes = {}
+
+def tabla_existe(modelo):
+    """
+    Indica si la tabla del modelo existe en la base de datos actual. Se
+    consulta una vez por base de datos: cambiar_base() no hereda la
+    respuesta de la anterior.
+    """
+    clave = (modelo._meta.database.database, modelo._meta.table_name)
+    existe = _tablas_existentes.get(clave)
+    if existe is None:
+        existe = _tablas_existentes[clave] = modelo.table_exists()
+    return existe
+
+@al_cambiar_base
+def olvidar_tablas():
+    """
+    Vacía la caché de tabla_existe(), tras crear o borrar tablas (y al
+    cambiar de base de datos).
+    """
+    _tablas_existentes.clear()
+
+def al_escribir(funcion):
+    """
+    Registra funcion(modelo, operacion, consulta) para que se llame tras
+    cada escritura. 'operacion' es 'insert', 'update' o 'delete'.
+    Se puede usar como decorador.
+    """
+    escuchas_escritura.append(funcion)
+    return funcion
+
+def antes_de_escribir(*modelos):
+    """
+    Decorador que registra funcion(modelo, operacion, consulta) para que se
+    llame antes de cada escritura sobre alguno de los modelos indicados.
+    Puede devolver otra función sin argumentos, que se llamará justo después
+    de la escritura y dentro de la misma transacción (útil para mirar qué
+    filas va a tocar un UPDATE/DELETE).
+    """
+    def registrar(funcion):
+        escuchas_previas.append((modelos, funcion))
+        return funcion
+    return registrar
+
+def claves_afectadas(consulta):
+    """
+    Devuelve el conjunto de claves primarias que filtra el WHERE de una
+    consulta de escritura cuando es 'pk == valor' o 'pk IN (...)'.
+    Si no se puede saber qué filas toca devuelve None.
+    """
+    where = getattr(consulta, '_where', None)
+    clave_primaria = consulta.model._meta.primary_key
+    if isinstance(where, Expression) and where.lhs is clave_primaria:
+        # Un Value (p. ej. un parámetro de consultas_compiladas) lleva el valor dentro
+        valor = where.rhs.value if isinstance(where.rhs, Value) else where.rhs
+        if where.op == OP.EQ and not isinstance(valor, Node):
+            return {valor}
+        if where.op == OP.IN and isinstance(where.rhs, (list, tuple, set, frozenset)):
+            return set(where.rhs)
+    return None
+
+def nombre_campo(campo):
+    # Los campos de un INSERT/UPDATE pueden venir como Field o por su nombre
+    return campo if isinstance(campo, str) else campo.name
+
+def valor_escrito(valor):
+    # Valor plano de lo que se escribe en una columna. Un Value (p. ej. un
+    # parámetro de consultas_compiladas) lleva el valor dentro
+    if isinstance(valor, Value):
+        valor = valor.value
+    return valor._pk if isinstance(valor, Model) else valor
+
+def _valores_fila(fila, columnas, campos):
+    if isinstance(fila, dict):
+        fila = {nombre_campo(clave): valor for clave, valor in fila.items()}
+    elif isinstance(fila, Model):
+        fila = fila.__data__
+    else:
+        fila = dict(zip(columnas, fila))
+    return tuple(valor_escrito(fila.get(campo.name)) for campo in campos)
+
+def _anotar(filas, columnas, campos, anotadas):
+    # Deja pasar las filas de un generador apuntando sus valores
+    for fila in filas:
+        anotadas.add(_valores_fila(fila, columnas, campos))
+        yield fila
+
+def insert_en_generador(consulta):
+    """
+    Indica si las filas de un INSERT vienen de un generador (como en
+    bulk_create()) y solo se conocen al ejecutarlo.
+    """
+    return not isinstance(consulta._insert, (dict, list, tuple, SelectBase))
+
+def filas_insertadas(consulta, campos):
+    """
+    Valores de 'campos' en cada fila de un INSERT, como un conjunto de
+    tuplas (None en los campos que no se indican). En un INSERT ... SELECT
+    se ejecuta antes el SELECT. Si las filas vienen de un generador, se
+    apuntan a medida que el INSERT las consume: el conjunto se llena al
+    ejecutar la escritura.
+    """
+    filas = consulta._insert
+    if isinstance(filas, dict):
+        filas = [filas]
+    # Filas en tuplas sin campos indicados: van en el orden de los campos del modelo
+    columnas = [nombre_campo(columna) for columna in (consulta._columns or consulta.model._meta.sorted_fields)]
+    if isinstance(filas, SelectBase):
+        posiciones = [columnas.index(campo.name) if campo.name in columnas else None for campo in campos]
+        return {tuple(None if posicion is None else valor_escrito(fila[posicion]) for posicion in posiciones)
+                for fila in filas.tuples()}
+    if insert_en_generador(consulta):
+        anotadas = set()
+        consulta._insert = _anotar(filas, columnas, campos, anotadas)
+        return anotadas
+    return {_valores_fila(fila, columnas, campos) for fila in filas}
+
+# --- Upserts ---
+IGNORAR = 'ignorar'
+
+def con_upsert(consulta, en_conflicto=IGNORAR, objetivo=None):
+    """
+    Añade a una consulta INSERT (insert, insert_many o insert_from) la
+    resolución de conflictos con filas que ya existen:
+      - en_conflicto='ignorar': esas filas se dejan como están.
+      - en_conflicto=[campos]: se actualizan esos campos con los valores nuevos.
+    En SQLite genera ON CONFLICT; 'objetivo' son los campos únicos que
+    definen el conflicto (por defecto la clave primaria). MySQL genera
+    ON DUPLICATE KEY UPDATE y no permite elegir el objetivo: cuenta como
+    conflicto cualquier clave única duplicada.
+    """
+    modelo = consulta.model
+    es_mysql = isinstance(modelo._meta.database, MySQLDatabase)
+    claves = modelo._meta.get_primary_keys()
+
+    if en_conflicto == IGNORAR:
+        if es_mysql:
+            # No se usa INSERT IGNORE: también ocultaría errores de claves ajenas
+            return consulta.on_conflict(update={claves[0]: claves[0]})
+        return consulta.on_conflict(action='NOTHING')
+
+    campos = [getattr(modelo, campo) if isinstance(campo, str) else campo
+              for campo in en_conflicto]
+    if es_mysql:
+        return consulta.on_conflict(preserve=campos)
+    objetivo = [getattr(modelo, campo) if isinstance(campo, str) else campo
+                for campo in (objetivo or claves)]
+    return consulta.on_conflict(conflict_target=objetivo, preserve=campos)
+
+@al_escribir
+def _leer_del_primario(modelo, operacion, consulta):
+    # Tras escribir, el hilo lee del primario aunque haya réplicas (ver
+    # conexion.EnrutadorLecturas)
+    marcar_escritura()
+
+def ejecutar_con_avisos(consulta, database, ejecutar):
+    """
+    Llama a ejecutar() (que lanza la escritura 'consulta') rodeada de los
+    avisos previos y posteriores a la escritura. Devuelve lo que devuelva
+    ejecutar().
+    """
+    cargar_mantenimiento()
+    modelo, operacion = consulta.model, consulta.operacion
+    previas = [escucha for modelos, escucha in escuchas_previas if modelo in modelos]
+    if not previas:
+        resultado = ejecutar()
+    else:
+        with database.atomic():
+            posteriores = [escucha(modelo, operacion, consulta) for escucha in previas]
+            resultado = ejecutar()
+            for posterior in posteriores:
+                if posterior is not None:
+                    posterior()
+    for escucha in escuchas_escritura:
+        escucha(modelo, operacion, consulta)
+    return resultado
+
+class _ConAvisoEscritura:
+    operacion = None
+
+    def _execute(self, database):
+        return ejecutar_con_avisos(self, database, lambda: super(_ConAvisoEscritura, self)._execute(database))
+
+class InsertConAviso(_ConAvisoEscritura, ModelInsert):
+    operacion = 'insert'
+
+class UpdateConAviso(_ConAvisoEscritura, ModelUpdate):
+    operacion = 'update'
+
+class DeleteConAviso(_ConAvisoEscritura, ModelDelete):
+    operacion = 'delete'
+
+# Con borrado_cascada activado en la configuración, borrar un cliente borra
+# en la BD sus proyectos y borrar un proyecto borra sus asignaciones.
+# Solo afecta a las tablas que se creen a partir de ese momento.
+ON_DELETE = 'CASCADE' if BORRADO_CASCADA else None
+
+class AutoFieldMonotono(AutoField):
+    """
+    AutoField que nunca reutiliza ids. En SQLite se declara AUTOINCREMENT:
+    sin él, SQLite da max(id) + 1 y un id borrado de la tabla (p. ej. al
+    archivarlo) puede volver a asignarse. InnoDB (MySQL 8) ya conserva su
+    contador AUTO_INCREMENT.
+    """
+    def ddl(self, ctx):
+        nodos = super().ddl(ctx)
+        if isinstance(self.model._meta.database, SqliteDatabase):
+            return NodeList((nodos, SQL('AUTOINCREMENT')))
+        return nodos
 
 # --- Clase Base para los Modelos ---
 class BaseModel(Model):
     class Meta:
         database = db
+
+    @classmethod
+    def select(cls, *fields):
+        # Las lecturas van a las réplicas si hay (las escrituras, al primario)
+        return super().select(*fields).bind(bd_lectura())
+
+    @classmethod
+    def insert(cls, __data=None, **insert):
+        return InsertConAviso(cls, cls._normalize_data(__data, insert))
+
+    @classmethod
+    def insert_many(cls, rows, fields=None):
+        return InsertConAviso(cls, insert=rows, columns=fields)
+
+    @classmethod
+    def insert_from(cls, query, fields):
+        columns = [getattr(cls, campo) if isinstance(campo, str) else campo
+                   for campo in fields]
+        return InsertConAviso(cls, insert=query, columns=columns)
+
+    @classmethod
+    def update(cls, __data=None, **update):
+        return UpdateConAviso(cls, cls._normalize_data(__data, update))
+
+    @classmethod
+    def delete(cls):
+        return DeleteConAviso(cls)
+
 # Clientes: DNI / CIF (PK varchar), nombre_cliente, tlf, email
 class Cliente(BaseModel):
     dni_cif = CharField(max_length=15, primary_key=True, column_name='dni_cif')
@@ -27,20 +299,24 @@ class Empleado(BaseModel):
 
 # Proyectos
 class Proyecto(BaseModel):
-    # id_proyecto (autoincremental)
-    id_proyecto = AutoField(column_name='id_proyecto')
-    titulo_proyecto = CharField(max_length=255)
+    # id_proyecto (autoincremental, sin reutilizar ids: los archivados
+    # siguen existiendo en proyectos_archivados)
+    id_proyecto = AutoFieldMonotono(column_name='id_proyecto')
+    # Índices secundarios: búsqueda por título (asignar_empleado_a_proyecto)
+    # y filtros por fecha_fin / presupuesto (proyectos activos, antiguos, baratos)
+    titulo_proyecto = CharField(max_length=255, index=True)
     descripcion = TextField(null=True)
     fecha_inicio = DateField()
-    fecha_fin = DateField(null=True)
-    presupuesto = DecimalField(max_digits=10, decimal_places=2)
+    fecha_fin = DateField(null=True, index=True)
+    presupuesto = DecimalField(max_digits=10, decimal_places=2, index=True)
 
     # FK a Clientes (1:N) - Un cliente puede solicitar varios proyectos
     id_cliente = ForeignKeyField(
         Cliente, 
         field=Cliente.dni_cif, # La columna dni_cif de Cliente es la PK
         backref='proyectos', 
-        column_name='id_cliente'
+        column_name='id_cliente',
+        on_delete=ON_DELETE
     )
 
     # FK a Empleados (1:1) - Un proyecto tiene un único jefe de proyecto
@@ -54,6 +330,10 @@ class Proyecto(BaseModel):
 
     class Meta:
         table_name = 'proyectos'
+        indexes = (
+            # Proyecto más caro de cada cliente (consulta_3)
+            (('id_cliente', 'presupuesto'), False),
+        )
 
 # Empleados-Proyecto: Tabla de la relación M:N
 class EmpleadoProyecto(BaseModel):
@@ -66,11 +346,15 @@ class EmpleadoProyecto(BaseModel):
     )
 
     # FK Proyecto (M:N)
+    # La PK compuesta solo sirve para buscar por id_empleado; las búsquedas
+    # por id_proyecto (asignaciones de un proyecto) necesitan su propio índice
     id_proyecto = ForeignKeyField(
         Proyecto, 
         field=Proyecto.id_proyecto, 
         backref='asignaciones', 
-        column_name='id_proyecto'
+        column_name='id_proyecto',
+        index=True,
+        on_delete=ON_DELETE
     )
 
     class Meta:
@@ -78,16 +362,109 @@ class EmpleadoProyecto(BaseModel):
         primary_key = CompositeKey('id_empleado', 'id_proyecto') 
 
 
+# --- Archivo de proyectos finalizados (ver archivo.py) ---
+# Mismas columnas que Proyecto y EmpleadoProyecto. Los proyectos conservan
+# su id_proyecto, así que las claves de las dos tablas no se solapan.
+class ProyectoArchivado(BaseModel):
+    id_proyecto = IntegerField(primary_key=True, column_name='id_proyecto')
+    titulo_proyecto = CharField(max_length=255)
+    descripcion = TextField(null=True)
+    fecha_inicio = DateField()
+    fecha_fin = DateField(null=True)
+    presupuesto = DecimalField(max_digits=10, decimal_places=2)
+
+    id_cliente = ForeignKeyField(
+        Cliente,
+        field=Cliente.dni_cif,
+        backref='proyectos_archivados',
+        column_name='id_cliente',
+        on_delete=ON_DELETE
+    )
+
+    # Sin UNIQUE: un jefe dirige un único proyecto activo, pero puede
+    # haber dirigido varios ya archivados
+    id_jefe_proyecto = ForeignKeyField(
+        Empleado,
+        field=Empleado.dni,
+        backref='proyectos_dirigidos_archivados',
+        column_name='id_jefe_proyecto'
+    )
+
+    class Meta:
+        table_name = 'proyectos_archivados'
+
+class EmpleadoProyectoArchivado(BaseModel):
+    id_empleado = ForeignKeyField(
+        Empleado,
+        field=Empleado.dni,
+        backref='participaciones_archivadas',
+        column_name='id_empleado'
+    )
+
+    id_proyecto = ForeignKeyField(
+        ProyectoArchivado,
+        field=ProyectoArchivado.id_proyecto,
+        backref='asignaciones',
+        column_name='id_proyecto',
+        index=True,
+        on_delete=ON_DELETE
+    )
+
+    class Meta:
+        table_name = 'empleados_proyecto_archivados'
+        primary_key = CompositeKey('id_empleado', 'id_proyecto')
+
+# Resumen por cliente: nº de proyectos, presupuesto total, proyecto más caro
+# y proyecto más largo. Lo mantiene resumen_clientes.py en cada escritura
+# sobre Proyecto; solo hay fila para los clientes con algún proyecto.
+class ResumenCliente(BaseModel):
+    # Sin FK a propósito: el resumen se rehace por cliente y no debe
+    # impedir ni ralentizar los borrados de clientes y proyectos
+    id_cliente = CharField(max_length=15, primary_key=True, column_name='id_cliente')
+    num_proyectos = IntegerField()
+    presupuesto_total = DecimalField(max_digits=15, decimal_places=2)
+    id_proyecto_mas_caro = IntegerField()
+    presupuesto_maximo = DecimalField(max_digits=10, decimal_places=2)
+    id_proyecto_mas_largo = IntegerField(null=True)
+    duracion_maxima = IntegerField(null=True)
+
+    class Meta:
+        table_name = 'resumen_clientes'
+
+
+# Registro de cambios: una fila por cada fila insertada, modificada o
+# borrada en clientes, empleados, proyectos y asignaciones. Lo escribe
+# cambios.py en la misma transacción que el cambio; el id crece con cada
+# cambio y sirve de punto de control para leer solo lo nuevo.
+class Cambio(BaseModel):
+    # Sin FK a propósito: las filas borradas tienen que seguir registradas
+    # Los ids no se reutilizan tras recortar(): los lectores guardan el
+    # último id aplicado como punto de control
+    id = AutoFieldMonotono()
+    tabla = CharField(max_length=30)
+    operacion = CharField(max_length=6)     # 'insert', 'update' o 'delete'
+    clave = CharField(max_length=40, null=True)     # None: filas sin identificar
+    id_cliente = CharField(max_length=15, null=True)
+    id_proyecto = IntegerField(null=True)
+    id_empleado = CharField(max_length=15, null=True)
+    fecha = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        table_name = 'registro_cambios'
+
+
 # --- Función para crear las tablas ---
 def crear_tablas():
     """
     Crea las tablas de la base de datos si no existen.
     """
-    modelos = [Cliente, Empleado, Proyecto, EmpleadoProyecto] 
+    modelos = [Cliente, Empleado, Proyecto, EmpleadoProyecto, ResumenCliente,
+               ProyectoArchivado, EmpleadoProyectoArchivado, Cambio] 
     
     if conectar_bd():
         try:
             db.create_tables(modelos)
+            olvidar_tablas()
             print("Modelos de datos y tablas creadas exitosamente.")
         except Exception as e:
             print(f"Error al crear las tablas: {e}")
@@ -96,6 +473,35 @@ def crear_tablas():
     else:
         print("No se pudo establecer la conexión para crear las tablas.")
 
+# --- Función para crear los índices que falten ---
+def crear_indices():
+    """
+    Crea los índices declarados en los modelos que todavía no existan.
+    Necesario en BDs creadas antes de declarar los índices: en MySQL
+    create_tables() no toca las tablas que ya existen.
+    """
+    modelos = [Cliente, Empleado, Proyecto, EmpleadoProyecto, ResumenCliente,
+               ProyectoArchivado, EmpleadoProyectoArchivado, Cambio]
+
+    if conectar_bd():
+        try:
+            creados = 0
+            for modelo in modelos:
+                existentes = {indice.name for indice in db.get_indexes(modelo._meta.table_name)}
+                for indice in modelo._meta.fields_to_index():
+                    if indice._name not in existentes:
+                        db.execute(indice)
+                        print(f"Índice '{indice._name}' creado.")
+                        creados += 1
+            print(f"{creados} índices nuevos creados.")
+        except Exception as e:
+            print(f"Error al crear los índices: {e}")
+        finally:
+            cerrar_bd()
+    else:
+        print("No se pudo establecer la conexión para crear los índices.")
+
 if __name__ == '__main__':
     # Ejecutar la creación de tablas
-    crear_tablas()
\ No newline at end of file
+    crear_tablas()
+    crear_indices()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import argparse
+import datetime
+import random
+from decimal import Decimal
+from itertools import accumulate
+from conexion import db, sesion
+from crear_tablas import (Cliente, Empleado, Proyecto, EmpleadoProyecto, ResumenCliente,
+                          ProyectoArchivado, EmpleadoProyectoArchivado, olvidar_tablas)
+from carga_masiva import cargar, preparar_sin_claves
+from resumen_clientes import mantenimiento_diferido
+from cambios import registro_diferido
+
+# Escalas predefinidas: número de proyectos
+ESCALAS = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+SEMILLA = 42
+
+NOMBRES = ['Juan', 'Ana', 'Carlos', 'María', 'Pedro', 'Lucía', 'Javier', 'Carmen',
+           'David', 'Laura', 'Pablo', 'Elena', 'Sergio', 'Marta', 'Jorge', 'Sara']
+APELLIDOS = ['García', 'López', 'Pérez', 'Rodríguez', 'Sánchez', 'Martín', 'Gómez',
+             'Ruiz', 'Díaz', 'Hernández', 'Moreno', 'Álvarez', 'Romero', 'Navarro']
+SECTORES = ['Consultoría', 'Logística', 'Construcciones', 'Alimentación', 'Energía',
+            'Software', 'Transportes', 'Seguros', 'Textil', 'Farmacia']
+TIPOS_PROYECTO = ['Desarrollo Web', 'App Móvil', 'Migración', 'Auditoría', 'ERP',
+                  'Intranet', 'Análisis de Datos', 'Mantenimiento', 'Integración']
+LETRAS_DNI = 'TRWAGMYFPDXBNJZSQVHLCKE'
+
+FECHA_MINIMA = datetime.date(2015, 1, 1)
+DIAS_RANGO_INICIO = 11 * 365
+
+def dimensiones(num_proyectos):
+    """
+    Número de filas de cada tabla para una escala dada.
+    Cada proyecto necesita un jefe distinto (id_jefe_proyecto es único),
+    así que hay tantos jefes como proyectos más un 5% libre para reasignar.
+    """
+    return {
+        'clientes': max(1, num_proyectos // 8),
+        'jefes': num_proyectos + num_proyectos // 20 + 1,
+        'empleados': num_proyectos + num_proyectos // 20 + 1 + num_proyectos // 4,
+        'proyectos': num_proyectos,
+    }
+
+def _dni(numero):
+    return f'{numero:08d}{LETRAS_DNI[numero % 23]}'
+
+def _persona(rng):
+    return f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+
+def _clientes_sin_proyectos(num_clientes):
+    """
+    Cuántos de los últimos clientes generados se quedan sin proyectos.
+    """
+    return max(num_clientes // 20, 1) if num_clientes > 1 else 0
+
+def _clave_cliente(numero):
+    # 70% empresas (CIF) y 30% particulares (DNI)
+    return f'B{numero:08d}' if numero % 10 < 7 else _dni(numero)
+
+# --- Generadores por tabla ---
+# Cada tabla usa su propio Random derivado de la semilla, así los datos
+# de una tabla no cambian si cambia la forma de generar otra.
+def generar_clientes(num_clientes, semilla=SEMILLA):
+    rng = random.Random(f'{semilla}-clientes')
+    for i in range(num_clientes):
+        dni_cif = _clave_cliente(i)
+        if dni_cif.startswith('B'):
+            nombre = f'{rng.choice(SECTORES)} {rng.choice(APELLIDOS)} S.L.'
+        else:
+            nombre = _persona(rng)
+        yield {
+            'dni_cif': dni_cif,
+            'nombre_cliente': nombre,
+            'tlf': f'6{rng.randrange(10**8):08d}' if rng.random() < 0.9 else None,
+            'email': f'cliente{i}@empresa{i % 997}.com',
+        }
+
+def generar_empleados(num_empleados, num_jefes, semilla=SEMILLA):
+    rng = random.Random(f'{semilla}-empleados')
+    for i in range(num_empleados):
+        yield {
+            'dni': _dni(i),
+            'nombre': _persona(rng),
+            'jefe': i < num_jefes,
+            'email': f'empleado{i}@empresa.com',
+        }
+
+def generar_proyectos(num_proyectos, num_clientes, semilla=SEMILLA):
+    """
+    El reparto de proyectos entre clientes es sesgado (tipo Zipf):
+    pocos clientes concentran muchos proyectos. El último 5% de los
+    clientes (al menos uno si hay varios) no recibe ninguno, para que
+    siempre haya clientes sin proyectos.
+    Un 25% de los proyectos siguen activos (sin fecha_fin).
+    """
+    rng = random.Random(f'{semilla}-proyectos')
+    clientes = [_clave_cliente(i) for i in range(num_clientes - _clientes_sin_proyectos(num_clientes))]
+    pesos_acumulados = list(accumulate(1 / (rango + 1) ** 0.8 for rango in range(len(clientes))))
+    for i in range(num_proyectos):
+        fecha_inicio = FECHA_MINIMA + datetime.timedelta(days=rng.randrange(DIAS_RANGO_INICIO))
+        fecha_fin = None
+        if rng.random() >= 0.25:
+            fecha_fin = fecha_inicio + datetime.timedelta(days=rng.randint(30, 1500))
+        presupuesto = min(rng.lognormvariate(9.5, 1.0), 99_999_999)
+        yield {
+            'id_proyecto': i + 1,
+            'titulo_proyecto': f'{rng.choice(TIPOS_PROYECTO)} {i + 1}',
+            'descripcion': None,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'presupuesto': Decimal(f'{presupuesto:.2f}'),
+            'id_cliente': rng.choices(clientes, cum_weights=pesos_acumulados)[0],
+            # El jefe del proyecto i es el empleado i
+            'id_jefe_proyecto': _dni(i),
+        }
+
+def generar_asignaciones(num_proyectos, num_empleados, semilla=SEMILLA):
+    """
+    Entre 0 y 6 empleados distintos por proyecto, unos 3 de media.
+    """
+    rng = random.Random(f'{semilla}-asignaciones')
+    for id_proyecto in range(1, num_proyectos + 1):
+        num = rng.choices(range(7), weights=[5, 10, 20, 25, 20, 12, 8])[0]
+        for empleado in rng.sample(range(num_empleados), num):
+            yield {'id_empleado': _dni(empleado), 'id_proyecto': id_proyecto}
+
+# --- Población de la BD ---
+def poblar(num_proyectos, semilla=SEMILLA, recrear=True, progreso=False):
+    """
+    Rellena las cuatro tablas con datos sintéticos deterministas.
+    Con recrear=True se borran y crean de nuevo las tablas antes de cargar.
+    Devuelve el número de filas insertadas por tabla.
+    """
+    dim = dimensiones(num_proyectos)
+    modelos = [Cliente, Empleado, Proyecto, EmpleadoProyecto, ResumenCliente,
+               ProyectoArchivado, EmpleadoProyectoArchivado]
+
+    if recrear:
+        with sesion():
+            db.drop_tables(modelos)
+            db.create_tables(modelos)
+        olvidar_tablas()
+
+    cargas = [
+        (Cliente, generar_clientes(dim['clientes'], semilla)),
+        (Empleado, generar_empleados(dim['empleados'], dim['jefes'], semilla)),
+        (Proyecto, generar_proyectos(num_proyectos, dim['clientes'], semilla)),
+        (EmpleadoProyecto, generar_asignaciones(num_proyectos, dim['empleados'], semilla)),
+    ]
+    filas = {}
+    # El resumen por cliente se calcula una sola vez al final de la carga, y
+    # en el registro de cambios la carga se apunta como un cambio completo
+    with mantenimiento_diferido(), registro_diferido():
+        for modelo, registros in cargas:
+            # Los datos generados ya son coherentes: no hace falta validar claves ajenas
+            resultado = cargar(modelo, registros, preparar_sin_claves(modelo), progreso=progreso)
+            filas[modelo._meta.table_name] = resultado['insertadas']
+    return filas
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generador de datos sintéticos para la BD Empresa')
+    parser.add_argument('escala', help=f"Escala ({', '.join(ESCALAS)}) o número de proyectos")
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--sin-recrear', action='store_true',
+                        help='No borrar ni recrear las tablas antes de cargar')
+    args = parser.parse_args()
+
+    num_proyectos = ESCALAS[args.escala] if args.escala in ESCALAS else int(args.escala)
+    filas = poblar(num_proyectos, args.semilla, recrear=not args.sin_recrear, progreso=True)
+    print(f"Datos generados: {filas}")
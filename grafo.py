@@ -0,0 +1,201 @@
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+from peewee import *
+from peewee import Node
+from conexion import lectura_consistente, sesion
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+from consultas import presupuesto_consultas
+
+# Grafo en memoria Cliente -> Proyecto -> EmpleadoProyecto -> Empleado.
+# Se carga con una consulta por tabla (4 en total, cargue todo o solo
+# algunos clientes) y se guarda en registros con __slots__, mucho más
+# ligeros que las instancias de modelo de peewee. Los registros hijos
+# apuntan a sus padres (proyecto.cliente, proyecto.jefe, asignacion.empleado,
+# asignacion.proyecto); para bajar por el grafo están los índices por FK
+# del objeto Grafo, así nunca hay cargas perezosas.
+
+class _Registro:
+    __slots__ = ()
+
+    def __init__(self, *valores):
+        for nombre, valor in zip(self.__slots__, valores):
+            setattr(self, nombre, valor)
+
+    def __repr__(self):
+        clave = getattr(self, self.__slots__[0])
+        return f"{type(self).__name__}({clave!r})"
+
+class RegistroCliente(_Registro):
+    __slots__ = ('dni_cif', 'nombre_cliente', 'tlf', 'email')
+
+class RegistroEmpleado(_Registro):
+    __slots__ = ('dni', 'nombre', 'jefe', 'email')
+
+class RegistroProyecto(_Registro):
+    __slots__ = ('id_proyecto', 'titulo_proyecto', 'descripcion', 'fecha_inicio',
+                 'fecha_fin', 'presupuesto', 'cliente', 'jefe')
+
+class RegistroAsignacion(_Registro):
+    __slots__ = ('empleado', 'proyecto')
+
+class Grafo:
+    """
+    Registros indexados por clave primaria (clientes, empleados, proyectos)
+    y por clave ajena (proyectos_por_cliente, proyecto_por_jefe,
+    asignaciones_por_proyecto, asignaciones_por_empleado).
+    """
+    def __init__(self):
+        self.clientes = {}
+        self.empleados = {}
+        self.proyectos = {}
+        self.asignaciones = []
+        self.proyectos_por_cliente = defaultdict(list)
+        self.proyecto_por_jefe = {}
+        self.asignaciones_por_proyecto = defaultdict(list)
+        self.asignaciones_por_empleado = defaultdict(list)
+
+    def filas(self):
+        return {
+            'clientes': len(self.clientes),
+            'empleados': len(self.empleados),
+            'proyectos': len(self.proyectos),
+            'empleados_proyecto': len(self.asignaciones),
+        }
+
+    def empleados_de_proyecto(self, id_proyecto):
+        return [asignacion.empleado for asignacion in self.asignaciones_por_proyecto.get(id_proyecto, ())]
+
+    def proyectos_de_empleado(self, dni):
+        return [asignacion.proyecto for asignacion in self.asignaciones_por_empleado.get(dni, ())]
+
+def _consultas(clientes):
+    """
+    Las cuatro SELECT del grafo; con 'clientes' (lista de dni_cif o
+    consulta que los devuelva) se limitan a esos clientes y a lo que
+    cuelga de ellos.
+    """
+    consulta_clientes = Cliente.select(Cliente.dni_cif, Cliente.nombre_cliente,
+                                       Cliente.tlf, Cliente.email)
+    consulta_empleados = Empleado.select(Empleado.dni, Empleado.nombre,
+                                         Empleado.jefe, Empleado.email)
+    consulta_proyectos = Proyecto.select(
+        Proyecto.id_proyecto, Proyecto.titulo_proyecto, Proyecto.descripcion,
+        Proyecto.fecha_inicio, Proyecto.fecha_fin, Proyecto.presupuesto,
+        Proyecto.id_cliente, Proyecto.id_jefe_proyecto)
+    consulta_asignaciones = EmpleadoProyecto.select(EmpleadoProyecto.id_empleado,
+                                                    EmpleadoProyecto.id_proyecto)
+
+    if clientes is not None:
+        if not isinstance(clientes, Node):
+            clientes = list(clientes)
+        de_los_clientes = Proyecto.id_cliente.in_(clientes)
+        ids_proyectos = Proyecto.select(Proyecto.id_proyecto).where(de_los_clientes)
+        consulta_clientes = consulta_clientes.where(Cliente.dni_cif.in_(clientes))
+        consulta_proyectos = consulta_proyectos.where(de_los_clientes)
+        consulta_asignaciones = consulta_asignaciones.where(
+            EmpleadoProyecto.id_proyecto.in_(ids_proyectos))
+        # Solo los empleados que dirigen o trabajan en esos proyectos
+        consulta_empleados = consulta_empleados.where(
+            Empleado.dni.in_(Proyecto.select(Proyecto.id_jefe_proyecto).where(de_los_clientes)) |
+            Empleado.dni.in_(EmpleadoProyecto.select(EmpleadoProyecto.id_empleado)
+                             .where(EmpleadoProyecto.id_proyecto.in_(ids_proyectos))))
+
+    return (consulta_clientes, consulta_empleados, consulta_proyectos, consulta_asignaciones)
+
+@presupuesto_consultas(5)
+def cargar_grafo(clientes=None):
+    """
+    Carga el grafo completo, o solo el de los clientes indicados, con
+    una consulta por tabla (más el BEGIN de la transacción de lectura).
+    Devuelve un Grafo.
+    """
+    grafo = Grafo()
+    consulta_clientes, consulta_empleados, consulta_proyectos, consulta_asignaciones = _consultas(clientes)
+
+    # Las cuatro consultas se cruzan por clave: tienen que leer la misma
+    # versión de los datos, en la misma réplica
+    with sesion(), lectura_consistente():
+        for fila in consulta_clientes.tuples().iterator():
+            grafo.clientes[fila[0]] = RegistroCliente(*fila)
+
+        for fila in consulta_empleados.tuples().iterator():
+            grafo.empleados[fila[0]] = RegistroEmpleado(*fila)
+
+        clientes_ = grafo.clientes
+        empleados = grafo.empleados
+        for (id_proyecto, titulo, descripcion, fecha_inicio, fecha_fin,
+             presupuesto, id_cliente, id_jefe) in consulta_proyectos.tuples().iterator():
+            proyecto = RegistroProyecto(id_proyecto, titulo, descripcion, fecha_inicio, fecha_fin,
+                                        presupuesto, clientes_[id_cliente], empleados[id_jefe])
+            grafo.proyectos[id_proyecto] = proyecto
+            grafo.proyectos_por_cliente[id_cliente].append(proyecto)
+            grafo.proyecto_por_jefe[id_jefe] = proyecto
+
+        proyectos = grafo.proyectos
+        for id_empleado, id_proyecto in consulta_asignaciones.tuples().iterator():
+            asignacion = RegistroAsignacion(empleados[id_empleado], proyectos[id_proyecto])
+            grafo.asignaciones.append(asignacion)
+            grafo.asignaciones_por_proyecto[id_proyecto].append(asignacion)
+            grafo.asignaciones_por_empleado[id_empleado].append(asignacion)
+
+    return grafo
+
+# --- Medición de memoria ---
+def _cargar_modelos(clientes=None):
+    # Lo mismo con instancias de modelo de peewee, para comparar
+    return [list(consulta.objects()) for consulta in _consultas(clientes)]
+
+def medir_memoria(clientes=None, comparar_modelos=False):
+    """
+    Carga el grafo midiendo la memoria con tracemalloc y devuelve
+    {'filas', 'bytes', 'bytes_por_fila', 'segundos'}; con
+    comparar_modelos=True añade 'modelos' con la misma medida para
+    instancias de modelo de peewee (sin índices).
+    """
+    def medir(funcion):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        resultado = funcion(clientes)
+        segundos = time.perf_counter() - inicio
+        memoria = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return resultado, memoria, segundos
+
+    grafo, memoria, segundos = medir(cargar_grafo)
+    filas = sum(grafo.filas().values())
+    informe = {
+        'filas': grafo.filas(),
+        'bytes': memoria,
+        'bytes_por_fila': memoria / filas if filas else 0,
+        'segundos': segundos,
+    }
+    del grafo
+
+    if comparar_modelos:
+        _, memoria, segundos = medir(_cargar_modelos)
+        informe['modelos'] = {
+            'bytes': memoria,
+            'bytes_por_fila': memoria / filas if filas else 0,
+            'segundos': segundos,
+        }
+    return informe
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Carga el grafo en memoria y mide cuánto ocupa')
+    parser.add_argument('clientes', nargs='*', help='Limitar el grafo a estos DNI/CIF')
+    parser.add_argument('--modelos', action='store_true',
+                        help='Comparar con las mismas filas como instancias de modelo de peewee')
+    args = parser.parse_args()
+
+    informe = medir_memoria(args.clientes or None, args.modelos)
+    print("--- Grafo en memoria ---")
+    for tabla, filas in informe['filas'].items():
+        print(f"{tabla:<20} {filas:>10} filas")
+    print(f"{'grafo (__slots__)':<20} {informe['bytes'] / 2**20:10.1f} MiB | "
+          f"{informe['bytes_por_fila']:6.0f} bytes/fila | {informe['segundos']:.2f} s")
+    if 'modelos' in informe:
+        modelos = informe['modelos']
+        print(f"{'modelos peewee':<20} {modelos['bytes'] / 2**20:10.1f} MiB | "
+              f"{modelos['bytes_por_fila']:6.0f} bytes/fila | {modelos['segundos']:.2f} s")
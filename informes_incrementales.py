@@ -0,0 +1,309 @@
+import argparse
+import datetime
+import os
+import pickle
+import time
+from collections import namedtuple
+from peewee import *
+import conexion
+from conexion import db, sesion
+from crear_tablas import Cliente, Proyecto, EmpleadoProyecto, Cambio
+import cambios
+import consultas
+
+# Refresco incremental de los informes de consultas.py a partir del
+# registro de cambios (cambios.py).
+# Cada informe tiene una clave por la que se puede recalcular por partes:
+# el cliente en los informes 1, 3 y 5 y el proyecto en el 2 y el 4. La
+# caché guarda las filas de cada clave y el punto de control (id hasta el
+# que están aplicados todos los cambios). Al refrescar se leen los cambios
+# posteriores, se averigua qué claves tocan, se recalculan solo esas con el
+# mismo SELECT del informe filtrado por clave, y se sustituyen sus filas en
+# la caché.
+# Si el registro tiene filas sin identificar (cargas masivas, restauración
+# de una instantánea) o las claves tocadas pasan de PROPORCION_MAXIMA de
+# las del informe, se recalcula el informe completo.
+# Solo cubre las tablas calientes, no el archivo de proyectos.
+# Con escrituras concurrentes (MySQL) una transacción larga puede confirmar
+# cambios con ids menores que otros ya leídos: en el registro se ve un
+# hueco en los ids. El punto de control se queda antes del primer hueco y
+# se guardan los ids ya aplicados por encima de él; el siguiente refresco
+# vuelve a leer desde ahí y aplica solo los que no había visto. Un hueco
+# que sigue sin llenarse ESPERA_HUECOS segundos después del cambio que lo
+# sigue se da por perdido (una transacción deshecha también deja huecos).
+
+# Proporción de claves tocadas a partir de la que sale más a cuenta
+# recalcular el informe completo
+PROPORCION_MAXIMA = 0.05
+# Claves recalculadas por consulta: en el informe 2 la subconsulta de
+# participaciones no tiene índice y el coste crece con el cuadrado del lote
+TAMANO_LOTE_CLAVES = 250
+# Segundos que se espera a que se confirme el cambio de un id que falta en
+# el registro antes de darlo por perdido
+ESPERA_HUECOS = 300
+VERSION = 2
+
+# Informe -> clave por la que se recalcula y tablas de las que depende
+CLAVES = {
+    1: 'clientes',
+    2: 'proyectos',
+    3: 'clientes',
+    4: 'proyectos',
+    5: 'clientes',
+}
+TABLAS = {
+    1: {'clientes', 'proyectos'},
+    2: {'proyectos', 'empleados', 'empleados_proyecto'},
+    3: {'clientes', 'proyectos'},
+    4: {'proyectos', 'empleados', 'empleados_proyecto'},
+    5: {'clientes', 'proyectos', 'empleados_proyecto'},
+}
+COLUMNA_CLAVE = {'clientes': Cliente.dni_cif, 'proyectos': Proyecto.id_proyecto}
+
+# --- Claves tocadas por los cambios ---
+def _clientes_de_proyectos(proyectos):
+    clientes = set()
+    for lote in chunked(sorted(proyectos), cambios.TAMANO_LOTE):
+        clientes.update(id_cliente for id_cliente, in (Proyecto
+                                                       .select(Proyecto.id_cliente)
+                                                       .where(Proyecto.id_proyecto.in_(lote))
+                                                       .tuples()))
+    return clientes
+
+def _proyectos_de(campo, valores):
+    # Proyectos (id) cuyas filas tienen 'campo' en 'valores'
+    proyectos = set()
+    columna = getattr(campo.model, 'id_proyecto')
+    for lote in chunked(sorted(valores), cambios.TAMANO_LOTE):
+        proyectos.update(id_proyecto for id_proyecto, in (campo.model
+                                                          .select(columna)
+                                                          .where(campo.in_(lote))
+                                                          .tuples()))
+    return proyectos
+
+def claves_tocadas(numero, registrados):
+    """
+    Claves del informe 'numero' cuyas filas pueden haber cambiado con los
+    cambios 'registrados', o None si hay que recalcularlo entero.
+    """
+    tablas = TABLAS[numero]
+    clientes, proyectos, empleados, asignaciones = set(), set(), set(), set()
+    for cambio in registrados:
+        if cambio.tabla not in tablas:
+            continue
+        if cambio.clave is None:
+            return None
+        if cambio.tabla == 'clientes':
+            clientes.add(cambio.id_cliente)
+        elif cambio.tabla == 'proyectos':
+            clientes.add(cambio.id_cliente)
+            proyectos.add(cambio.id_proyecto)
+        elif cambio.tabla == 'empleados':
+            empleados.add(cambio.id_empleado)
+        else:
+            asignaciones.add((cambio.id_empleado, cambio.id_proyecto))
+
+    if CLAVES[numero] == 'clientes':
+        # Las asignaciones se apuntan con su proyecto: cuenta su cliente
+        # (un proyecto borrado tiene su propio cambio con el cliente)
+        return clientes | _clientes_de_proyectos({id_proyecto for _, id_proyecto in asignaciones})
+
+    proyectos |= {id_proyecto for _, id_proyecto in asignaciones}
+    if numero == 4:
+        # El nombre del jefe sale en las filas de sus proyectos
+        return proyectos | _proyectos_de(Proyecto.id_jefe_proyecto, empleados)
+    # Informe 2: el nombre y el nº de proyectos de un empleado salen en
+    # las filas de todos sus proyectos
+    empleados |= {id_empleado for id_empleado, _ in asignaciones}
+    return proyectos | _proyectos_de(EmpleadoProyecto.id_empleado, empleados)
+
+# --- Punto de control ---
+def avanzar_punto_control(punto_control, vistos, ahora=None):
+    """
+    Avanza el punto de control por los ids de 'vistos' ({id: fecha} de los
+    cambios ya aplicados por encima de él) mientras no haya huecos, o el
+    hueco tenga más de ESPERA_HUECOS segundos. Devuelve el nuevo punto de
+    control y los vistos que quedan por encima.
+    """
+    limite = (ahora or datetime.datetime.now()) - datetime.timedelta(seconds=ESPERA_HUECOS)
+    for id_cambio in sorted(vistos):
+        if id_cambio != punto_control + 1 and vistos[id_cambio] >= limite:
+            break
+        punto_control = id_cambio
+    return punto_control, {id_cambio: fecha for id_cambio, fecha in vistos.items()
+                           if id_cambio > punto_control}
+
+def _punto_control_inicial():
+    # Al calcular el informe completo: sus filas ya incluyen todo lo
+    # confirmado, pero puede haber transacciones en curso con ids por debajo
+    # de los últimos cambios. Se parte de los cambios recientes como vistos
+    limite = datetime.datetime.now() - datetime.timedelta(seconds=ESPERA_HUECOS)
+    punto_control = (Cambio.select(fn.MAX(Cambio.id)).where(Cambio.fecha < limite).scalar() or 0)
+    vistos = dict(Cambio.select(Cambio.id, Cambio.fecha).where(Cambio.id > punto_control).tuples())
+    return avanzar_punto_control(punto_control, vistos)
+
+# --- Caché de un informe ---
+class InformeIncremental:
+    """
+    Filas de un informe de consultas.py guardadas por clave, que se ponen
+    al día con refrescar(). Con 'ruta' la caché se lee de ese fichero y se
+    guarda en él al refrescar.
+    """
+    def __init__(self, numero, ruta=None):
+        if numero not in CLAVES:
+            raise ValueError(f"Informe no soportado: {numero} (usar {', '.join(map(str, CLAVES))})")
+        self.numero = numero
+        self.ruta = ruta
+        self.punto_control = None
+        self.vistos = {}        # id -> fecha de los cambios aplicados por encima del punto de control
+        self.campos = None
+        self._por_clave = {}    # clave -> [filas]
+        self._fila = None
+        if ruta is not None and os.path.exists(ruta):
+            self._cargar()
+
+    @property
+    def _bd(self):
+        return f"{conexion.BACKEND}:{db.database}"
+
+    def _cargar(self):
+        with open(self.ruta, 'rb') as fichero:
+            datos = pickle.load(fichero)
+        # Una caché de otra versión, otro informe u otra BD no sirve
+        if (datos.get('version'), datos.get('numero'), datos.get('bd')) != (VERSION, self.numero, self._bd):
+            return
+        self.punto_control = datos['punto_control']
+        self.vistos = datos['vistos']
+        self.campos = datos['campos']
+        self._por_clave = datos['filas']
+
+    def _guardar(self):
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, 'wb') as fichero:
+            pickle.dump({'version': VERSION, 'numero': self.numero, 'bd': self._bd,
+                         'punto_control': self.punto_control, 'vistos': self.vistos,
+                         'campos': self.campos,
+                         'filas': self._por_clave}, fichero, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, self.ruta)
+
+    def _calcular(self, claves=None):
+        """
+        {clave: [filas]} del informe, solo de 'claves' si se indican.
+        """
+        tipo = CLAVES[self.numero]
+        seleccion = getattr(consultas, f'select_informe_{self.numero}')
+        filtro = {} if claves is None else {tipo: claves}
+        consulta = (seleccion(False, **filtro)
+                    .select_extend(COLUMNA_CLAVE[tipo].alias('clave_informe'))
+                    .namedtuples())
+        por_clave = {}
+        for fila in consulta:
+            if self.campos is None:
+                self.campos = fila._fields[:-1]
+            por_clave.setdefault(fila[-1], []).append(tuple(fila[:-1]))
+        return por_clave
+
+    def refrescar(self):
+        """
+        Pone la caché al día con los cambios registrados desde el último
+        refresco. Devuelve {'cambios', 'claves', 'completo', 'segundos'}:
+        cambios leídos, claves recalculadas (None si se recalculó todo) y
+        si se recalculó el informe completo.
+        """
+        inicio = time.perf_counter()
+        # En una transacción: el informe y el punto de control se leen del
+        # mismo estado de la BD (y del primario aunque haya réplicas)
+        with sesion(transaccion=True):
+            ultimo = cambios.ultimo_cambio()
+            registrados = []
+            claves = None
+            # Un punto de control por delante del registro: el registro se ha recreado
+            incremental = self.punto_control is not None and self.punto_control <= ultimo
+            if incremental:
+                # Se leen todas las tablas para ver los huecos en los ids
+                nuevos = [cambio for cambio in cambios.cambios_desde(self.punto_control, ultimo).namedtuples()
+                          if cambio.id not in self.vistos]
+                self.vistos.update((cambio.id, cambio.fecha) for cambio in nuevos)
+                registrados = [cambio for cambio in nuevos if cambio.tabla in TABLAS[self.numero]]
+                claves = claves_tocadas(self.numero, registrados)
+                if claves is not None and len(claves) > PROPORCION_MAXIMA * len(self._por_clave):
+                    claves = None
+
+            if claves is None:
+                self._por_clave = self._calcular()
+            elif claves:
+                nuevas = {}
+                for lote in chunked(sorted(claves), TAMANO_LOTE_CLAVES):
+                    nuevas.update(self._calcular(lote))
+                for clave in claves:
+                    self._por_clave.pop(clave, None)
+                self._por_clave.update(nuevas)
+            if incremental:
+                self.punto_control, self.vistos = avanzar_punto_control(self.punto_control, self.vistos)
+            else:
+                self.punto_control, self.vistos = _punto_control_inicial()
+
+        if self.ruta is not None:
+            self._guardar()
+        return {'cambios': len(registrados), 'claves': None if claves is None else len(claves),
+                'completo': claves is None, 'segundos': time.perf_counter() - inicio}
+
+    def filas(self):
+        """
+        Filas del informe en su orden, como las de filas_consulta_N().
+        """
+        if self.campos is None:
+            return
+        if self._fila is None or self._fila._fields != self.campos:
+            self._fila = namedtuple('Row', self.campos)
+        # Los informes van ordenados por su clave (y dentro de cada clave,
+        # las filas se guardan en el orden del informe)
+        for clave in sorted(self._por_clave):
+            for fila in self._por_clave[clave]:
+                yield self._fila._make(fila)
+
+def comprobar(informe):
+    """
+    Compara la caché con el informe calculado desde cero. Devuelve el
+    número de la primera fila que no coincide, o None si coinciden.
+    """
+    with sesion(transaccion=True):
+        completo = consultas.INFORMES[informe.numero](False)
+        guardado = informe.filas()
+        try:
+            posicion = 0
+            for esperada, fila in zip(completo, guardado):
+                if tuple(esperada) != tuple(fila):
+                    return posicion
+                posicion += 1
+            # Una de las dos tiene filas de más
+            if next(completo, None) is not None or next(guardado, None) is not None:
+                return posicion
+        finally:
+            # Cierra el cursor del informe antes de terminar la sesión
+            completo.close()
+    return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Informes refrescados a partir del registro de cambios')
+    parser.add_argument('informe', type=int, choices=sorted(CLAVES))
+    parser.add_argument('--cache', required=True, help='Fichero de la caché del informe')
+    parser.add_argument('--salida', help='Fichero .csv o .jsonl donde escribir el informe refrescado')
+    parser.add_argument('--comprobar', action='store_true',
+                        help='Comparar la caché refrescada con el informe completo')
+    args = parser.parse_args()
+
+    informe = InformeIncremental(args.informe, args.cache)
+    estado = informe.refrescar()
+    alcance = 'informe completo' if estado['completo'] else f"{estado['claves']} {CLAVES[args.informe]}"
+    print(f"Informe {args.informe}: {estado['cambios']} cambios, recalculado: {alcance} "
+          f"({estado['segundos']:.2f} s). Punto de control: {informe.punto_control}")
+    if args.salida:
+        escritas = consultas.exportar_informe(informe.filas(), args.salida)
+        print(f"{escritas} filas escritas en {args.salida}")
+    if args.comprobar:
+        diferencia = comprobar(informe)
+        if diferencia is not None:
+            print(f"La caché no coincide con el informe completo desde la fila {diferencia}.")
+            raise SystemExit(1)
+        print("La caché coincide con el informe completo.")
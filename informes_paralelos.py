@@ -0,0 +1,158 @@
+import argparse
+import io
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext, redirect_stdout
+import conexion
+from conexion import db, sesion
+import consultas
+
+# Ejecución en paralelo de consulta_1..consulta_5, sobre la BD configurada
+# o sobre las BDs de varios clientes (tenants) del mismo servidor.
+# Cada informe corre en un trabajador con su propia conexión; su salida se
+# captura y se emite al terminar, siempre en el orden (base, informe) pedido
+# y no en el orden en que acaban.
+#
+# Con hilos todas las tareas comparten el db del proceso, así que solo se
+# puede usar la BD configurada. Con procesos cada trabajador apunta su db a
+# la base de la tarea (conexion.cambiar_base), y el trabajo escala con los
+# núcleos: el tratamiento de filas en Python no compite por el GIL.
+
+ResultadoInforme = namedtuple('ResultadoInforme', 'base numero segundos salida error')
+
+MODOS = ('hilos', 'procesos')
+
+# --- Captura de la salida por hilo ---
+_local = threading.local()
+
+class _SalidaPorHilo(io.TextIOBase):
+    """
+    Sustituto de sys.stdout que envía lo que escribe cada hilo a su propio
+    buffer (si lo tiene) y el resto a la salida original.
+    """
+    def __init__(self, original):
+        self.original = original
+
+    def write(self, texto):
+        destino = getattr(_local, 'salida', None) or self.original
+        return destino.write(texto)
+
+    def flush(self):
+        self.original.flush()
+
+@contextmanager
+def _salida_por_hilo():
+    original = sys.stdout
+    sys.stdout = _SalidaPorHilo(original)
+    try:
+        yield
+    finally:
+        sys.stdout = original
+
+@contextmanager
+def _capturar(buffer):
+    if isinstance(sys.stdout, _SalidaPorHilo):
+        _local.salida = buffer
+        try:
+            yield
+        finally:
+            _local.salida = None
+    else:
+        # Trabajador de un proceso: la salida es solo suya
+        with redirect_stdout(buffer):
+            yield
+
+# --- Trabajo de cada tarea ---
+def _ejecutar_informe(base, numero):
+    if base is not None and base != conexion.DB_NAME:
+        conexion.cambiar_base(base)
+    buffer = io.StringIO()
+    error = None
+    inicio = time.perf_counter()
+    with _capturar(buffer):
+        try:
+            with sesion():
+                getattr(consultas, f'consulta_{numero}')()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    segundos = time.perf_counter() - inicio
+    return ResultadoInforme(base or conexion.DB_NAME, numero, segundos, buffer.getvalue(), error)
+
+def ejecutar_informes(numeros=None, bases=None, trabajadores=4, modo='hilos'):
+    """
+    Ejecuta los informes indicados (por defecto todos) sobre cada base de
+    'bases' (por defecto la configurada) con 'trabajadores' hilos o procesos.
+    Genera un ResultadoInforme por tarea en orden estable: por base y, dentro
+    de cada base, por número de informe. Cada resultado se entrega en cuanto
+    han terminado él y todos los anteriores.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo no soportado: '{modo}' (usar {' o '.join(MODOS)})")
+    numeros = sorted(numeros or consultas.INFORMES)
+    bases = list(bases or [None])
+    if modo == 'hilos' and bases != [None] and set(bases) != {conexion.DB_NAME}:
+        raise ValueError("Con hilos solo se puede usar la BD configurada: usar modo='procesos'")
+
+    # El proceso principal no debe tener una conexión abierta al crear los
+    # procesos: se heredaría compartida
+    conexion.enrutador.cerrar_replicas()
+    if not db.is_closed():
+        db.close()
+
+    tareas = [(base, numero) for base in bases for numero in numeros]
+    if modo == 'hilos':
+        contexto = _salida_por_hilo()
+        pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix='informe')
+    else:
+        contexto = nullcontext()
+        pool = ProcessPoolExecutor(max_workers=trabajadores)
+
+    with contexto, pool:
+        futuros = [pool.submit(_ejecutar_informe, base, numero) for base, numero in tareas]
+        for futuro in futuros:
+            yield futuro.result()
+
+def imprimir_resultados(resultados):
+    """
+    Emite la salida de cada informe seguida de su tiempo y devuelve
+    (tiempo total sumado, número de informes con error).
+    """
+    total = 0.0
+    errores = 0
+    base_actual = object()
+    for resultado in resultados:
+        if resultado.base != base_actual:
+            base_actual = resultado.base
+            print(f"\n===== Base de datos: {base_actual} =====")
+        sys.stdout.write(resultado.salida)
+        if resultado.error:
+            errores += 1
+            print(f"Error en consulta_{resultado.numero}: {resultado.error}")
+        print(f"[consulta_{resultado.numero}: {resultado.segundos:.3f} s]")
+        total += resultado.segundos
+    return total, errores
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ejecuta consulta_1..consulta_5 en paralelo')
+    parser.add_argument('informes', nargs='*', type=int,
+                        help=f"Informes a ejecutar ({', '.join(map(str, consultas.INFORMES))}; por defecto, todos)")
+    parser.add_argument('--bases', nargs='+',
+                        help='Bases de datos (o ficheros SQLite) sobre las que ejecutarlos; implica --modo procesos')
+    parser.add_argument('--trabajadores', type=int, default=4, help='Hilos o procesos en paralelo')
+    parser.add_argument('--modo', choices=MODOS, help='hilos (por defecto) o procesos')
+    args = parser.parse_args()
+    desconocidos = set(args.informes) - set(consultas.INFORMES)
+    if desconocidos:
+        parser.error(f"Informes desconocidos: {sorted(desconocidos)}")
+
+    modo = args.modo or ('procesos' if args.bases else 'hilos')
+    inicio = time.perf_counter()
+    total, errores = imprimir_resultados(
+        ejecutar_informes(args.informes, args.bases, args.trabajadores, modo))
+    print(f"\n{total:.3f} s sumando los informes | {time.perf_counter() - inicio:.3f} s en total "
+          f"({args.trabajadores} {modo})")
+    if errores:
+        raise SystemExit(1)
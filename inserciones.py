@@ -1,10 +1,23 @@
 from peewee import *
 from conexion import db, conectar_bd, cerrar_bd
-from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto, IGNORAR, con_upsert
+from cache_claves import obtener_cliente, obtener_empleado, obtener_jefe
 import datetime
 from decimal import Decimal
 
-def insertar_clientes():
+# Todas las inserciones admiten un modo upsert (ver con_upsert en crear_tablas.py):
+#   en_conflicto=None       -> INSERT normal, un duplicado hace fallar la operación
+#   en_conflicto='ignorar'  -> las filas que ya existen se dejan como están
+#   en_conflicto=[campos]   -> las filas que ya existen se actualizan con esos campos
+# 'objetivo' son los campos únicos que definen el conflicto en SQLite.
+def _insertar_lote(modelo, instancias, en_conflicto=None, objetivo=None):
+    if en_conflicto is None:
+        modelo.bulk_create(instancias)
+    else:
+        filas = [instancia.__data__ for instancia in instancias]
+        con_upsert(modelo.insert_many(filas), en_conflicto, objetivo).execute()
+
+def insertar_clientes(en_conflicto=None, objetivo=None):
     if not conectar_bd():
         return
     
@@ -17,7 +30,7 @@ def insertar_clientes():
 
     try:
         with db.atomic():
-            Cliente.bulk_create(clientes_para_insertar)
+            _insertar_lote(Cliente, clientes_para_insertar, en_conflicto, objetivo)
         print(f"{len(clientes_para_insertar)} clientes insertados correctamente.")
     except IntegrityError as e:
         print(f"Error de integridad al insertar clientes: {e}")
@@ -26,7 +39,7 @@ def insertar_clientes():
     finally:
         cerrar_bd()
 
-def insertar_empleados():
+def insertar_empleados(en_conflicto=None, objetivo=None):
     if not conectar_bd():
         return
 
@@ -40,7 +53,7 @@ def insertar_empleados():
 
     try:
         with db.atomic():
-            Empleado.bulk_create(empleados_para_insertar)
+            _insertar_lote(Empleado, empleados_para_insertar, en_conflicto, objetivo)
         print(f"{len(empleados_para_insertar)} empleados insertados correctamente.")
     except IntegrityError as e:
         print(f"Error de integridad al insertar empleados: {e}")
@@ -49,7 +62,7 @@ def insertar_empleados():
     finally:
         cerrar_bd()
 
-def insertar_proyecto():
+def insertar_proyecto(en_conflicto=None, objetivo=None):
     if not conectar_bd():
         return
 
@@ -57,8 +70,8 @@ def insertar_proyecto():
         with db.atomic():
             cliente_id = '12345678A'
             jefe_proyecto_id = '33333333Z'
-            cliente = Cliente.get_or_none(Cliente.dni_cif == cliente_id)
-            jefe = Empleado.get_or_none((Empleado.dni == jefe_proyecto_id) & (Empleado.jefe == True))
+            cliente = obtener_cliente(cliente_id)
+            jefe = obtener_jefe(jefe_proyecto_id)
 
             if not cliente:
                 print(f"Error: El cliente con DNI/CIF '{cliente_id}' no existe.")
@@ -67,7 +80,7 @@ def insertar_proyecto():
                 print(f"Error: El empleado con DNI '{jefe_proyecto_id}' no existe o no es jefe.")
                 return
 
-            proyecto = Proyecto.create(
+            datos = dict(
                 titulo_proyecto='Desarrollo Web Corporativa',
                 descripcion='Creación de la página web y tienda online para Empresa A.',
                 fecha_inicio='2024-01-15',
@@ -76,6 +89,13 @@ def insertar_proyecto():
                 id_cliente=cliente,
                 id_jefe_proyecto=jefe
             )
+            if en_conflicto is None:
+                proyecto = Proyecto.create(**datos)
+            else:
+                # El id es autoincremental: el conflicto natural es el jefe, que es único
+                con_upsert(Proyecto.insert(**datos), en_conflicto,
+                           objetivo or [Proyecto.id_jefe_proyecto]).execute()
+                proyecto = Proyecto.get(Proyecto.id_jefe_proyecto == jefe)
             print(f"Proyecto '{proyecto.titulo_proyecto}' insertado con ID: {proyecto.id_proyecto}")
 
     except IntegrityError as e:
@@ -85,7 +105,7 @@ def insertar_proyecto():
     finally:
         cerrar_bd()
 
-def asignar_empleado_a_proyecto():
+def asignar_empleado_a_proyecto(en_conflicto=None):
     if not conectar_bd():
         return
 
@@ -93,7 +113,7 @@ def asignar_empleado_a_proyecto():
         with db.atomic():
             empleado_id = '22222222Y'
             proyecto = Proyecto.get_or_none(Proyecto.titulo_proyecto == 'Desarrollo Web Corporativa')
-            empleado = Empleado.get_or_none(Empleado.dni == empleado_id)
+            empleado = obtener_empleado(empleado_id)
 
             if not empleado:
                 print(f"Error: El empleado con DNI '{empleado_id}' no existe.")
@@ -102,7 +122,11 @@ def asignar_empleado_a_proyecto():
                 print(f"Error: El proyecto 'Desarrollo Web Corporativa' no existe.")
                 return
 
-            EmpleadoProyecto.create(id_empleado=empleado, id_proyecto=proyecto)
+            if en_conflicto is None:
+                EmpleadoProyecto.create(id_empleado=empleado, id_proyecto=proyecto)
+            else:
+                # Todas las columnas son clave: solo tiene sentido ignorar el duplicado
+                con_upsert(EmpleadoProyecto.insert(id_empleado=empleado, id_proyecto=proyecto)).execute()
             print(f"Empleado '{empleado.nombre}' asignado al proyecto '{proyecto.titulo_proyecto}'.")
 
     except IntegrityError as e:
@@ -112,55 +136,60 @@ def asignar_empleado_a_proyecto():
     finally:
         cerrar_bd()
 
-def insertar_proyectos_prueba():
+def insertar_proyectos_prueba(en_conflicto=None, objetivo=None):
     if not conectar_bd():
         return
 
     try:
         with db.atomic():
-            cliente_a = Cliente.get_or_none(Cliente.dni_cif == '12345678A')
-            cliente_b = Cliente.get_or_none(Cliente.dni_cif == 'B87654321')
-            jefe_juan = Empleado.get_or_none(Empleado.dni == '11111111X')
-            jefe_carlos = Empleado.get_or_none(Empleado.dni == '33333333Z')
-            jefe_pedro = Empleado.get_or_none(Empleado.dni == '55555555B')
+            cliente_a = obtener_cliente('12345678A')
+            cliente_b = obtener_cliente('B87654321')
+            jefe_juan = obtener_empleado('11111111X')
+            jefe_carlos = obtener_empleado('33333333Z')
+            jefe_pedro = obtener_empleado('55555555B')
 
             if not (cliente_a and cliente_b and jefe_juan and jefe_carlos and jefe_pedro):
                 print("Error: Faltan clientes o empleados jefe para crear proyectos.")
                 return
 
-            p2 = Proyecto.create(
-                titulo_proyecto='App Móvil',
-                descripcion='Aplicación para iOS y Android',
-                fecha_inicio=datetime.date(2024, 3, 1),
-                fecha_fin=datetime.date(2025, 12, 31),
-                presupuesto=Decimal('25000.00'),
-                id_cliente=cliente_b,
-                id_jefe_proyecto=jefe_juan
-            )
-
-            p3 = Proyecto.create(
-                titulo_proyecto='Proyecto Antiguo Barato',
-                descripcion='Proyecto terminado hace tiempo',
-                fecha_inicio=datetime.date(2019, 1, 1),
-                fecha_fin=datetime.date(2020, 6, 30),
-                presupuesto=Decimal('5000.00'),
-                id_cliente=cliente_a,
-                id_jefe_proyecto=jefe_pedro
-            )
-
-            ana = Empleado.get_or_none(Empleado.dni == '22222222Y')
-            maria = Empleado.get_or_none(Empleado.dni == '44444444A')
+            proyectos = [
+                dict(
+                    titulo_proyecto='App Móvil',
+                    descripcion='Aplicación para iOS y Android',
+                    fecha_inicio=datetime.date(2024, 3, 1),
+                    fecha_fin=datetime.date(2025, 12, 31),
+                    presupuesto=Decimal('25000.00'),
+                    id_cliente=cliente_b,
+                    id_jefe_proyecto=jefe_juan
+                ),
+                dict(
+                    titulo_proyecto='Proyecto Antiguo Barato',
+                    descripcion='Proyecto terminado hace tiempo',
+                    fecha_inicio=datetime.date(2019, 1, 1),
+                    fecha_fin=datetime.date(2020, 6, 30),
+                    presupuesto=Decimal('5000.00'),
+                    id_cliente=cliente_a,
+                    id_jefe_proyecto=jefe_pedro
+                ),
+            ]
+            if en_conflicto is None:
+                p2 = Proyecto.create(**proyectos[0])
+                Proyecto.create(**proyectos[1])
+            else:
+                con_upsert(Proyecto.insert_many(proyectos), en_conflicto,
+                           objetivo or [Proyecto.id_jefe_proyecto]).execute()
+                p2 = Proyecto.get(Proyecto.id_jefe_proyecto == jefe_juan)
+
+            ana = obtener_empleado('22222222Y')
+            maria = obtener_empleado('44444444A')
 
             if ana and maria:
-                try:
-                    proyecto_web = Proyecto.get(Proyecto.titulo_proyecto == 'Desarrollo Web Corporativa')
-                    EmpleadoProyecto.create(id_empleado=ana, id_proyecto=proyecto_web)
-                except IntegrityError:
-                    pass
-                try:
-                    EmpleadoProyecto.create(id_empleado=maria, id_proyecto=p2)
-                except IntegrityError:
-                    pass
+                # Una sola sentencia; las asignaciones que ya existen se ignoran
+                proyecto_web = Proyecto.get(Proyecto.titulo_proyecto == 'Desarrollo Web Corporativa')
+                con_upsert(EmpleadoProyecto.insert_many([
+                    {'id_empleado': ana, 'id_proyecto': proyecto_web},
+                    {'id_empleado': maria, 'id_proyecto': p2},
+                ]), IGNORAR).execute()
 
         print("Proyectos de prueba insertados correctamente.")
     except Exception as e:
@@ -169,15 +198,22 @@ def insertar_proyectos_prueba():
         cerrar_bd()
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Inserciones de prueba en la BD Empresa')
+    parser.add_argument('--idempotente', action='store_true',
+                        help='Ignorar las filas que ya existan (se puede volver a ejecutar sin errores)')
+    args = parser.parse_args()
+    en_conflicto = IGNORAR if args.idempotente else None
+
     print("--- Ejecutando inserciones ---")
     print("\n1. Insertando clientes...")
-    insertar_clientes()
+    insertar_clientes(en_conflicto)
     print("\n2. Insertando empleados...")
-    insertar_empleados()
+    insertar_empleados(en_conflicto)
     print("\n3. Insertando un proyecto...")
-    insertar_proyecto()
+    insertar_proyecto(en_conflicto)
     print("\n4. Asignando un empleado a un proyecto...")
-    asignar_empleado_a_proyecto()
+    asignar_empleado_a_proyecto(en_conflicto)
     print("\n5. Insertando proyectos de prueba...")
-    insertar_proyectos_prueba()
+    insertar_proyectos_prueba(en_conflicto)
     print("\n--- Proceso de inserción finalizado ---")
@@ -0,0 +1,279 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from conexion import al_crear_replica, db, enrutador
+
+# Instrumentación SQL: mide cada sentencia que pasa por el execute_sql de
+# db o de las réplicas de lectura y la atribuye a la operación que la lanzó
+# (consulta_2, transaccion_limpieza_proyectos, ...).
+# Desactivada no cuesta nada: activar() sustituye execute_sql en cada
+# instancia por una envoltura que llama al execute_sql que hubiera (aunque
+# sea la envoltura de otro), y desactivar() lo deja como estaba. Las
+# réplicas que se configuran con la instrumentación activa se envuelven al
+# crearse.
+
+UMBRAL_LENTA = 0.5          # Segundos a partir de los que una sentencia es lenta
+MAX_SENTENCIAS = 10000      # Últimas sentencias que se guardan en detalle
+
+logger_lentas = logging.getLogger('empresa.consultas_lentas')
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+# Módulos de infraestructura: sus sentencias se atribuyen a la operación
+# que los ha invocado (p. ej. el mantenimiento del resumen por cliente)
+MODULOS_EXCLUIDOS = {'conexion.py', 'instrumentacion.py', 'crear_tablas.py',
+                     'cache_claves.py', 'resumen_clientes.py', 'cambios.py',
+                     'consultas_compiladas.py'}
+
+_bloqueo = threading.Lock()
+_local = threading.local()
+_estado = {
+    'activa': False,
+    'umbral_lenta': UMBRAL_LENTA,
+    'operaciones': {},
+    'sentencias': deque(maxlen=MAX_SENTENCIAS),
+    'originales': weakref.WeakKeyDictionary(),  # bd -> execute_sql antes de activar()
+    'manejador': None,      # FileHandler que ha añadido activar()
+}
+
+# --- Normalización ---
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_LISTA = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+def normalizar_sql(sql):
+    """
+    Sustituye literales por '?' y colapsa las listas IN (?, ?, ...)
+    para que sentencias con la misma forma se agrupen juntas.
+    """
+    sql = _RE_CADENA.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _RE_LISTA.sub('(?...)', sql)
+    return _RE_ESPACIOS.sub(' ', sql).strip()
+
+# --- Atribución a operaciones ---
+@contextmanager
+def operacion(nombre):
+    """
+    Atribuye explícitamente a 'nombre' las sentencias ejecutadas dentro
+    del bloque. Sin ella, la operación se deduce de la pila de llamadas.
+    """
+    pila = getattr(_local, 'operaciones', None)
+    if pila is None:
+        pila = _local.operaciones = []
+    pila.append(nombre)
+    try:
+        yield
+    finally:
+        pila.pop()
+
+def _operacion_actual():
+    pila = getattr(_local, 'operaciones', None)
+    if pila:
+        return pila[-1]
+
+    # Primera función pública de un módulo del proyecto en la pila
+    marco = sys._getframe(2)
+    while marco is not None:
+        codigo = marco.f_code
+        directorio, fichero = os.path.split(codigo.co_filename)
+        if (directorio == DIRECTORIO_PROYECTO and fichero not in MODULOS_EXCLUIDOS
+                and not codigo.co_name.startswith(('_', '<'))
+                and codigo.co_name != 'envoltura'):
+            return codigo.co_name
+        marco = marco.f_back
+    return 'desconocida'
+
+# --- Registro ---
+def _registrar(operacion_, sql, params, segundos, filas):
+    sql_normalizada = normalizar_sql(sql)
+    with _bloqueo:
+        stats = _estado['operaciones'].get(operacion_)
+        if stats is None:
+            stats = _estado['operaciones'][operacion_] = {
+                'sentencias': 0, 'tiempo_total': 0.0, 'tiempo_max': 0.0,
+                'filas': 0, 'lentas': 0, 'por_sql': {},
+            }
+        stats['sentencias'] += 1
+        stats['tiempo_total'] += segundos
+        stats['tiempo_max'] = max(stats['tiempo_max'], segundos)
+        stats['filas'] += filas or 0
+
+        por_sql = stats['por_sql'].get(sql_normalizada)
+        if por_sql is None:
+            por_sql = stats['por_sql'][sql_normalizada] = {'veces': 0, 'tiempo_total': 0.0}
+        por_sql['veces'] += 1
+        por_sql['tiempo_total'] += segundos
+
+        registro = {
+            'operacion': operacion_,
+            'sql': sql_normalizada,
+            'num_parametros': len(params or ()),
+            'segundos': segundos,
+            'filas': filas,
+        }
+        _estado['sentencias'].append(registro)
+
+        lenta = segundos >= _estado['umbral_lenta']
+        if lenta:
+            stats['lentas'] += 1
+
+    if lenta:
+        logger_lentas.warning(json.dumps(registro, ensure_ascii=False))
+
+def _instrumentar(execute_sql):
+    def execute_sql_instrumentado(sql, params=None, *args, **kwargs):
+        inicio = time.perf_counter()
+        cursor = execute_sql(sql, params, *args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        # rowcount es -1 en los SELECT de algunos drivers (p. ej. sqlite3)
+        filas = getattr(cursor, 'rowcount', -1)
+        _registrar(_operacion_actual(), sql, params, segundos, filas if filas >= 0 else None)
+        return cursor
+    return execute_sql_instrumentado
+
+def _envolver(bd):
+    # None: la instancia usaba el método de su clase
+    _estado['originales'][bd] = bd.__dict__.get('execute_sql')
+    bd.execute_sql = _instrumentar(bd.execute_sql)
+
+def _restaurar():
+    for bd, original in list(_estado['originales'].items()):
+        if original is None:
+            bd.__dict__.pop('execute_sql', None)
+        else:
+            bd.execute_sql = original
+    _estado['originales'].clear()
+
+@al_crear_replica
+def _instrumentar_replica(replica):
+    if _estado['activa']:
+        _envolver(replica)
+
+# --- API pública ---
+def activar(umbral_lenta=UMBRAL_LENTA, ruta_log_lentas=None):
+    """
+    Activa la instrumentación sobre el db compartido de conexion.py y sus
+    réplicas de lectura.
+    Las sentencias que tarden 'umbral_lenta' segundos o más se escriben
+    en el logger 'empresa.consultas_lentas' y, si se indica, en el fichero
+    'ruta_log_lentas' (una línea JSON por sentencia).
+    """
+    if _estado['activa']:
+        desactivar()
+    _estado['umbral_lenta'] = umbral_lenta
+    if ruta_log_lentas:
+        manejador = logging.FileHandler(ruta_log_lentas, encoding='utf-8')
+        manejador.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger_lentas.addHandler(manejador)
+        _estado['manejador'] = manejador
+    for bd in [db, *enrutador.replicas.values()]:
+        _envolver(bd)
+    _estado['activa'] = True
+
+def desactivar():
+    """
+    Restaura los execute_sql que había antes de activar(). Las
+    estadísticas se conservan.
+    """
+    if not _estado['activa']:
+        return
+    _restaurar()
+    manejador = _estado['manejador']
+    if manejador is not None:
+        logger_lentas.removeHandler(manejador)
+        manejador.close()
+        _estado['manejador'] = None
+    _estado['activa'] = False
+
+def activa():
+    return _estado['activa']
+
+def reiniciar():
+    """
+    Borra las estadísticas acumuladas.
+    """
+    with _bloqueo:
+        _estado['operaciones'].clear()
+        _estado['sentencias'].clear()
+
+@contextmanager
+def instrumentado(umbral_lenta=UMBRAL_LENTA, ruta_log_lentas=None):
+    """
+    Activa la instrumentación solo dentro del bloque.
+    """
+    activar(umbral_lenta, ruta_log_lentas)
+    try:
+        yield
+    finally:
+        desactivar()
+
+def estadisticas():
+    """
+    Resumen por operación: sentencias, tiempos, filas, sentencias lentas
+    y el desglose por SQL normalizada.
+    """
+    with _bloqueo:
+        return {
+            nombre: {
+                'sentencias': stats['sentencias'],
+                'tiempo_total': stats['tiempo_total'],
+                'tiempo_medio': stats['tiempo_total'] / stats['sentencias'],
+                'tiempo_max': stats['tiempo_max'],
+                'filas': stats['filas'],
+                'lentas': stats['lentas'],
+                'por_sql': {sql: dict(datos) for sql, datos in stats['por_sql'].items()},
+            }
+            for nombre, stats in _estado['operaciones'].items()
+        }
+
+def ultimas_sentencias():
+    with _bloqueo:
+        return list(_estado['sentencias'])
+
+def exportar_json(ruta, incluir_sentencias=False):
+    """
+    Guarda el resumen por operación (y opcionalmente el detalle de las
+    últimas sentencias) en un fichero JSON.
+    """
+    datos = {'operaciones': estadisticas()}
+    if incluir_sentencias:
+        datos['sentencias'] = ultimas_sentencias()
+    with open(ruta, 'w', encoding='utf-8') as fichero:
+        json.dump(datos, fichero, indent=2, ensure_ascii=False)
+    print(f"Estadísticas SQL exportadas a {ruta}")
+
+def imprimir_resumen():
+    print("\n--- Estadísticas SQL por operación ---")
+    resumen = sorted(estadisticas().items(), key=lambda item: item[1]['tiempo_total'], reverse=True)
+    for nombre, stats in resumen:
+        print(f"{nombre:<40} {stats['sentencias']:6d} sentencias | "
+              f"{stats['tiempo_total']:8.3f} s | máx {stats['tiempo_max']:.3f} s | "
+              f"{stats['lentas']} lentas")
+
+if __name__ == '__main__':
+    import argparse
+    import consultas
+    from conexion import sesion
+
+    parser = argparse.ArgumentParser(description='Ejecuta los informes de consultas.py con instrumentación SQL')
+    parser.add_argument('--umbral', type=float, default=UMBRAL_LENTA, help='Segundos para considerar lenta una sentencia')
+    parser.add_argument('--log-lentas', help='Fichero donde registrar las sentencias lentas')
+    parser.add_argument('--salida', help='Fichero JSON donde exportar las estadísticas')
+    args = parser.parse_args()
+
+    with instrumentado(args.umbral, args.log_lentas), sesion():
+        for numero in range(1, 6):
+            getattr(consultas, f'consulta_{numero}')()
+
+    imprimir_resumen()
+    if args.salida:
+        exportar_json(args.salida, incluir_sentencias=True)
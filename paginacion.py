@@ -0,0 +1,178 @@
+import argparse
+import base64
+import binascii
+import datetime
+import json
+from collections import namedtuple
+from decimal import Decimal
+from peewee import *
+from conexion import sesion
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+from actualizacion_borrado import condicion_activos, condicion_finalizados
+
+# Paginación por clave (keyset) de los listados de proyectos (el de
+# consulta_4: título, jefe y nº de empleados) y de clientes.
+# Cada página se pide con el cursor que devolvió la anterior; el cursor
+# guarda la clave de orden de la última fila entregada y la página
+# siguiente empieza justo después con un WHERE sobre el índice, en vez de
+# saltarse filas con OFFSET. Así la página 10.000 cuesta lo mismo que la 1.
+#
+# Los cursores son opacos (JSON en base64): el cliente solo los devuelve
+# tal cual. Un cursor solo vale para el listado, orden y filtro con los
+# que se generó.
+
+TAMANO_PAGINA = 50
+
+# Orden de los proyectos -> campos de la clave (el último siempre es la PK)
+ORDENES_PROYECTOS = {
+    'id': (Proyecto.id_proyecto,),
+    'presupuesto': (Proyecto.presupuesto, Proyecto.id_proyecto),
+}
+ESTADOS = ('activos', 'finalizados')
+
+Pagina = namedtuple('Pagina', 'filas siguiente')
+
+# --- Cursores ---
+def _codificar_cursor(listado, clave):
+    datos = json.dumps({'listado': listado, 'clave': clave}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decodificar_cursor(cursor, listado):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        clave = datos['clave']
+        del_listado = datos['listado']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Cursor no válido")
+    if del_listado != listado:
+        raise ValueError(f"El cursor es de otro listado ({del_listado}), no de {listado}")
+    return clave
+
+def _valor_clave(valor):
+    # Decimal como texto para no perder precisión en el JSON
+    return str(valor) if isinstance(valor, Decimal) else valor
+
+def _condicion_desde(campos, clave, descendente):
+    """
+    Filas posteriores a 'clave' en el orden (campos..., ) ascendente o
+    descendente. Con dos campos se expresa como a >= x AND (a > x OR b > y):
+    la primera parte acota el recorrido del índice de 'a'.
+    """
+    if descendente:
+        despues = lambda campo, valor: campo < valor
+        desde = lambda campo, valor: campo <= valor
+    else:
+        despues = lambda campo, valor: campo > valor
+        desde = lambda campo, valor: campo >= valor
+
+    if len(campos) == 1:
+        return despues(campos[0], clave[0])
+    (campo, siguiente), (valor, valor_siguiente) = campos, clave
+    return desde(campo, valor) & (despues(campo, valor) | despues(siguiente, valor_siguiente))
+
+def _pagina(consulta, campos, listado, cursor, tamano, descendente):
+    if tamano < 1:
+        raise ValueError("El tamaño de página debe ser al menos 1")
+    if cursor is not None:
+        consulta = consulta.where(_condicion_desde(campos, _decodificar_cursor(cursor, listado), descendente))
+    orden = [campo.desc() if descendente else campo.asc() for campo in campos]
+    # Se pide una fila de más para saber si hay página siguiente
+    with sesion():
+        filas = list(consulta.order_by(*orden).limit(tamano + 1).namedtuples())
+
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        ultima = filas[-1]
+        siguiente = _codificar_cursor(listado, [_valor_clave(getattr(ultima, campo.name))
+                                                for campo in campos])
+    return Pagina(filas, siguiente)
+
+# --- Proyectos ---
+def consulta_proyectos(estado=None, fecha_actual=None):
+    """
+    Listado de proyectos sin ordenar ni paginar: (id_proyecto,
+    titulo_proyecto, presupuesto, fecha_fin, nombre_jefe, num_empleados),
+    opcionalmente solo los 'activos' o los 'finalizados' a 'fecha_actual'
+    (por defecto hoy).
+    """
+    if estado is not None and estado not in ESTADOS:
+        raise ValueError(f"Estado no soportado: '{estado}' (usar {' o '.join(ESTADOS)})")
+
+    # Subconsulta correlacionada por el índice de id_proyecto: solo se
+    # cuentan las asignaciones de los proyectos de la página
+    num_empleados = (EmpleadoProyecto
+                     .select(fn.COUNT(SQL('*')))
+                     .where(EmpleadoProyecto.id_proyecto == Proyecto.id_proyecto))
+    consulta = (Proyecto
+                .select(Proyecto.id_proyecto, Proyecto.titulo_proyecto, Proyecto.presupuesto,
+                        Proyecto.fecha_fin, Empleado.nombre.alias('nombre_jefe'),
+                        num_empleados.alias('num_empleados'))
+                .join(Empleado, on=(Proyecto.id_jefe_proyecto == Empleado.dni)))
+
+    if estado is not None:
+        fecha_actual = fecha_actual or datetime.date.today()
+        condicion = condicion_activos if estado == 'activos' else condicion_finalizados
+        consulta = consulta.where(condicion(fecha_actual))
+    return consulta
+
+def paginar_proyectos(cursor=None, tamano=TAMANO_PAGINA, orden='id', estado=None, descendente=False):
+    """
+    Devuelve una Pagina con hasta 'tamano' proyectos ordenados por
+    id_proyecto ('id') o por (presupuesto, id_proyecto) ('presupuesto'),
+    opcionalmente solo los 'activos' o 'finalizados'. Pagina.siguiente es
+    el cursor de la página siguiente, o None si es la última.
+    """
+    if orden not in ORDENES_PROYECTOS:
+        raise ValueError(f"Orden no soportado: '{orden}' (usar {' o '.join(ORDENES_PROYECTOS)})")
+    listado = f"proyectos:{orden}:{estado or 'todos'}:{'desc' if descendente else 'asc'}"
+    return _pagina(consulta_proyectos(estado), ORDENES_PROYECTOS[orden], listado,
+                   cursor, tamano, descendente)
+
+# --- Clientes ---
+def paginar_clientes(cursor=None, tamano=TAMANO_PAGINA, descendente=False):
+    """
+    Devuelve una Pagina con hasta 'tamano' clientes (dni_cif,
+    nombre_cliente, tlf, email) ordenados por dni_cif.
+    """
+    consulta = Cliente.select(Cliente.dni_cif, Cliente.nombre_cliente, Cliente.tlf, Cliente.email)
+    listado = f"clientes:{'desc' if descendente else 'asc'}"
+    return _pagina(consulta, (Cliente.dni_cif,), listado, cursor, tamano, descendente)
+
+def recorrer(paginar, **opciones):
+    """
+    Genera todas las páginas de un listado (paginar_proyectos o
+    paginar_clientes) de principio a fin.
+    """
+    cursor = None
+    while True:
+        pagina = paginar(cursor, **opciones)
+        yield pagina
+        if pagina.siguiente is None:
+            return
+        cursor = pagina.siguiente
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Listados paginados de proyectos y clientes')
+    parser.add_argument('listado', choices=['proyectos', 'clientes'])
+    parser.add_argument('--cursor', help='Cursor devuelto por la página anterior')
+    parser.add_argument('--tamano', type=int, default=TAMANO_PAGINA, help='Filas por página')
+    parser.add_argument('--orden', choices=list(ORDENES_PROYECTOS), default='id', help='Orden de los proyectos')
+    parser.add_argument('--estado', choices=ESTADOS, help='Solo proyectos activos o finalizados')
+    parser.add_argument('--desc', action='store_true', help='Orden descendente')
+    args = parser.parse_args()
+
+    try:
+        if args.listado == 'proyectos':
+            pagina = paginar_proyectos(args.cursor, args.tamano, args.orden, args.estado, args.desc)
+            for fila in pagina.filas:
+                print(f"{fila.id_proyecto} | {fila.titulo_proyecto} | Presupuesto: {fila.presupuesto} | "
+                      f"Jefe: {fila.nombre_jefe} | Empleados: {fila.num_empleados}")
+        else:
+            pagina = paginar_clientes(args.cursor, args.tamano, args.desc)
+            for fila in pagina.filas:
+                print(f"{fila.dni_cif} | {fila.nombre_cliente} | {fila.tlf} | {fila.email}")
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\nSiguiente: {pagina.siguiente or '(última página)'}")
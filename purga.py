@@ -0,0 +1,167 @@
+import argparse
+import datetime
+import json
+import os
+import time
+from peewee import *
+import conexion
+from conexion import db, sesion
+from crear_tablas import Proyecto, EmpleadoProyecto, con_upsert, IGNORAR
+from actualizacion_borrado import condicion_antiguos_baratos, condicion_obsoletos, restar_anios
+
+# Purgas por lotes de proyectos antiguos: las mismas operaciones que
+# eliminar_proyectos_antiguos_baratos() y transaccion_limpieza_proyectos(),
+# pero en lotes de 'tamano_lote' proyectos recorridos por id, cada uno en
+# una transacción corta, con una pausa opcional entre lotes para no
+# acaparar la BD.
+#
+# Con un fichero de checkpoint, tras cada lote confirmado se guarda el
+# último id procesado y la fecha de referencia de la purga; si el proceso
+# se interrumpe, la siguiente ejecución con el mismo fichero continúa desde
+# ahí con el mismo criterio. Al terminar el fichero se borra.
+
+TAMANO_LOTE = 1000
+PAUSA = 0.0     # Segundos de espera entre lotes
+
+# --- Checkpoints ---
+def _leer_checkpoint(ruta):
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as fichero:
+        return json.load(fichero)
+
+def _guardar_checkpoint(ruta, estado):
+    # Se escribe aparte y se renombra para no dejar nunca un fichero a medias
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as fichero:
+        json.dump(estado, fichero, indent=2)
+    os.replace(temporal, ruta)
+
+# --- Purga genérica ---
+def _ids_lote(condicion, ultimo_id, tamano_lote):
+    consulta = (Proyecto
+                .select(Proyecto.id_proyecto)
+                .where(condicion & (Proyecto.id_proyecto > ultimo_id))
+                .order_by(Proyecto.id_proyecto)
+                .limit(tamano_lote))
+    if conexion.BACKEND == 'mysql':
+        # Bloquea los proyectos del lote hasta el final de su transacción
+        consulta = consulta.for_update()
+    return [id_proyecto for id_proyecto, in consulta.tuples()]
+
+def _purgar(trabajo, condicion_para, fecha, destino=None, tamano_lote=TAMANO_LOTE,
+            pausa=PAUSA, checkpoint=None, simulacion=False, progreso=True):
+    """
+    Borra por lotes los proyectos que cumplen condicion_para(fecha).
+    Si hay 'destino', antes de borrar cada lote sus asignaciones pasan al
+    proyecto destino (en la misma transacción); si no, se borran.
+    """
+    estado = _leer_checkpoint(checkpoint)
+    if estado is not None:
+        if estado['trabajo'] != trabajo or estado['destino'] != destino:
+            raise ValueError(f"El checkpoint {checkpoint} es de otra purga "
+                             f"({estado['trabajo']}, destino {estado['destino']})")
+        fecha = datetime.date.fromisoformat(estado['fecha'])
+        print(f"[{trabajo}] Reanudando desde el proyecto {estado['ultimo_id']}.")
+    else:
+        estado = {'trabajo': trabajo, 'fecha': fecha.isoformat(), 'destino': destino,
+                  'ultimo_id': 0, 'lotes': 0, 'proyectos': 0,
+                  'asignaciones_movidas': 0, 'asignaciones_borradas': 0}
+
+    condicion = condicion_para(fecha)
+    if destino is not None:
+        # El destino nunca se purga, aunque cumpla la condición
+        condicion &= (Proyecto.id_proyecto != destino)
+
+    with sesion():
+        if destino is not None and not Proyecto.select().where(Proyecto.id_proyecto == destino).exists():
+            print(f"Error: El proyecto destino con ID {destino} no existe.")
+            return None
+
+        if simulacion:
+            pendientes = (Proyecto.select(Proyecto.id_proyecto)
+                          .where(condicion & (Proyecto.id_proyecto > estado['ultimo_id'])))
+            proyectos = pendientes.count()
+            asignaciones = (EmpleadoProyecto.select()
+                            .where(EmpleadoProyecto.id_proyecto.in_(pendientes))
+                            .count())
+            print(f"[{trabajo}] Simulación: se purgarían {proyectos} proyectos "
+                  f"con {asignaciones} asignaciones (fecha de referencia {fecha}).")
+            return {'proyectos': proyectos, 'asignaciones': asignaciones}
+
+        inicio = time.perf_counter()
+        while True:
+            with db.atomic():
+                lote = _ids_lote(condicion, estado['ultimo_id'], tamano_lote)
+                if not lote:
+                    break
+                asignaciones = EmpleadoProyecto.id_proyecto.in_(lote)
+                if destino is not None:
+                    # Paso 1: las asignaciones pasan al destino. Un empleado
+                    # que ya estaba en el destino (o en varios proyectos del
+                    # lote) queda asignado una sola vez
+                    estado['asignaciones_movidas'] += con_upsert(EmpleadoProyecto
+                        .insert_from(EmpleadoProyecto
+                                     .select(EmpleadoProyecto.id_empleado, Value(destino))
+                                     .where(asignaciones)
+                                     .distinct(),
+                                     [EmpleadoProyecto.id_empleado, EmpleadoProyecto.id_proyecto]),
+                        IGNORAR).as_rowcount().execute()
+                # Paso 2: se quitan las asignaciones de los proyectos del lote
+                estado['asignaciones_borradas'] += EmpleadoProyecto.delete().where(asignaciones).execute()
+                # Paso 3: se borran los proyectos
+                estado['proyectos'] += Proyecto.delete().where(Proyecto.id_proyecto.in_(lote)).execute()
+
+            estado['ultimo_id'] = lote[-1]
+            estado['lotes'] += 1
+            if checkpoint:
+                _guardar_checkpoint(checkpoint, estado)
+            if progreso:
+                segundos = time.perf_counter() - inicio
+                print(f"[{trabajo}] Lote {estado['lotes']}: {estado['proyectos']} proyectos purgados "
+                      f"hasta el id {estado['ultimo_id']} ({segundos:.1f} s)")
+            if pausa:
+                time.sleep(pausa)
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    print(f"[{trabajo}] Purga completada: {estado['proyectos']} proyectos eliminados, "
+          f"{estado['asignaciones_movidas']} asignaciones movidas, "
+          f"{estado['asignaciones_borradas']} asignaciones retiradas.")
+    return estado
+
+def purgar_antiguos_baratos(tamano_lote=TAMANO_LOTE, pausa=PAUSA, checkpoint=None,
+                            simulacion=False, progreso=True):
+    """
+    Versión por lotes de eliminar_proyectos_antiguos_baratos(). Las
+    asignaciones de los proyectos purgados se borran antes que ellos.
+    """
+    return _purgar('antiguos_baratos', condicion_antiguos_baratos, datetime.date.today(),
+                   None, tamano_lote, pausa, checkpoint, simulacion, progreso)
+
+def purgar_obsoletos(id_proyecto_destino, tamano_lote=TAMANO_LOTE, pausa=PAUSA,
+                     checkpoint=None, simulacion=False, progreso=True):
+    """
+    Versión por lotes de transaccion_limpieza_proyectos(): las asignaciones
+    de cada lote de proyectos obsoletos pasan a 'id_proyecto_destino' en la
+    misma transacción en la que se borran esos proyectos.
+    """
+    return _purgar('obsoletos', condicion_obsoletos, restar_anios(datetime.date.today(), 5),
+                   id_proyecto_destino, tamano_lote, pausa, checkpoint, simulacion, progreso)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Purga por lotes de proyectos antiguos')
+    parser.add_argument('purga', choices=['antiguos_baratos', 'obsoletos'])
+    parser.add_argument('--destino', type=int, help='Proyecto que recibe las asignaciones (obligatorio en obsoletos)')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Proyectos por lote/transacción')
+    parser.add_argument('--pausa', type=float, default=PAUSA, help='Segundos de espera entre lotes')
+    parser.add_argument('--checkpoint', help='Fichero JSON para poder reanudar la purga')
+    parser.add_argument('--simulacion', action='store_true', help='Solo contar lo que se purgaría')
+    args = parser.parse_args()
+
+    if args.purga == 'obsoletos':
+        if args.destino is None:
+            parser.error('obsoletos requiere --destino')
+        purgar_obsoletos(args.destino, args.lote, args.pausa, args.checkpoint, args.simulacion)
+    else:
+        purgar_antiguos_baratos(args.lote, args.pausa, args.checkpoint, args.simulacion)
@@ -0,0 +1,261 @@
+import argparse
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from peewee import *
+from peewee import Node
+from conexion import db, sesion, dias_entre
+from crear_tablas import (Cliente, Proyecto, ResumenCliente, antes_de_escribir, filas_insertadas,
+                          insert_en_generador, olvidar_tablas, tabla_existe)
+
+# Mantenimiento incremental de la tabla resumen_clientes.
+# Cada INSERT/UPDATE/DELETE sobre Proyecto (incluidos .create(), .save(),
+# insert_many() de la carga masiva, los UPDATE masivos y los borrados en
+# cascada) averigua qué clientes toca y recalcula solo sus filas del
+# resumen, dentro de la misma transacción que la escritura. Los clientes
+# de un INSERT salen de las propias filas insertadas.
+# crear_tablas.py importa este módulo antes de la primera escritura
+# (MODULOS_MANTENIMIENTO), así que el mantenimiento está activo para
+# cualquiera que escriba con los modelos, siempre que la tabla exista.
+
+# Clientes recalculados por sentencia (tamaño de las listas IN)
+TAMANO_LOTE_CLIENTES = 500
+
+# Columnas de Proyecto que influyen en el resumen
+CAMPOS_RELEVANTES = {'id_cliente', 'presupuesto', 'fecha_inicio', 'fecha_fin'}
+
+CAMPOS_RESUMEN = [
+    ResumenCliente.id_cliente,
+    ResumenCliente.num_proyectos,
+    ResumenCliente.presupuesto_total,
+    ResumenCliente.id_proyecto_mas_caro,
+    ResumenCliente.presupuesto_maximo,
+    ResumenCliente.id_proyecto_mas_largo,
+    ResumenCliente.duracion_maxima,
+]
+
+_diferido = threading.local()
+
+# --- Cálculo del resumen ---
+def consulta_resumen(clientes=None):
+    """
+    SELECT con una fila de resumen por cliente, en el orden de CAMPOS_RESUMEN.
+    Si se indica 'clientes' solo se calculan esos.
+    """
+    def filtrar(consulta):
+        if clientes is None:
+            return consulta
+        return consulta.where(Proyecto.id_cliente.in_(list(clientes)))
+
+    # Totales y proyecto más caro en una sola pasada con funciones ventana
+    por_cliente = [Proyecto.id_cliente]
+    caro = filtrar(Proyecto.select(
+        Proyecto.id_cliente,
+        fn.COUNT(SQL('*')).over(partition_by=por_cliente).alias('num_proyectos'),
+        fn.SUM(Proyecto.presupuesto).over(partition_by=por_cliente).alias('presupuesto_total'),
+        Proyecto.id_proyecto,
+        Proyecto.presupuesto,
+        fn.ROW_NUMBER().over(
+            partition_by=por_cliente,
+            order_by=[Proyecto.presupuesto.desc(), Proyecto.id_proyecto]).alias('posicion'),
+    )).alias('caro')
+
+    # Proyecto más largo: mismas reglas que consulta_5
+    duracion = dias_entre(Proyecto.fecha_inicio, Proyecto.fecha_fin)
+    largo = filtrar(Proyecto.select(
+        Proyecto.id_cliente,
+        Proyecto.id_proyecto,
+        duracion.alias('duracion'),
+        fn.ROW_NUMBER().over(
+            partition_by=por_cliente,
+            order_by=[duracion.desc(), Proyecto.id_proyecto]).alias('posicion'),
+    ).where(Proyecto.fecha_fin.is_null(False) &
+            Proyecto.fecha_inicio.is_null(False) &
+            (duracion >= 0))).alias('largo')
+
+    return (caro
+            .select_from(caro.c.id_cliente, caro.c.num_proyectos, caro.c.presupuesto_total,
+                         caro.c.id_proyecto, caro.c.presupuesto,
+                         largo.c.id_proyecto, largo.c.duracion)
+            .join(largo, JOIN.LEFT_OUTER,
+                  on=((largo.c.id_cliente == caro.c.id_cliente) & (largo.c.posicion == 1)))
+            .where(caro.c.posicion == 1))
+
+def recalcular(clientes=None):
+    """
+    Rehace las filas del resumen de los clientes indicados (o de todos si
+    no se indica ninguno). Los clientes sin proyectos se quedan sin fila.
+    """
+    with db.atomic():
+        if clientes is None:
+            ResumenCliente.delete().execute()
+            ResumenCliente.insert_from(consulta_resumen(), CAMPOS_RESUMEN).execute()
+            return
+        for lote in chunked(sorted(clientes), TAMANO_LOTE_CLIENTES):
+            ResumenCliente.delete().where(ResumenCliente.id_cliente.in_(lote)).execute()
+            ResumenCliente.insert_from(consulta_resumen(lote), CAMPOS_RESUMEN).execute()
+
+def reconstruir():
+    """
+    Crea la tabla si no existe y calcula el resumen de todos los clientes.
+    Devuelve el número de clientes con fila en el resumen.
+    """
+    with sesion():
+        db.create_tables([ResumenCliente])
+        olvidar_tablas()
+        recalcular()
+        filas = ResumenCliente.select().count()
+    return filas
+
+# --- Mantenimiento incremental ---
+def _mantenimiento_activo():
+    if getattr(_diferido, 'activo', False):
+        return False
+    return tabla_existe(ResumenCliente)
+
+def _clientes_de(consulta):
+    return {id_cliente for id_cliente, in consulta.distinct().tuples()}
+
+def _actualiza_campos_relevantes(consulta):
+    conflicto = getattr(consulta, '_on_conflict', None)
+    if conflicto is None:
+        return False
+    campos = list(conflicto._preserve or ()) + list(conflicto._update or ())
+    nombres = {campo if isinstance(campo, str) else campo.name for campo in campos}
+    return bool(nombres & CAMPOS_RELEVANTES)
+
+def _clientes_afectados_por_upsert(filas):
+    # Clientes de los proyectos existentes que pueden chocar con las filas
+    # insertadas (por la clave primaria o por el jefe, que es único)
+    ids = [id_proyecto for id_proyecto, _, _ in filas if id_proyecto is not None]
+    jefes = [jefe for _, jefe, _ in filas if jefe is not None]
+    if not ids and not jefes:
+        return set()
+    existentes = Proyecto.id_proyecto.in_(ids) | Proyecto.id_jefe_proyecto.in_(jefes)
+    return _clientes_de(Proyecto.select(Proyecto.id_cliente).where(existentes))
+
+@antes_de_escribir(Proyecto)
+def _mantener_resumen(modelo, operacion, consulta):
+    if not _mantenimiento_activo():
+        return None
+
+    if operacion == 'insert':
+        # Un upsert puede modificar proyectos que ya existen: hay que
+        # buscarlos antes de escribir, y las filas de un generador no se
+        # conocen hasta entonces
+        upsert = _actualiza_campos_relevantes(consulta)
+        if upsert and insert_en_generador(consulta):
+            return recalcular
+        # Con filas de un generador el conjunto se llena al escribir
+        filas = filas_insertadas(consulta, (Proyecto.id_proyecto, Proyecto.id_jefe_proyecto,
+                                            Proyecto.id_cliente))
+        afectados = _clientes_afectados_por_upsert(filas) if upsert else set()
+        def posterior():
+            clientes = {id_cliente for _, _, id_cliente in filas}
+            # Sin el cliente en alguna fila no se sabe a quién toca: se rehace todo
+            recalcular(None if None in clientes else afectados | clientes)
+        return posterior
+
+    if operacion == 'update':
+        cambios = {campo.name for campo in consulta._update}
+        if not cambios & CAMPOS_RELEVANTES:
+            return None
+
+    # UPDATE/DELETE: clientes de las filas que cumplen el WHERE antes de escribir
+    seleccion = Proyecto.select(Proyecto.id_cliente)
+    if consulta._where is not None:
+        seleccion = seleccion.where(consulta._where)
+    clientes = _clientes_de(seleccion)
+
+    if operacion == 'update' and Proyecto.id_cliente in consulta._update:
+        nuevo = consulta._update[Proyecto.id_cliente]
+        if isinstance(nuevo, Node):
+            # El cliente nuevo depende de cada fila: se rehace todo
+            return recalcular
+        clientes.add(nuevo.dni_cif if isinstance(nuevo, Cliente) else nuevo)
+
+    return lambda: recalcular(clientes)
+
+@contextmanager
+def mantenimiento_diferido():
+    """
+    Desactiva el mantenimiento incremental en este hilo durante el bloque
+    y reconstruye el resumen completo al salir. Para cargas masivas, donde
+    un único recálculo al final es más barato que uno por lote.
+    """
+    _diferido.activo = True
+    try:
+        yield
+    finally:
+        _diferido.activo = False
+    reconstruir()
+
+# --- Comprobación de consistencia ---
+def _normalizar(fila):
+    # SQLite puede devolver los importes como float y MySQL como Decimal
+    if fila is None:
+        return None
+    return tuple(round(float(valor), 2) if isinstance(valor, (float, Decimal)) else valor
+                 for valor in fila)
+
+def comprobar_consistencia():
+    """
+    Compara el resumen guardado con uno recalculado desde cero.
+    Devuelve la lista de (id_cliente, guardado, esperado) que no coinciden.
+    """
+    with sesion():
+        esperado = {fila[0]: fila for fila in consulta_resumen().tuples()}
+        guardado = {fila[0]: fila for fila in ResumenCliente.select(*CAMPOS_RESUMEN).tuples()}
+
+    diferencias = []
+    for id_cliente in sorted(esperado.keys() | guardado.keys()):
+        fila_guardada = guardado.get(id_cliente)
+        fila_esperada = esperado.get(id_cliente)
+        if _normalizar(fila_guardada) != _normalizar(fila_esperada):
+            diferencias.append((id_cliente, fila_guardada, fila_esperada))
+    return diferencias
+
+# --- Lecturas para los paneles ---
+def presupuesto_total_por_cliente():
+    """
+    Mismos datos que consulta_1, leídos del resumen: (nombre_cliente, total).
+    """
+    return (Cliente
+            .select(Cliente.nombre_cliente,
+                    fn.COALESCE(ResumenCliente.presupuesto_total, 0).alias('total'))
+            .join(ResumenCliente, JOIN.LEFT_OUTER,
+                  on=(ResumenCliente.id_cliente == Cliente.dni_cif))
+            .order_by(Cliente.dni_cif)
+            .tuples())
+
+def proyecto_mas_caro_por_cliente():
+    """
+    Mismos datos que consulta_3, leídos del resumen:
+    (nombre_cliente, titulo_proyecto, presupuesto); título None si no tiene proyectos.
+    """
+    return (Cliente
+            .select(Cliente.nombre_cliente, Proyecto.titulo_proyecto,
+                    ResumenCliente.presupuesto_maximo)
+            .join(ResumenCliente, JOIN.LEFT_OUTER,
+                  on=(ResumenCliente.id_cliente == Cliente.dni_cif))
+            .join(Proyecto, JOIN.LEFT_OUTER,
+                  on=(Proyecto.id_proyecto == ResumenCliente.id_proyecto_mas_caro))
+            .order_by(Cliente.dni_cif)
+            .tuples())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resumen por cliente (tabla resumen_clientes)')
+    parser.add_argument('accion', choices=['reconstruir', 'comprobar'])
+    args = parser.parse_args()
+
+    if args.accion == 'reconstruir':
+        filas = reconstruir()
+        print(f"Resumen reconstruido: {filas} clientes con proyectos.")
+    else:
+        diferencias = comprobar_consistencia()
+        for id_cliente, guardado, esperado in diferencias[:20]:
+            print(f"Cliente {id_cliente}: guardado={guardado} esperado={esperado}")
+        if diferencias:
+            print(f"{len(diferencias)} clientes con el resumen desactualizado.")
+            raise SystemExit(1)
+        print("El resumen es consistente.")
@@ -0,0 +1,381 @@
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from peewee import *
+import conexion
+from conexion import db, sesion
+from crear_tablas import (Cliente, Empleado, Proyecto, EmpleadoProyecto, ResumenCliente,
+                          ProyectoArchivado, EmpleadoProyectoArchivado)
+import resumen_clientes
+import cambios
+import cache_claves
+import archivo
+
+# Instantáneas binarias por columnas de las tablas de la BD (las cuatro
+# principales y las del archivo de proyectos), para
+# copias de seguridad y para sembrar entornos de prueba.
+#
+# Formato del fichero:
+#   MAGIA | u32 longitud | cabecera JSON con el esquema (tablas, columnas y
+#   tipos) | bloques de columnas | índice JSON de los bloques | u64 longitud
+#   del índice | MAGIA
+# Cada tabla se guarda en grupos de hasta FILAS_POR_GRUPO filas (por orden
+# de clave primaria) y, dentro de cada grupo, un bloque por columna
+# alineado a 8 bytes:
+#   int64     enteros, little-endian
+#   decimal   int64 escalado por 10**decimales (céntimos en presupuesto)
+#   fecha     datetime64[D] (int64 días desde 1970; NULL es NaT)
+#   bool      uint8
+#   texto     offsets int64 en caracteres + el texto del grupo en UTF-8
+#             comprimido con zlib
+# Las columnas que admiten NULL llevan además un bloque con la máscara de
+# nulos (un bit por fila).
+#
+# Al restaurar, el fichero se abre con mmap y los bloques numéricos se leen
+# sin copiarlos (np.frombuffer); cada grupo se inserta con un executemany en
+# una transacción, en tablas recién creadas sin índices secundarios, que se
+# crean al final. El resumen por cliente no se guarda: se recalcula.
+
+MAGIA = b'EMPSNAP1'
+VERSION = 1
+FILAS_POR_GRUPO = 100000
+ALINEACION = 8
+NIVEL_ZLIB = 1       # Solo se comprime el texto: los bloques numéricos se leen tal cual
+
+MODELOS = [Cliente, Empleado, Proyecto, EmpleadoProyecto, ProyectoArchivado, EmpleadoProyectoArchivado]
+
+# --- Tipos de columna ---
+def _tipo_campo(campo):
+    if isinstance(campo, ForeignKeyField):
+        return _tipo_campo(campo.rel_field)
+    if isinstance(campo, BooleanField):
+        return 'bool'
+    if isinstance(campo, (AutoField, IntegerField, BigIntegerField)):
+        return 'int64'
+    if isinstance(campo, DecimalField):
+        # Se convierten a entero pasando por float64: exacto hasta 15 dígitos
+        if campo.max_digits > 15:
+            raise ValueError(f"{campo.name}: DECIMAL({campo.max_digits}) no cabe en float64 sin pérdidas")
+        return 'decimal'
+    if isinstance(campo, DateField):
+        return 'fecha'
+    if isinstance(campo, (CharField, TextField)):
+        return 'texto'
+    raise ValueError(f"Tipo de campo no soportado en instantáneas: {campo.name} ({type(campo).__name__})")
+
+def _esquema(modelo):
+    return [{'nombre': campo.column_name,
+             'tipo': _tipo_campo(campo),
+             'nulos': campo.null,
+             **({'decimales': campo.decimal_places} if isinstance(campo, DecimalField) else {})}
+            for campo in modelo._meta.sorted_fields]
+
+def _consulta_ordenada(modelo):
+    clave = modelo._meta.primary_key
+    orden = ([modelo._meta.fields[nombre] for nombre in clave.field_names]
+             if isinstance(clave, CompositeKey) else [clave])
+    return modelo.select(*modelo._meta.sorted_fields).order_by(*orden)
+
+# --- Conversión filas <-> bloques ---
+def _codificar(columna, valores):
+    """
+    Lista de valores tal cual los da el driver -> {bloque: bytes}.
+    """
+    bloques = {}
+    if columna['nulos']:
+        nulos = np.fromiter((valor is None for valor in valores), dtype=bool, count=len(valores))
+        bloques['nulos'] = np.packbits(nulos, bitorder='little').tobytes()
+        if nulos.any():
+            relleno = '' if columna['tipo'] == 'texto' else 0
+            valores = [relleno if valor is None else valor for valor in valores]
+
+    tipo = columna['tipo']
+    if tipo == 'texto':
+        longitudes = np.fromiter(map(len, valores), dtype=np.int64, count=len(valores))
+        bloques['offsets'] = np.concatenate(([0], np.cumsum(longitudes))).astype('<i8').tobytes()
+        bloques['datos'] = zlib.compress(''.join(valores).encode('utf-8'), NIVEL_ZLIB)
+        return bloques
+
+    valores = np.array(valores, dtype=object)
+    if tipo == 'int64':
+        datos = valores.astype('<i8')
+    elif tipo == 'bool':
+        datos = valores.astype(bool).astype(np.uint8)
+    elif tipo == 'decimal':
+        datos = np.rint(valores.astype(np.float64) * 10 ** columna['decimales']).astype('<i8')
+    else:
+        # Fechas ISO (SQLite) o datetime.date (MySQL); los nulos (0) se marcan con NaT
+        datos = valores.astype('datetime64[D]') if len(valores) else np.array([], 'datetime64[D]')
+        if columna['nulos']:
+            datos[np.unpackbits(np.frombuffer(bloques['nulos'], np.uint8),
+                                count=len(datos), bitorder='little').astype(bool)] = np.datetime64('NaT')
+    bloques['datos'] = datos.tobytes()
+    return bloques
+
+def _decodificar(columna, bloques, filas):
+    """
+    {bloque: buffer} -> lista de valores listos para insertar.
+    """
+    tipo = columna['tipo']
+    if tipo == 'texto':
+        offsets = np.frombuffer(bloques['offsets'], dtype='<i8', count=filas + 1).tolist()
+        texto = zlib.decompress(bloques['datos']).decode('utf-8')
+        valores = [texto[inicio:fin] for inicio, fin in zip(offsets, offsets[1:])]
+    elif tipo == 'int64':
+        valores = np.frombuffer(bloques['datos'], dtype='<i8', count=filas).tolist()
+    elif tipo == 'bool':
+        valores = (np.frombuffer(bloques['datos'], dtype=np.uint8, count=filas) != 0).tolist()
+    elif tipo == 'decimal':
+        # Como float: con 15 dígitos o menos su repr es exactamente el decimal
+        escalados = np.frombuffer(bloques['datos'], dtype='<i8', count=filas)
+        valores = (escalados / 10 ** columna['decimales']).tolist()
+    else:
+        # Como texto ISO: el driver no tiene que convertir cada fecha
+        valores = np.datetime_as_string(np.frombuffer(bloques['datos'], dtype='datetime64[D]',
+                                                      count=filas)).tolist()
+
+    if columna['nulos']:
+        nulos = np.unpackbits(np.frombuffer(bloques['nulos'], dtype=np.uint8),
+                              count=filas, bitorder='little')
+        for posicion in np.flatnonzero(nulos).tolist():
+            valores[posicion] = None
+    return valores
+
+def _grupos(modelo, filas_por_grupo):
+    # Filas de la tabla por orden de clave, en grupos, tal cual las da el driver
+    cursor = db.execute(_consulta_ordenada(modelo))
+    try:
+        while True:
+            filas = cursor.fetchmany(filas_por_grupo)
+            if not filas:
+                return
+            yield filas
+    finally:
+        cursor.close()
+
+# --- Exportar ---
+def exportar(ruta, filas_por_grupo=FILAS_POR_GRUPO, progreso=False):
+    """
+    Escribe en 'ruta' una instantánea de Cliente, Empleado, Proyecto,
+    EmpleadoProyecto y las tablas del archivo (si existen). Devuelve el
+    número de filas por tabla.
+    """
+    with sesion():
+        # BDs creadas antes de existir el archivo: se exporta lo que haya
+        modelos = [modelo for modelo in MODELOS if modelo.table_exists()]
+    cabecera = {
+        'version': VERSION,
+        'creada': datetime.datetime.now().isoformat(timespec='seconds'),
+        'backend': conexion.BACKEND,
+        'tablas': [{'tabla': modelo._meta.table_name, 'columnas': _esquema(modelo)} for modelo in modelos],
+    }
+    indice = {}
+    filas_por_tabla = {}
+    temporal = ruta + '.tmp'
+
+    with open(temporal, 'wb') as fichero, sesion(transaccion=True):
+        # La transacción da una vista coherente de todas las tablas
+        datos_cabecera = json.dumps(cabecera).encode('utf-8')
+        fichero.write(MAGIA + struct.pack('<I', len(datos_cabecera)) + datos_cabecera)
+
+        def escribir(contenido):
+            fichero.write(b'\0' * (-fichero.tell() % ALINEACION))
+            posicion = fichero.tell()
+            fichero.write(contenido)
+            return [posicion, len(contenido)]
+
+        for modelo, tabla in zip(modelos, cabecera['tablas']):
+            grupos = indice[tabla['tabla']] = []
+            total = 0
+            for filas in _grupos(modelo, filas_por_grupo):
+                grupo = {'filas': len(filas), 'columnas': {}}
+                for columna, valores in zip(tabla['columnas'], zip(*filas)):
+                    grupo['columnas'][columna['nombre']] = {
+                        bloque: escribir(contenido)
+                        for bloque, contenido in _codificar(columna, list(valores)).items()}
+                grupos.append(grupo)
+                total += len(filas)
+            filas_por_tabla[tabla['tabla']] = total
+            if progreso:
+                print(f"[exportar] {tabla['tabla']}: {total} filas")
+
+        datos_indice = json.dumps(indice).encode('utf-8')
+        fichero.write(datos_indice + struct.pack('<Q', len(datos_indice)) + MAGIA)
+    os.replace(temporal, ruta)
+    return filas_por_tabla
+
+# --- Leer ---
+class Instantanea:
+    """
+    Instantánea abierta con mmap. Se usa con 'with Instantanea(ruta) as i:'.
+    """
+    def __init__(self, ruta):
+        self._fichero = open(ruta, 'rb')
+        self._mapa = mmap.mmap(self._fichero.fileno(), 0, access=mmap.ACCESS_READ)
+        mapa = self._mapa
+        if mapa[:len(MAGIA)] != MAGIA or mapa[-len(MAGIA):] != MAGIA:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es una instantánea de la BD Empresa")
+        longitud, = struct.unpack_from('<I', mapa, len(MAGIA))
+        inicio = len(MAGIA) + 4
+        self.cabecera = json.loads(mapa[inicio:inicio + longitud])
+        if self.cabecera['version'] != VERSION:
+            self.cerrar()
+            raise ValueError(f"Versión de instantánea no soportada: {self.cabecera['version']}")
+        fin_indice = len(mapa) - len(MAGIA) - 8
+        longitud, = struct.unpack_from('<Q', mapa, fin_indice)
+        self.indice = json.loads(mapa[fin_indice - longitud:fin_indice])
+
+    def filas(self, tabla):
+        return sum(grupo['filas'] for grupo in self.indice[tabla])
+
+    def grupos(self, tabla):
+        """
+        Genera (filas, {columna: {bloque: memoryview}}) de cada grupo de la tabla.
+        """
+        vista = memoryview(self._mapa)
+        for grupo in self.indice[tabla]:
+            yield grupo['filas'], {
+                nombre: {bloque: vista[posicion:posicion + longitud]
+                         for bloque, (posicion, longitud) in bloques.items()}
+                for nombre, bloques in grupo['columnas'].items()}
+
+    def cerrar(self):
+        try:
+            self._mapa.close()
+        except BufferError:
+            # Aún hay vistas de bloques en uso: el mapa se libera con ellas
+            pass
+        self._fichero.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+def _modelo_de(tabla):
+    for modelo in MODELOS:
+        if modelo._meta.table_name == tabla['tabla']:
+            return modelo
+    raise ValueError(f"La instantánea contiene una tabla desconocida: {tabla['tabla']}")
+
+def _comprobar_esquema(modelo, tabla):
+    if tabla['columnas'] != _esquema(modelo):
+        raise ValueError(f"El esquema de '{tabla['tabla']}' en la instantánea no coincide con el modelo")
+
+# --- Restaurar ---
+def restaurar(ruta, recrear=True, progreso=False):
+    """
+    Carga la instantánea en la BD configurada. Con recrear=True se borran y
+    crean de nuevo las tablas; si no, tienen que estar vacías.
+    Devuelve el número de filas insertadas por tabla.
+    """
+    filas_por_tabla = {}
+    with Instantanea(ruta) as instantanea, sesion():
+        tablas = instantanea.cabecera['tablas']
+        for tabla in tablas:
+            _comprobar_esquema(_modelo_de(tabla), tabla)
+
+        if recrear:
+            db.drop_tables(MODELOS + [ResumenCliente])
+            # Sin índices secundarios: se crean después de la carga
+            for modelo in MODELOS:
+                modelo._schema.create_table()
+        elif any(modelo.select().exists() for modelo in map(_modelo_de, tablas)):
+            raise ValueError("Las tablas no están vacías: restaurar con recrear=True")
+
+        for tabla in tablas:
+            modelo = _modelo_de(tabla)
+            campos = modelo._meta.sorted_fields
+            sql, _ = modelo.insert_many([[None] * len(campos)], fields=campos).sql()
+            total = 0
+            for filas, bloques in instantanea.grupos(tabla['tabla']):
+                columnas = [_decodificar(columna, bloques[columna['nombre']], filas)
+                            for columna in tabla['columnas']]
+                with db.atomic():
+                    db.cursor().executemany(sql, list(zip(*columnas)))
+                total += filas
+                if progreso:
+                    print(f"[restaurar] {tabla['tabla']}: {total} filas")
+            filas_por_tabla[tabla['tabla']] = total
+
+        if recrear:
+            for modelo in MODELOS:
+                modelo._schema.create_indexes()
+    # Las inserciones no pasan por los avisos de escritura: el resumen se
+    # rehace, las cachés por clave se vacían y en el registro de cambios se
+    # apuntan las tablas como recargadas
+    resumen_clientes.reconstruir()
+    cache_claves.vaciar_caches()
+    with sesion():
+        # Los ids del archivo pueden ser mayores que los de la tabla caliente
+        archivo.ajustar_contador_ids()
+        cambios.marcar_recarga()
+    return filas_por_tabla
+
+# --- Verificar ---
+def verificar(ruta):
+    """
+    Compara la instantánea con el contenido actual de la BD, grupo a grupo y
+    columna a columna. Devuelve la lista de diferencias ((tabla, grupo,
+    columna) o (tabla, 'filas', en_instantanea, en_bd)); vacía si coinciden.
+    """
+    diferencias = []
+    with Instantanea(ruta) as instantanea, sesion(transaccion=True):
+        for tabla in instantanea.cabecera['tablas']:
+            modelo = _modelo_de(tabla)
+            _comprobar_esquema(modelo, tabla)
+            guardados = instantanea.grupos(tabla['tabla'])
+            tamano = instantanea.indice[tabla['tabla']][0]['filas'] if instantanea.indice[tabla['tabla']] else 1
+            en_bd = 0
+            for numero, filas in enumerate(_grupos(modelo, tamano)):
+                en_bd += len(filas)
+                guardado = next(guardados, None)
+                if guardado is None or guardado[0] != len(filas):
+                    continue
+                for columna, valores in zip(tabla['columnas'], zip(*filas)):
+                    actuales = _codificar(columna, list(valores))
+                    if any(bytes(guardado[1][columna['nombre']][bloque]) != contenido
+                           for bloque, contenido in actuales.items()):
+                        diferencias.append((tabla['tabla'], numero, columna['nombre']))
+            if en_bd != instantanea.filas(tabla['tabla']):
+                diferencias.append((tabla['tabla'], 'filas', instantanea.filas(tabla['tabla']), en_bd))
+    return diferencias
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Instantáneas binarias de la BD Empresa')
+    subparsers = parser.add_subparsers(dest='accion', required=True)
+    p_exportar = subparsers.add_parser('exportar', help='Guardar la BD en una instantánea')
+    p_exportar.add_argument('fichero')
+    p_exportar.add_argument('--grupo', type=int, default=FILAS_POR_GRUPO, help='Filas por grupo')
+    p_restaurar = subparsers.add_parser('restaurar', help='Cargar una instantánea en la BD')
+    p_restaurar.add_argument('fichero')
+    p_restaurar.add_argument('--sin-recrear', action='store_true',
+                             help='No borrar ni recrear las tablas (deben estar vacías)')
+    p_restaurar.add_argument('--verificar', action='store_true', help='Verificar la BD al terminar')
+    p_verificar = subparsers.add_parser('verificar', help='Comparar una instantánea con la BD')
+    p_verificar.add_argument('fichero')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.accion == 'exportar':
+        filas = exportar(args.fichero, args.grupo, progreso=True)
+        print(f"Instantánea '{args.fichero}' ({os.path.getsize(args.fichero) / 2**20:.1f} MiB): "
+              f"{filas} en {time.perf_counter() - inicio:.2f} s")
+    elif args.accion == 'restaurar':
+        filas = restaurar(args.fichero, recrear=not args.sin_recrear, progreso=True)
+        print(f"Restauradas {filas} en {time.perf_counter() - inicio:.2f} s")
+    if args.accion == 'verificar' or getattr(args, 'verificar', False):
+        diferencias = verificar(args.fichero)
+        for diferencia in diferencias[:20]:
+            print(f"Diferencia: {diferencia}")
+        if diferencias:
+            raise SystemExit(1)
+        print("La BD coincide con la instantánea.")
@@ -0,0 +1,30 @@
+import os
+import sys
+
+# Las pruebas usan un fichero SQLite temporal por prueba: la configuración
+# se fija antes de importar conexion, que la lee al cargarse
+for variable in [nombre for nombre in os.environ if nombre.startswith('EMPRESA_DB_')]:
+    del os.environ[variable]
+os.environ['EMPRESA_DB_BACKEND'] = 'sqlite'
+os.environ['EMPRESA_DB_NAME'] = ':memory:'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import conexion
+import crear_tablas
+import generador_datos
+
+NUM_PROYECTOS = 400
+
+@pytest.fixture
+def bd(tmp_path):
+    """
+    BD SQLite nueva con todas las tablas y NUM_PROYECTOS proyectos
+    generados. Devuelve la ruta del fichero.
+    """
+    ruta = str(tmp_path / 'empresa.db')
+    conexion.cambiar_base(ruta)
+    crear_tablas.crear_tablas()
+    generador_datos.poblar(NUM_PROYECTOS, recrear=False)
+    yield ruta
+    conexion.cambiar_base(':memory:')
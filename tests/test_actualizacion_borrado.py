@@ -0,0 +1,62 @@
+import datetime
+import pytest
+from conexion import sesion
+from crear_tablas import Cliente, Proyecto, EmpleadoProyecto
+import actualizacion_borrado
+import benchmarks
+
+def test_telefonos_que_no_son_texto_no_paran_el_lote(bd):
+    with sesion():
+        numero, lista, texto = [c.dni_cif for c in Cliente.select().order_by(Cliente.dni_cif).limit(3)]
+    resultado = actualizacion_borrado.actualizar_telefonos_clientes(
+        {numero: 600111222, lista: ['600'], texto: '600333444'})
+
+    assert resultado['actualizados'] == 2
+    assert list(resultado['fallidos']) == [lista]
+    with sesion():
+        telefonos = dict(Cliente.select(Cliente.dni_cif, Cliente.tlf)
+                         .where(Cliente.dni_cif.in_([numero, texto])).tuples())
+    assert telefonos == {numero: '600111222', texto: '600333444'}
+
+def test_las_operaciones_de_escritura_hacen_cambios(bd):
+    for nombre, funcion, args in actualizacion_borrado.operaciones_escritura():
+        assert funcion(*args), nombre
+
+def test_limpieza_no_duplica_empleados_en_el_destino(bd):
+    fecha_limite = actualizacion_borrado.restar_anios(datetime.date.today(), 5)
+    obsoletos = Proyecto.select(Proyecto.id_proyecto).where(
+        actualizacion_borrado.condicion_obsoletos(fecha_limite))
+    with sesion():
+        destino = Proyecto.select(Proyecto.id_proyecto).where(Proyecto.fecha_fin.is_null()).scalar()
+        esperados = {dni for dni, in (EmpleadoProyecto
+                                      .select(EmpleadoProyecto.id_empleado)
+                                      .where(EmpleadoProyecto.id_proyecto.in_(obsoletos) |
+                                             (EmpleadoProyecto.id_proyecto == destino))
+                                      .tuples())}
+
+    assert actualizacion_borrado.transaccion_limpieza_proyectos(destino)
+    with sesion():
+        assert not obsoletos.exists()
+        en_destino = [dni for dni, in (EmpleadoProyecto
+                                       .select(EmpleadoProyecto.id_empleado)
+                                       .where(EmpleadoProyecto.id_proyecto == destino)
+                                       .tuples())]
+    assert sorted(en_destino) == sorted(esperados)
+
+def test_borrar_antiguos_baratos_quita_antes_sus_asignaciones(bd):
+    condicion = actualizacion_borrado.condicion_antiguos_baratos(datetime.date.today())
+    with sesion():
+        con_asignaciones = (EmpleadoProyecto.select()
+                            .join(Proyecto).where(condicion).count())
+    assert con_asignaciones
+
+    assert actualizacion_borrado.eliminar_proyectos_antiguos_baratos() > con_asignaciones
+    with sesion():
+        assert not Proyecto.select().where(condicion).exists()
+
+def test_benchmark_falla_si_una_operacion_no_hace_nada(bd, monkeypatch):
+    operaciones = actualizacion_borrado.operaciones_escritura
+    monkeypatch.setattr(actualizacion_borrado, 'operaciones_escritura',
+                        lambda: operaciones() + [('no_hace_nada', lambda: 0, ())])
+    with pytest.raises(RuntimeError, match='no_hace_nada'):
+        benchmarks.benchmark_escalas([50])
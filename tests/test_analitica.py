@@ -0,0 +1,29 @@
+import datetime
+from conexion import sesion
+from crear_tablas import Cliente, Empleado, Proyecto
+import analitica
+
+def test_coincide_con_los_informes_sql(bd):
+    with sesion():
+        # Un cliente cuyo único proyecto no tiene fecha_fin (sin duración válida)
+        cliente = Cliente.create(dni_cif='X0000001', nombre_cliente='Sin fechas',
+                                 email='sin.fechas@ejemplo.com')
+        jefe = Empleado.create(dni='Z0000001', nombre='Jefe', jefe=True, email='jefe@ejemplo.com')
+        Proyecto.create(titulo_proyecto='Abierto', fecha_inicio=datetime.date(2024, 1, 1),
+                        fecha_fin=None, presupuesto=1000, id_cliente=cliente, id_jefe_proyecto=jefe)
+
+        sin_proyectos = Cliente.select().where(Cliente.dni_cif.not_in(Proyecto.select(Proyecto.id_cliente)))
+        assert sin_proyectos.exists()
+        assert Proyecto.select().where(Proyecto.fecha_fin.is_null()).count() > 1
+
+    columnas = analitica.cargar_columnas()
+    assert analitica.comprobar(columnas) == {}
+
+    # Las filas de esos clientes también se comparan: sin proyecto o sin duración
+    with sesion():
+        sin_proyecto = sin_proyectos.first().dni_cif
+    posiciones = {dni_cif: posicion for posicion, dni_cif in enumerate(columnas.dni_cif)}
+    filas_3 = list(analitica.filas_consulta_3(columnas))
+    filas_5 = list(analitica.filas_consulta_5(columnas))
+    assert filas_3[posiciones[sin_proyecto]][1:] == (None, None)
+    assert filas_5[posiciones['X0000001']] == ('Sin fechas', None, None, 0)
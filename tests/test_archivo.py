@@ -0,0 +1,41 @@
+import datetime
+import archivo
+import snapshot
+from conexion import sesion
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto, ProyectoArchivado
+
+def _nuevo_proyecto(numero, fecha_fin):
+    cliente = Cliente.select().first()
+    jefe = Empleado.create(dni=f'Z{numero:07d}', nombre='Jefe', jefe=True, email=f'jefe{numero}@ejemplo.com')
+    return Proyecto.create(titulo_proyecto=f'Nuevo {numero}', fecha_inicio=datetime.date(2020, 1, 1),
+                           fecha_fin=fecha_fin, presupuesto=1000, id_cliente=cliente,
+                           id_jefe_proyecto=jefe)
+
+def _borrar(proyecto):
+    EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto == proyecto).execute()
+    proyecto.delete_instance()
+
+def test_no_se_reutilizan_ids_archivados(bd):
+    ayer = datetime.date.today() - datetime.timedelta(days=1)
+    with sesion():
+        # El proyecto de id más alto está finalizado y se archiva
+        ultimo = _nuevo_proyecto(1, ayer)
+        archivo.archivar_finalizados(progreso=False)
+        assert ProyectoArchivado.get_or_none(ProyectoArchivado.id_proyecto == ultimo.id_proyecto)
+        # Aunque después se borre el nuevo proyecto de id más alto
+        _borrar(_nuevo_proyecto(2, None))
+        nuevo = _nuevo_proyecto(3, ayer)
+        assert nuevo.id_proyecto > ultimo.id_proyecto
+        archivo.archivar_finalizados(progreso=False)
+        assert ProyectoArchivado.select().where(ProyectoArchivado.id_proyecto == nuevo.id_proyecto).count() == 1
+
+def test_restaurar_deja_el_contador_por_encima_del_archivo(bd, tmp_path):
+    ayer = datetime.date.today() - datetime.timedelta(days=1)
+    with sesion():
+        ultimo = _nuevo_proyecto(1, ayer)
+        archivo.archivar_finalizados(progreso=False)
+    ruta = str(tmp_path / 'empresa.snap')
+    snapshot.exportar(ruta)
+    snapshot.restaurar(ruta)
+    with sesion():
+        assert _nuevo_proyecto(2, None).id_proyecto > ultimo.id_proyecto
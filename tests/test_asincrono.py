@@ -0,0 +1,15 @@
+import asyncio
+import asincrono
+
+def test_ejecutor_compartido_en_varios_bucles(bd):
+    async def informes():
+        # Más llamadas que max_pendientes: alguna espera en el semáforo
+        return await asyncio.gather(*(asincrono.informe(1) for _ in range(20)))
+
+    try:
+        primero = asyncio.run(informes())
+        segundo = asyncio.run(informes())
+    finally:
+        asyncio.run(asincrono.cerrar_ejecutor())
+    assert primero == segundo
+    assert len(primero[0]) > 0
@@ -0,0 +1,87 @@
+import datetime
+import pytest
+from peewee import fn, SQL, IntegrityError
+import archivo
+import borrado_clientes
+import conexion
+import crear_tablas
+import generador_datos
+from conexion import sesion
+from crear_tablas import (Cliente, Proyecto, EmpleadoProyecto, ResumenCliente,
+                          ProyectoArchivado, EmpleadoProyectoArchivado)
+
+MODELOS = (Cliente, Proyecto, EmpleadoProyecto, ResumenCliente,
+           ProyectoArchivado, EmpleadoProyectoArchivado)
+
+# Claves ajenas que se crean con ON DELETE CASCADE si borrado_cascada está activo
+FK_CASCADA = (Proyecto.id_cliente, EmpleadoProyecto.id_proyecto,
+              ProyectoArchivado.id_cliente, EmpleadoProyectoArchivado.id_proyecto)
+
+@pytest.fixture
+def bd_cascada(tmp_path, monkeypatch):
+    """
+    Como el fixture bd, pero con las tablas creadas con ON DELETE CASCADE.
+    """
+    for campo in FK_CASCADA:
+        monkeypatch.setattr(campo, 'on_delete', 'CASCADE')
+    conexion.cambiar_base(str(tmp_path / 'cascada.db'))
+    crear_tablas.crear_tablas()
+    generador_datos.poblar(400, recrear=False)
+    yield
+    conexion.cambiar_base(':memory:')
+
+def _filas_de(clientes):
+    """
+    Filas de cada tabla que pertenecen a esos clientes.
+    """
+    proyectos = Proyecto.id_cliente.in_(clientes)
+    archivados = ProyectoArchivado.id_cliente.in_(clientes)
+    consultas = {
+        Cliente: Cliente.select().where(Cliente.dni_cif.in_(clientes)),
+        Proyecto: Proyecto.select().where(proyectos),
+        EmpleadoProyecto: EmpleadoProyecto.select().join(Proyecto).where(proyectos),
+        ResumenCliente: ResumenCliente.select().where(ResumenCliente.id_cliente.in_(clientes)),
+        ProyectoArchivado: ProyectoArchivado.select().where(archivados),
+        EmpleadoProyectoArchivado: EmpleadoProyectoArchivado.select().join(ProyectoArchivado).where(archivados),
+    }
+    return {modelo: set(consulta.tuples()) for modelo, consulta in consultas.items()}
+
+def _contenido():
+    return {modelo: set(modelo.select().tuples()) for modelo in MODELOS}
+
+@pytest.mark.parametrize('cascada_bd', [False, True])
+def test_borra_los_clientes_y_todo_lo_suyo(request, cascada_bd):
+    request.getfixturevalue('bd_cascada' if cascada_bd else 'bd')
+    # Parte de los proyectos terminados pasan al archivo
+    archivo.archivar_finalizados(datetime.date(2020, 1, 1), progreso=False)
+    with sesion():
+        clientes = [dni_cif for dni_cif, in (Proyecto
+                                             .select(Proyecto.id_cliente)
+                                             .group_by(Proyecto.id_cliente)
+                                             .order_by(fn.COUNT(SQL('*')).desc())
+                                             .limit(5)
+                                             .tuples())]
+        antes = _contenido()
+        borrar = _filas_de(clientes)
+    assert all(borrar.values())
+
+    # Lotes de 2 clientes: tres transacciones
+    totales = borrado_clientes.eliminar_clientes(clientes, tamano_lote=2, cascada_bd=cascada_bd)
+
+    assert totales == {modelo._meta.table_name: len(borrar[modelo])
+                       for modelo in MODELOS if modelo is not ResumenCliente}
+    with sesion():
+        # Nada de esos clientes queda (tampoco su fila de ResumenCliente,
+        # que con cascada_bd se borra a mano) y el resto sigue igual
+        assert not any(_filas_de(clientes).values())
+        assert _contenido() == {modelo: antes[modelo] - borrar[modelo] for modelo in MODELOS}
+
+def test_sin_cascada_en_la_bd_falla_y_deshace_el_lote(bd):
+    with sesion():
+        clientes = [dni_cif for dni_cif, in Proyecto.select(Proyecto.id_cliente).distinct().limit(3).tuples()]
+        antes = _contenido()
+
+    with pytest.raises(IntegrityError):
+        borrado_clientes.eliminar_clientes(clientes, cascada_bd=True)
+    with sesion():
+        assert _contenido() == antes
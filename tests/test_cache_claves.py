@@ -0,0 +1,119 @@
+import types
+import pytest
+from conexion import db, sesion
+from crear_tablas import Cliente
+import cache_claves
+from cache_claves import CacheLRU
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """
+    Reloj manual para cache_claves: reloj.avanzar(segundos).
+    """
+    reloj = types.SimpleNamespace(ahora=1000.0)
+    reloj.monotonic = lambda: reloj.ahora
+    def avanzar(segundos):
+        reloj.ahora += segundos
+    reloj.avanzar = avanzar
+    monkeypatch.setattr(cache_claves, 'time', reloj)
+    return reloj
+
+@pytest.fixture
+def cache(bd):
+    cache_claves.activar_cache(modelos=(Cliente,))
+    yield cache_claves._caches[Cliente]
+    cache_claves.desactivar_cache()
+
+def test_expulsa_la_menos_usada():
+    cache = CacheLRU(capacidad=3)
+    for clave in 'abc':
+        cache.guardar(clave, clave.upper())
+    # Usar 'a' la pone la última: sale 'b' y luego 'c'
+    assert cache.obtener('a') == (True, 'A')
+    cache.guardar('d', 'D')
+    cache.guardar('e', 'E')
+
+    assert cache.obtener('b') == (False, None)
+    assert cache.obtener('c') == (False, None)
+    assert [cache.obtener(clave)[0] for clave in 'ade'] == [True, True, True]
+    assert cache.estadisticas()['expulsiones'] == 2
+
+def test_volver_a_guardar_cuenta_como_uso():
+    cache = CacheLRU(capacidad=2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    cache.guardar('a', 3)
+    cache.guardar('c', 4)
+    assert cache.obtener('a') == (True, 3)
+    assert cache.obtener('b') == (False, None)
+
+def test_las_entradas_caducan(reloj):
+    cache = CacheLRU(ttl=10)
+    cache.guardar('a', 1)
+    reloj.avanzar(5)
+    cache.guardar('b', 2)
+
+    reloj.avanzar(5)
+    assert cache.obtener('a') == (False, None)
+    assert cache.obtener('b') == (True, 2)
+    reloj.avanzar(5)
+    assert cache.obtener('b') == (False, None)
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['caducadas'], estadisticas['tamano']) == (2, 0)
+
+def test_la_caducidad_devuelve_datos_nuevos(cache, reloj):
+    with sesion():
+        dni_cif = Cliente.select(Cliente.dni_cif).scalar()
+        cache_claves.obtener_cliente(dni_cif)
+        # Escritura que no pasa por los modelos: solo el TTL la hace visible
+        db.execute_sql('UPDATE clientes SET tlf = ? WHERE dni_cif = ?', ('600000001', dni_cif))
+        assert cache_claves.obtener_cliente(dni_cif).tlf != '600000001'
+        reloj.avanzar(cache_claves.TTL)
+        assert cache_claves.obtener_cliente(dni_cif).tlf == '600000001'
+
+def test_save_invalida_solo_su_clave(cache):
+    with sesion():
+        primero, segundo = [c.dni_cif for c in Cliente.select().order_by(Cliente.dni_cif).limit(2)]
+        cliente = cache_claves.obtener_cliente(primero)
+        cache_claves.obtener_cliente(segundo)
+
+        cliente.tlf = '600000002'
+        cliente.save()
+
+        assert cache.obtener(primero) == (False, None)
+        assert cache.obtener(segundo)[0]
+        assert cache_claves.obtener_cliente(primero).tlf == '600000002'
+
+def test_update_sin_clave_vacia_la_cache(cache):
+    with sesion():
+        claves = [c.dni_cif for c in Cliente.select().order_by(Cliente.dni_cif).limit(3)]
+        for clave in claves:
+            cache_claves.obtener_cliente(clave)
+
+        Cliente.update(tlf=None).where(Cliente.dni_cif.in_(claves[:1])).execute()
+        assert cache.estadisticas()['tamano'] == 3 - 1
+
+        Cliente.update(tlf=None).where(Cliente.nombre_cliente != '').execute()
+        assert cache.estadisticas()['tamano'] == 0
+        assert all(cache_claves.obtener_cliente(clave).tlf is None for clave in claves)
+
+def test_borrar_invalida(cache):
+    with sesion():
+        dni_cif = Cliente.create(dni_cif='X0000001', nombre_cliente='Temporal',
+                                 email='temporal@ejemplo.com').dni_cif
+        cliente = cache_claves.obtener_cliente(dni_cif)
+        assert cache.obtener(dni_cif)[0]
+
+        cliente.delete_instance()
+
+        assert cache_claves.obtener_cliente(dni_cif) is None
+        assert cache.obtener(dni_cif) == (False, None)
+
+def test_no_guarda_lo_leido_tras_escribir_en_la_transaccion(cache):
+    with sesion():
+        dni_cif = Cliente.select(Cliente.dni_cif).scalar()
+        with db.atomic() as transaccion:
+            Cliente.update(tlf='600000003').where(Cliente.dni_cif == dni_cif).execute()
+            assert cache_claves.obtener_cliente(dni_cif).tlf == '600000003'
+            transaccion.rollback()
+        assert cache_claves.obtener_cliente(dni_cif).tlf != '600000003'
@@ -0,0 +1,75 @@
+import datetime
+import os
+import subprocess
+import sys
+from decimal import Decimal
+from conexion import sesion
+from crear_tablas import Cambio, Cliente, Empleado, Proyecto, con_upsert
+import cambios
+import instrumentacion
+
+def _jefes_libres(cuantos):
+    dirigidos = Proyecto.select(Proyecto.id_jefe_proyecto)
+    return [dni for dni, in (Empleado.select(Empleado.dni)
+                             .where(Empleado.jefe == True, Empleado.dni.not_in(dirigidos))
+                             .order_by(Empleado.dni).limit(cuantos).tuples())]
+
+def _proyecto(jefe, cliente, **campos):
+    fila = {'titulo_proyecto': f'Prueba {jefe}', 'fecha_inicio': datetime.date(2020, 1, 1),
+            'presupuesto': Decimal('1000'), 'id_cliente': cliente, 'id_jefe_proyecto': jefe}
+    fila.update(campos)
+    return fila
+
+def _registrados(desde, operacion):
+    return set(Cambio
+               .select(Cambio.id_proyecto, Cambio.id_cliente)
+               .where(Cambio.id > desde, Cambio.tabla == 'proyectos', Cambio.operacion == operacion)
+               .tuples())
+
+def test_insert_de_proyectos_apunta_los_ids_asignados(bd):
+    with sesion():
+        desde = cambios.ultimo_cambio()
+        cliente = Cliente.select().first().dni_cif
+        jefes = _jefes_libres(3)
+        Proyecto.insert_many([_proyecto(jefe, cliente) for jefe in jefes]).execute()
+        insertados = set(Proyecto.select(Proyecto.id_proyecto, Proyecto.id_cliente)
+                         .where(Proyecto.id_jefe_proyecto.in_(jefes)).tuples())
+        assert len(insertados) == 3
+        assert _registrados(desde, 'insert') == insertados
+
+def test_upsert_apunta_como_update_los_proyectos_existentes(bd):
+    with sesion():
+        existente = Proyecto.select().first()
+        nuevo_jefe, = _jefes_libres(1)
+        desde = cambios.ultimo_cambio()
+        filas = [_proyecto(existente.id_jefe_proyecto_id, existente.id_cliente_id, presupuesto=Decimal('5')),
+                 _proyecto(nuevo_jefe, existente.id_cliente_id)]
+        con_upsert(Proyecto.insert_many(filas), ['presupuesto'], [Proyecto.id_jefe_proyecto]).execute()
+        nuevo = Proyecto.get(Proyecto.id_jefe_proyecto == nuevo_jefe)
+        assert _registrados(desde, 'insert') == {(nuevo.id_proyecto, nuevo.id_cliente_id)}
+        assert _registrados(desde, 'update') == {(existente.id_proyecto, existente.id_cliente_id)}
+
+def test_registra_importando_solo_crear_tablas(bd):
+    with sesion():
+        desde = cambios.ultimo_cambio()
+    script = (
+        "from crear_tablas import Cliente\n"
+        "Cliente.update(tlf='600000000').where(Cliente.dni_cif == Cliente.select(Cliente.dni_cif).limit(1)).execute()\n"
+    )
+    entorno = dict(os.environ, EMPRESA_DB_BACKEND='sqlite', EMPRESA_DB_NAME=bd)
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', script], cwd=raiz, env=entorno, check=True)
+    with sesion():
+        assert cambios.resumen_cambios(desde) == {('clientes', 'update'): 1}
+
+def test_el_registro_pasa_por_execute_sql(bd):
+    with sesion():
+        clientes = [dni_cif for dni_cif, in Cliente.select(Cliente.dni_cif).limit(3).tuples()]
+        desde = cambios.ultimo_cambio()
+        instrumentacion.reiniciar()
+        with instrumentacion.instrumentado():
+            Cliente.update(tlf='600000000').where(Cliente.dni_cif.in_(clientes)).execute()
+        assert cambios.resumen_cambios(desde) == {('clientes', 'update'): 3}
+    sentencias = [sentencia['sql'] for sentencia in instrumentacion.ultimas_sentencias()]
+    # Un único INSERT de varias filas en el registro
+    assert sum(sql.startswith('INSERT INTO "registro_cambios"') for sql in sentencias) == 1
@@ -0,0 +1,36 @@
+import json
+from conexion import sesion
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto
+import carga_masiva
+
+def _escribir(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as fichero:
+        for registro in registros:
+            fichero.write(json.dumps(registro) + '\n')
+    return str(ruta)
+
+def test_id_mal_escrito_se_rechaza_sin_parar_la_carga(bd, tmp_path):
+    with sesion():
+        proyecto = Proyecto.select().first()
+        asignados = EmpleadoProyecto.select(EmpleadoProyecto.id_empleado).where(
+            EmpleadoProyecto.id_proyecto == proyecto)
+        dni = Empleado.select(Empleado.dni).where(Empleado.dni.not_in(asignados)).scalar()
+    ruta = _escribir(tmp_path / 'asignaciones.jsonl', [
+        {'id_empleado': dni, 'id_proyecto': 'doce'},
+        {'id_empleado': dni, 'id_proyecto': str(proyecto.id_proyecto)},
+    ])
+    resultado = carga_masiva.cargar_asignaciones(ruta, progreso=False)
+    assert (resultado['insertadas'], resultado['rechazadas'], resultado['fallidas']) == (1, 1, 0)
+
+def test_duplicado_no_descarta_el_lote(bd, tmp_path):
+    with sesion():
+        repetido = Cliente.select().first()
+    nuevos = [{'dni_cif': f'X{numero:07d}', 'nombre_cliente': f'Nuevo {numero}',
+               'email': f'nuevo{numero}@ejemplo.com'} for numero in range(5)]
+    duplicado = {'dni_cif': repetido.dni_cif, 'nombre_cliente': 'Otro', 'email': 'otro@ejemplo.com'}
+    ruta = _escribir(tmp_path / 'clientes.jsonl', nuevos[:2] + [duplicado] + nuevos[2:])
+    resultado = carga_masiva.cargar_clientes(ruta, progreso=False)
+    assert (resultado['insertadas'], resultado['fallidas']) == (5, 1)
+    with sesion():
+        assert Cliente.select().where(Cliente.dni_cif.startswith('X')).count() == 5
+        assert Cliente.get_by_id(repetido.dni_cif).nombre_cliente == repetido.nombre_cliente
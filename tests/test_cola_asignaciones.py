@@ -0,0 +1,35 @@
+import pytest
+from peewee import OperationalError
+import conexion
+from conexion import sesion
+from crear_tablas import Empleado, Proyecto, EmpleadoProyecto
+from cola_asignaciones import ColaAsignaciones, INSERTADA, YA_EXISTIA, DUPLICADA
+
+def test_escribe_por_lotes(bd):
+    with sesion():
+        existente = EmpleadoProyecto.select().first()
+        proyecto = Proyecto.select().first()
+        asignados = EmpleadoProyecto.select(EmpleadoProyecto.id_empleado).where(
+            EmpleadoProyecto.id_proyecto == proyecto)
+        libre = Empleado.select(Empleado.dni).where(Empleado.dni.not_in(asignados)).scalar()
+    with ColaAsignaciones(tamano_lote=2) as cola:
+        futuros = [cola.asignar(existente.id_empleado_id, existente.id_proyecto_id),
+                   cola.asignar(libre, proyecto.id_proyecto),
+                   cola.asignar(libre, proyecto.id_proyecto)]
+        # flush() cuenta las peticiones encoladas: la duplicada va con su original
+        assert cola.flush() == {YA_EXISTIA: 1, INSERTADA: 1}
+    assert [futuro.result() for futuro in futuros] == [YA_EXISTIA, INSERTADA, DUPLICADA]
+
+def test_sin_conexion_fallan_las_pendientes_y_se_cierra(tmp_path):
+    conexion.cambiar_base(str(tmp_path / 'no_existe' / 'empresa.db'))
+    try:
+        cola = ColaAsignaciones(tamano_lote=2)
+        futuros = cola.asignar_varias([('11111111A', 1), ('22222222B', 2), ('33333333C', 3)])
+        assert cola.flush(timeout=5) == {'fallida': 3}
+        assert all(isinstance(futuro.exception(), OperationalError) for futuro in futuros)
+        with pytest.raises(RuntimeError):
+            cola.asignar('44444444D', 4)
+        cola.cerrar(timeout=5)
+        assert cola.pendientes() == 0
+    finally:
+        conexion.cambiar_base(':memory:')
@@ -0,0 +1,39 @@
+from conexion import sesion
+from crear_tablas import Cliente, Proyecto, EmpleadoProyecto
+import actualizacion_borrado
+import comprobar_indices
+
+def _filas():
+    return (Cliente.select().count(), Proyecto.select().count(), EmpleadoProyecto.select().count())
+
+def test_sin_recorridos_inesperados(bd):
+    with sesion():
+        antes = _filas()
+
+    assert comprobar_indices.comprobar_indices() == []
+
+    # Las operaciones se deshacen al terminar
+    with sesion():
+        assert _filas() == antes
+
+def test_se_analizan_las_sentencias_de_cada_operacion(bd):
+    # Salvo las inserciones, todas las operaciones lanzan SELECT, UPDATE o DELETE
+    analizadas = set()
+    with sesion():
+        for nombre, funcion, args in comprobar_indices.operaciones():
+            sentencias = comprobar_indices.capturar_sentencias(funcion, *args)
+            assert sentencias, nombre
+            if any(sql.lstrip().upper().startswith(comprobar_indices.SENTENCIAS_ANALIZADAS)
+                   for sql, _ in sentencias):
+                analizadas.add(nombre)
+    esperadas = {f'consulta_{numero}' for numero in range(1, 6)}
+    esperadas |= {nombre for nombre, _, _ in actualizacion_borrado.operaciones_escritura()}
+    assert esperadas <= analizadas
+
+def test_detecta_un_recorrido_sin_indice(bd):
+    with sesion():
+        # tlf no tiene índice; dni_cif es la clave primaria
+        assert comprobar_indices.tablas_recorridas(
+            'SELECT * FROM "clientes" AS "t1" WHERE ("t1"."tlf" = ?)', ['600000000']) == {'clientes'}
+        assert comprobar_indices.tablas_recorridas(
+            'SELECT * FROM "clientes" AS "t1" WHERE ("t1"."dni_cif" = ?)', ['B00000000']) == set()
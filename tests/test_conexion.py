@@ -0,0 +1,78 @@
+import datetime
+import sqlite3
+import pytest
+import conexion
+from conexion import enrutador, sesion
+from crear_tablas import Cliente, Empleado, Proyecto
+import grafo
+import instrumentacion
+
+@pytest.fixture
+def replicas(bd, tmp_path, monkeypatch):
+    """
+    Dos réplicas SQLite copiadas del primario. Devuelve sus rutas.
+    """
+    # Sin margen tras escribir: la prueba decide cuándo se lee de las réplicas
+    monkeypatch.setattr(enrutador, 'retraso', 0)
+    rutas = [str(tmp_path / 'replica_a.db'), str(tmp_path / 'replica_b.db')]
+    conexion.configurar_replicas(rutas)
+    conexion.sincronizar_replicas()
+    yield rutas
+    conexion.configurar_replicas([])
+
+def _copiar(origen, destino):
+    fuente, copia = sqlite3.connect(origen), sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        fuente.close()
+        copia.close()
+
+def test_lecturas_por_turno_y_en_el_primario_tras_escribir(replicas):
+    with sesion():
+        destinos = {conexion.enrutador.destino() for _ in range(4)}
+        assert destinos == set(replicas)
+        cliente = Cliente.select().first()
+        Cliente.update(tlf='600000000').where(Cliente.dni_cif == cliente.dni_cif).execute()
+        assert enrutador.destino() == 'primario'
+        # Lo recién escrito se lee del primario aunque las réplicas no lo tengan
+        assert Cliente.get_by_id(cliente.dni_cif).tlf == '600000000'
+    assert enrutador.destino() in replicas
+
+def test_replica_caida_se_aparta_y_se_lee_del_primario(replicas, tmp_path):
+    caida = str(tmp_path / 'no_existe.db')
+    conexion.configurar_replicas([caida])
+    antes = enrutador.lecturas['primario']
+    with sesion():
+        assert Cliente.select().count() > 0
+    assert enrutador.apartadas() == [caida]
+    assert enrutador.lecturas['primario'] == antes + 1
+
+def test_grafo_lee_de_una_sola_replica(replicas, bd):
+    # La réplica A va por delante de la B: tiene un cliente y un proyecto
+    # que B aún no ha recibido
+    with sesion():
+        cliente = Cliente.create(dni_cif='Z0000000', nombre_cliente='Nuevo', email='nuevo@ejemplo.com')
+        jefe = Empleado.create(dni='Z0000001', nombre='Jefe', jefe=True, email='jefe@ejemplo.com')
+        Proyecto.create(titulo_proyecto='Nuevo', fecha_inicio=datetime.date(2024, 1, 1),
+                        presupuesto=1000, id_cliente=cliente, id_jefe_proyecto=jefe)
+    _copiar(bd, replicas[0])
+
+    for _ in range(4):
+        antes = dict(enrutador.lecturas)
+        cargado = grafo.cargar_grafo()
+        usadas = {nombre for nombre, lecturas in enrutador.lecturas.items()
+                  if lecturas != antes.get(nombre, 0)}
+        assert len(usadas) == 1
+        assert ('Z0000000' in cargado.clientes) == (usadas == {replicas[0]})
+
+def test_instrumentacion_mide_las_lecturas_de_las_replicas(replicas):
+    instrumentacion.reiniciar()
+    with instrumentacion.instrumentado():
+        # Una réplica configurada con la instrumentación ya activa también se mide
+        conexion.configurar_replicas(replicas[:1])
+        with sesion():
+            Cliente.select().count()
+    assert enrutador.lecturas[replicas[0]] > 0
+    assert sum(stats['sentencias'] for stats in instrumentacion.estadisticas().values()) == 1
+    assert all('execute_sql' not in replica.__dict__ for replica in enrutador.replicas.values())
@@ -0,0 +1,137 @@
+import datetime
+from collections import Counter, defaultdict
+from decimal import Decimal
+import pytest
+from playhouse.test_utils import assert_query_count
+from conexion import sesion
+from crear_tablas import (Cliente, Empleado, Proyecto, EmpleadoProyecto,
+                          ProyectoArchivado, EmpleadoProyectoArchivado)
+import archivo
+import consultas
+import grafo
+
+INFORMES = [getattr(consultas, f'consulta_{numero}') for numero in sorted(consultas.INFORMES)]
+
+@pytest.mark.parametrize('archivo', [False, True])
+@pytest.mark.parametrize('informe', INFORMES, ids=lambda informe: informe.__name__)
+def test_informe_dentro_del_presupuesto(bd, informe, archivo, capsys):
+    with sesion():
+        with assert_query_count(informe.presupuesto_consultas):
+            informe(archivo)
+    assert capsys.readouterr().out.count('\n') > 1
+
+def test_grafo_dentro_del_presupuesto(bd):
+    with sesion():
+        with assert_query_count(grafo.cargar_grafo.presupuesto_consultas):
+            completo = grafo.cargar_grafo()
+        clientes = sorted(completo.clientes)[:3]
+        with assert_query_count(grafo.cargar_grafo.presupuesto_consultas):
+            parcial = grafo.cargar_grafo(clientes)
+    assert completo.filas()['proyectos'] > 0
+    assert sorted(parcial.clientes) == clientes
+
+def test_total_por_cliente_como_la_suma_de_presupuestos(bd):
+    # En SQLite la suma es REAL: el total tiene que salir como la suma
+    # exacta de los Decimal de cada proyecto
+    with sesion():
+        esperados = [sum((proyecto.presupuesto for proyecto in cliente.proyectos), 0)
+                     for cliente in Cliente.select().order_by(Cliente.dni_cif)]
+        totales = [total for _, total in consultas.filas_consulta_1()]
+    assert all(isinstance(total, Decimal) for total in totales)
+    assert totales == esperados
+    assert all(total.as_tuple().exponent >= -2 for total in totales)
+
+# --- Informes 2 a 5 frente a una versión fila a fila con el ORM ---
+def _normalizar(fila):
+    # Importes a céntimos: según la consulta SQLite los da como REAL o Decimal
+    return tuple(Decimal(str(valor)).quantize(consultas.CENTIMO) if isinstance(valor, (float, Decimal))
+                 else valor for valor in fila)
+
+def _datos(con_archivo):
+    """
+    Clientes por dni_cif, proyectos por id y {id_proyecto: [dni_empleado]}
+    leídos fila a fila (con los archivados si 'con_archivo').
+    """
+    clientes = list(Cliente.select().order_by(Cliente.dni_cif))
+    proyectos = list(Proyecto.select())
+    asignaciones = [(a.id_empleado_id, a.id_proyecto_id) for a in EmpleadoProyecto.select()]
+    if con_archivo:
+        proyectos += list(ProyectoArchivado.select())
+        asignaciones += [(a.id_empleado_id, a.id_proyecto_id) for a in EmpleadoProyectoArchivado.select()]
+    proyectos.sort(key=lambda proyecto: proyecto.id_proyecto)
+    empleados = defaultdict(list)
+    for dni, id_proyecto in asignaciones:
+        empleados[id_proyecto].append(dni)
+    return clientes, proyectos, empleados
+
+def _esperadas_2(clientes, proyectos, empleados):
+    num_proyectos = Counter(dni for dnis in empleados.values() for dni in dnis)
+    nombres = {empleado.dni: empleado.nombre for empleado in Empleado.select()}
+    for proyecto in proyectos:
+        dnis = sorted(empleados[proyecto.id_proyecto])
+        if not dnis:
+            yield (proyecto.id_proyecto, proyecto.titulo_proyecto, None, None)
+        for dni in dnis:
+            yield (proyecto.id_proyecto, proyecto.titulo_proyecto, nombres[dni], num_proyectos[dni])
+
+def _esperadas_3(clientes, proyectos, empleados):
+    for cliente in clientes:
+        suyos = [p for p in proyectos if p.id_cliente_id == cliente.dni_cif]
+        if not suyos:
+            yield (cliente.nombre_cliente, None, None)
+            continue
+        mas_caro = min(suyos, key=lambda p: (-p.presupuesto, p.id_proyecto))
+        yield (cliente.nombre_cliente, mas_caro.titulo_proyecto, mas_caro.presupuesto)
+
+def _esperadas_4(clientes, proyectos, empleados):
+    nombres = {empleado.dni: empleado.nombre for empleado in Empleado.select()}
+    for proyecto in proyectos:
+        yield (proyecto.titulo_proyecto, nombres[proyecto.id_jefe_proyecto_id],
+               len(empleados[proyecto.id_proyecto]))
+
+def _esperadas_5(clientes, proyectos, empleados):
+    for cliente in clientes:
+        validos = [(p, (p.fecha_fin - p.fecha_inicio).days) for p in proyectos
+                   if p.id_cliente_id == cliente.dni_cif and p.fecha_inicio and p.fecha_fin
+                   and p.fecha_fin >= p.fecha_inicio]
+        if not validos:
+            yield (cliente.nombre_cliente, None, None, 0)
+            continue
+        mas_largo, dias = min(validos, key=lambda par: (-par[1], par[0].id_proyecto))
+        yield (cliente.nombre_cliente, mas_largo.titulo_proyecto, dias,
+               len(empleados[mas_largo.id_proyecto]))
+
+ESPERADAS = {2: _esperadas_2, 3: _esperadas_3, 4: _esperadas_4, 5: _esperadas_5}
+
+@pytest.fixture
+def empates(bd):
+    """
+    Casos límite de los informes 3 y 5 sobre el fixture: dos proyectos del
+    mismo cliente empatados en el presupuesto y la duración más altos, y un
+    cliente cuyo único proyecto termina antes de empezar.
+    """
+    with sesion():
+        cliente = Proyecto.select(Proyecto.id_cliente).order_by(Proyecto.id_proyecto).scalar()
+        empatados = (Proyecto.select(Proyecto.id_proyecto)
+                     .where(Proyecto.id_cliente == cliente)
+                     .order_by(Proyecto.id_proyecto.desc())
+                     .limit(2))
+        Proyecto.update(presupuesto=Decimal('99999999.00'), fecha_inicio=datetime.date(2000, 1, 1),
+                        fecha_fin=datetime.date(2014, 12, 31)).where(Proyecto.id_proyecto.in_(empatados)).execute()
+
+        al_reves = Cliente.create(dni_cif='X0000001', nombre_cliente='Fechas al revés',
+                                  email='al.reves@ejemplo.com')
+        jefe = Empleado.create(dni='Z0000001', nombre='Jefe', jefe=True, email='jefe@ejemplo.com')
+        Proyecto.create(titulo_proyecto='Al revés', fecha_inicio=datetime.date(2020, 1, 1),
+                        fecha_fin=datetime.date(2019, 1, 1), presupuesto=1000,
+                        id_cliente=al_reves, id_jefe_proyecto=jefe)
+
+@pytest.mark.parametrize('archivo_incluido', [False, True])
+@pytest.mark.parametrize('numero', sorted(ESPERADAS))
+def test_informe_como_la_version_fila_a_fila(empates, numero, archivo_incluido):
+    if archivo_incluido:
+        archivo.archivar_finalizados(datetime.date(2020, 1, 1), progreso=False)
+    with sesion():
+        esperadas = [_normalizar(fila) for fila in ESPERADAS[numero](*_datos(archivo_incluido))]
+    filas = [_normalizar(fila) for fila in consultas.INFORMES[numero](archivo_incluido)]
+    assert filas == esperadas
@@ -0,0 +1,106 @@
+import datetime
+from decimal import Decimal
+import pytest
+from conexion import db, sesion
+from crear_tablas import (Cliente, Empleado, Proyecto, EmpleadoProyecto, ResumenCliente,
+                          ProyectoArchivado, EmpleadoProyectoArchivado)
+import archivo
+import actualizacion_borrado
+import consultas_compiladas
+from consultas_compiladas import Plantilla, Parametro, por_clave
+
+MODELOS = (Cliente, Proyecto, EmpleadoProyecto, ResumenCliente,
+           ProyectoArchivado, EmpleadoProyectoArchivado)
+
+def _contenido():
+    return {modelo: sorted(modelo.select().tuples()) for modelo in MODELOS}
+
+def _proyectos_baratos(fecha, tope):
+    return (Proyecto
+            .select(Proyecto.id_proyecto, Proyecto.presupuesto)
+            .where((Proyecto.fecha_fin < fecha) & (Proyecto.presupuesto < tope))
+            .order_by(Proyecto.id_proyecto))
+
+def test_por_clave_equivale_a_get_or_none(bd):
+    with sesion():
+        claves = {
+            Cliente: Cliente.select(Cliente.dni_cif).scalar(),
+            Empleado: Empleado.select(Empleado.dni).scalar(),
+            Proyecto: Proyecto.select(Proyecto.id_proyecto).where(Proyecto.fecha_fin.is_null(False)).scalar(),
+        }
+        for modelo, clave in claves.items():
+            instancia = por_clave(modelo, clave)
+            esperada = modelo.get_or_none(modelo._meta.primary_key == clave)
+            assert instancia.__data__ == esperada.__data__
+            assert not instancia.is_dirty()
+        assert por_clave(Proyecto, -1) is None
+        assert por_clave(Cliente, 'NO EXISTE') is None
+
+def test_los_parametros_se_enlazan_en_cada_llamada(bd):
+    compilada = Plantilla(_proyectos_baratos)
+    with sesion():
+        for fecha, tope in [(datetime.date(2018, 1, 1), Decimal('5000')),
+                            (datetime.date(2030, 1, 1), Decimal('20000.50')),
+                            (datetime.date(2010, 1, 1), Decimal('99999999'))]:
+            filas = compilada.cursor(fecha, tope).fetchall()
+            esperadas = list(_proyectos_baratos(fecha, tope).tuples())
+            # El cursor devuelve los valores tal como los da el driver
+            assert [(id_proyecto, Decimal(str(presupuesto))) for id_proyecto, presupuesto in filas] == esperadas
+        # El SQL se compila una sola vez
+        assert (compilada.compilaciones, compilada.ejecuciones) == (1, 3)
+
+    parametro = compilada._parametros[0]
+    assert isinstance(parametro, Parametro) and parametro.value is parametro
+
+def test_se_recompila_tras_vaciar(bd):
+    compilada = consultas_compiladas.plantilla_por_clave(Cliente)
+    with sesion():
+        por_clave(Cliente, 'NO EXISTE')
+        compilaciones = compilada.compilaciones
+        por_clave(Cliente, 'NO EXISTE')
+        assert compilada.compilaciones == compilaciones
+        consultas_compiladas.vaciar()
+        por_clave(Cliente, 'NO EXISTE')
+    assert compilada.compilaciones == compilaciones + 1
+    assert consultas_compiladas.estadisticas()['por_clave(Cliente)']['dialectos'] == ['sqlite']
+
+def test_errores_de_uso(bd):
+    compilada = Plantilla(_proyectos_baratos)
+    with sesion():
+        with pytest.raises(TypeError):
+            compilada.cursor(datetime.date.today())
+        with pytest.raises(TypeError):
+            compilada.ejecutar(datetime.date.today(), 1)
+
+def test_las_escrituras_equivalen_a_las_de_peewee(bd):
+    # Parte de los proyectos terminados pasan al archivo
+    archivo.archivar_finalizados(datetime.date(2020, 1, 1), progreso=False)
+    with sesion():
+        dni_cif = (ProyectoArchivado.select(ProyectoArchivado.id_cliente)
+                   .where(ProyectoArchivado.id_cliente.in_(Proyecto.select(Proyecto.id_cliente)))
+                   .scalar())
+    pasos = [
+        (actualizacion_borrado.aumentar_presupuesto_activos, (datetime.date.today(),)),
+        (actualizacion_borrado.borrar_asignaciones_de_cliente, (dni_cif,)),
+        (actualizacion_borrado.borrar_proyectos_de_cliente, (dni_cif,)),
+        (actualizacion_borrado.borrar_asignaciones_archivadas_de_cliente, (dni_cif,)),
+        (actualizacion_borrado.borrar_proyectos_archivados_de_cliente, (dni_cif,)),
+        (actualizacion_borrado.borrar_cliente, (dni_cif,)),
+    ]
+
+    def aplicar(ejecutar):
+        # Se aplican los pasos, se guarda el resultado y se deshace todo
+        with sesion():
+            with db.atomic() as transaccion:
+                filas = [ejecutar(compilada, args) for compilada, args in pasos]
+                contenido = _contenido()
+                transaccion.rollback()
+        return filas, contenido
+
+    # Cada plantilla construida con los valores en lugar de Parametro
+    filas_peewee, con_peewee = aplicar(lambda compilada, args: compilada._construir(*args).execute())
+    filas, con_plantillas = aplicar(lambda compilada, args: compilada.ejecutar(*args))
+
+    assert all(filas_peewee)
+    assert filas == filas_peewee
+    assert con_plantillas == con_peewee
@@ -0,0 +1,67 @@
+import datetime
+from decimal import Decimal
+import pytest
+from conexion import sesion
+from crear_tablas import Cambio, Cliente, Proyecto
+import cambios
+import consultas
+import informes_incrementales
+from informes_incrementales import InformeIncremental, avanzar_punto_control, comprobar
+
+def _subir_presupuesto(id_cliente):
+    proyecto = Proyecto.select().where(Proyecto.id_cliente == id_cliente).first()
+    Proyecto.update(presupuesto=proyecto.presupuesto + Decimal('1000')).where(
+        Proyecto.id_proyecto == proyecto.id_proyecto).execute()
+
+@pytest.mark.parametrize('numero', sorted(informes_incrementales.CLAVES))
+def test_refresco_incremental_como_el_informe_completo(bd, numero):
+    informe = InformeIncremental(numero)
+    assert informe.refrescar()['completo']
+    with sesion():
+        cliente = Cliente.select().first()
+        _subir_presupuesto(cliente.dni_cif)
+        Cliente.update(nombre_cliente='Renombrado').where(Cliente.dni_cif == cliente.dni_cif).execute()
+    estado = informe.refrescar()
+    assert not estado['completo']
+    assert comprobar(informe) is None
+
+def test_cambio_confirmado_tarde_no_se_pierde(bd):
+    informe = InformeIncremental(1)
+    informe.refrescar()
+    primero, segundo = [dni for dni, in Cliente.select(Cliente.dni_cif).limit(2).tuples()]
+    with sesion():
+        antes = cambios.ultimo_cambio()
+        _subir_presupuesto(primero)
+        tardios = list(Cambio.select().where(Cambio.id > antes).dicts())
+        _subir_presupuesto(segundo)
+        # Los cambios del primero aún no se ven: su transacción no ha terminado
+        Cambio.delete().where(Cambio.id.in_([cambio['id'] for cambio in tardios])).execute()
+    informe.refrescar()
+    assert informe.punto_control == antes
+
+    with sesion():
+        Cambio.insert_many(tardios).execute()
+    assert not informe.refrescar()['completo']
+    assert comprobar(informe) is None
+    assert informe.punto_control == cambios.ultimo_cambio() and informe.vistos == {}
+
+def test_hueco_antiguo_se_da_por_perdido():
+    ahora = datetime.datetime(2024, 1, 1, 12, 0)
+    reciente = ahora - datetime.timedelta(seconds=10)
+    antiguo = ahora - datetime.timedelta(seconds=informes_incrementales.ESPERA_HUECOS + 1)
+    assert avanzar_punto_control(10, {11: reciente, 13: reciente}, ahora) == (11, {13: reciente})
+    assert avanzar_punto_control(10, {11: antiguo, 13: antiguo, 15: reciente}, ahora) == (13, {15: reciente})
+
+@pytest.mark.parametrize('numero', sorted(informes_incrementales.CLAVES))
+def test_refresco_tras_recortar_el_registro(bd, numero):
+    informe = InformeIncremental(numero)
+    informe.refrescar()
+    with sesion():
+        cambios.recortar(informe.punto_control)
+        cliente = Cliente.select().first()
+        _subir_presupuesto(cliente.dni_cif)
+        assert cambios.ultimo_cambio() > informe.punto_control
+    informe.refrescar()
+    with sesion():
+        esperadas = [tuple(fila) for fila in consultas.INFORMES[numero]()]
+    assert [tuple(fila) for fila in informe.filas()] == esperadas
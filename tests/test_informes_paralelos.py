@@ -0,0 +1,53 @@
+import io
+import time
+from contextlib import redirect_stdout
+from conexion import sesion
+import consultas
+import informes_paralelos
+
+def _salida(numero):
+    # Lo que imprime el informe ejecutado solo
+    buffer = io.StringIO()
+    with redirect_stdout(buffer), sesion():
+        getattr(consultas, f'consulta_{numero}')()
+    return buffer.getvalue()
+
+def test_con_hilos_respeta_el_orden_y_separa_las_salidas(bd, monkeypatch, capsys):
+    esperadas = {numero: _salida(numero) for numero in consultas.INFORMES}
+    assert len(set(esperadas.values())) == len(esperadas)
+
+    # El primer informe es el último en terminar
+    consulta_1 = consultas.consulta_1
+    def lenta():
+        time.sleep(0.2)
+        consulta_1()
+    monkeypatch.setattr(consultas, 'consulta_1', lenta)
+    capsys.readouterr()
+
+    resultados = list(informes_paralelos.ejecutar_informes([5, 1, 3, 2, 4], trabajadores=5))
+
+    assert [resultado.numero for resultado in resultados] == [1, 2, 3, 4, 5]
+    assert {resultado.numero: resultado.salida for resultado in resultados} == esperadas
+    assert not any(resultado.error for resultado in resultados)
+    # Nada se escribe en la salida real mientras corren
+    assert capsys.readouterr().out == ''
+
+def test_un_informe_que_falla_no_para_los_demas(bd, monkeypatch):
+    esperadas = {numero: _salida(numero) for numero in (1, 3)}
+    def falla():
+        print("Empezando...")
+        raise RuntimeError("sin conexión")
+    monkeypatch.setattr(consultas, 'consulta_2', falla)
+
+    resultados = list(informes_paralelos.ejecutar_informes([1, 2, 3], trabajadores=2))
+
+    assert [(resultado.numero, resultado.error) for resultado in resultados] == [
+        (1, None), (2, "RuntimeError: sin conexión"), (3, None)]
+    assert resultados[1].salida == "Empezando...\n"
+    assert {resultado.numero: resultado.salida for resultado in resultados if not resultado.error} == esperadas
+
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        _, errores = informes_paralelos.imprimir_resultados(resultados)
+    assert errores == 1
+    assert "Error en consulta_2: RuntimeError: sin conexión" in buffer.getvalue()
@@ -0,0 +1,48 @@
+import logging
+from conexion import db, sesion
+from crear_tablas import Cliente, Proyecto
+import actualizacion_borrado
+import instrumentacion
+
+def test_respeta_otras_envolturas_de_execute_sql(bd):
+    llamadas = []
+    original = db.execute_sql
+    def otra_envoltura(sql, params=None, *args, **kwargs):
+        llamadas.append(sql)
+        return original(sql, params, *args, **kwargs)
+
+    db.execute_sql = otra_envoltura
+    try:
+        instrumentacion.reiniciar()
+        with instrumentacion.instrumentado(), sesion():
+            Cliente.select().count()
+        assert len(llamadas) == 1
+        assert sum(stats['sentencias'] for stats in instrumentacion.estadisticas().values()) == 1
+        # Al desactivar vuelve la envoltura de antes
+        assert db.execute_sql is otra_envoltura
+    finally:
+        db.__dict__.pop('execute_sql', None)
+
+def test_desactivar_solo_quita_su_fichero(bd, tmp_path):
+    ajeno = logging.FileHandler(tmp_path / 'ajeno.log')
+    instrumentacion.logger_lentas.addHandler(ajeno)
+    try:
+        with instrumentacion.instrumentado(ruta_log_lentas=str(tmp_path / 'lentas.log')):
+            assert len(instrumentacion.logger_lentas.handlers) == 2
+        assert instrumentacion.logger_lentas.handlers == [ajeno]
+        assert 'execute_sql' not in db.__dict__
+    finally:
+        instrumentacion.logger_lentas.removeHandler(ajeno)
+        ajeno.close()
+
+def test_sentencias_de_las_plantillas_cuentan_en_su_operacion(bd):
+    with sesion():
+        dni_cif = Proyecto.select(Proyecto.id_cliente).scalar()
+    instrumentacion.reiniciar()
+    with instrumentacion.instrumentado():
+        actualizacion_borrado.aumentar_presupuesto_proyectos_activos()
+        actualizacion_borrado.eliminar_cliente_y_proyectos(dni_cif)
+    stats = instrumentacion.estadisticas()
+    assert stats['aumentar_presupuesto_proyectos_activos']['sentencias'] > 0
+    assert stats['eliminar_cliente_y_proyectos']['sentencias'] > 1
+    assert not set(stats) & {'cursor', 'ejecutar', 'desconocida'}
@@ -0,0 +1,86 @@
+import datetime
+from decimal import Decimal
+import pytest
+from conexion import sesion
+from crear_tablas import Cliente, Proyecto
+import paginacion
+
+def _todas(paginar, **opciones):
+    paginas = list(paginacion.recorrer(paginar, **opciones))
+    assert all(pagina.filas for pagina in paginas)
+    assert all(len(pagina.filas) == opciones['tamano'] for pagina in paginas[:-1])
+    return [fila for pagina in paginas for fila in pagina.filas]
+
+def _proyectos(estado=None):
+    # El listado completo sin paginar, ordenado en Python
+    with sesion():
+        return sorted(paginacion.consulta_proyectos(estado).namedtuples(),
+                      key=lambda fila: fila.id_proyecto)
+
+@pytest.fixture
+def empates(bd):
+    """
+    Da el mismo presupuesto a 25 proyectos: los empates cruzan varias páginas.
+    """
+    with sesion():
+        ids = [id_proyecto for id_proyecto, in (Proyecto.select(Proyecto.id_proyecto)
+                                                .order_by(Proyecto.id_proyecto.desc())
+                                                .limit(25).tuples())]
+        Proyecto.update(presupuesto=Decimal('12345.67')).where(Proyecto.id_proyecto.in_(ids)).execute()
+    return ids
+
+@pytest.mark.parametrize('descendente', [False, True])
+@pytest.mark.parametrize('estado', [None, 'activos', 'finalizados'])
+def test_recorrer_proyectos_por_id(bd, estado, descendente):
+    esperadas = _proyectos(estado)
+    if descendente:
+        esperadas.reverse()
+    assert _todas(paginacion.paginar_proyectos, tamano=7, estado=estado,
+                  descendente=descendente) == esperadas
+
+@pytest.mark.parametrize('descendente', [False, True])
+def test_recorrer_proyectos_por_presupuesto_con_empates(empates, descendente):
+    esperadas = sorted(_proyectos(), key=lambda fila: (fila.presupuesto, fila.id_proyecto),
+                       reverse=descendente)
+    filas = _todas(paginacion.paginar_proyectos, tamano=7, orden='presupuesto',
+                   descendente=descendente)
+    assert filas == esperadas
+    empatadas = [fila.id_proyecto for fila in filas if fila.presupuesto == Decimal('12345.67')]
+    assert empatadas == sorted(empates, reverse=descendente)
+
+def test_los_estados_reparten_los_proyectos(bd):
+    hoy = datetime.date.today()
+    activos = {fila.id_proyecto for fila in _todas(paginacion.paginar_proyectos, tamano=50, estado='activos')}
+    finalizados = {fila.id_proyecto for fila in _todas(paginacion.paginar_proyectos, tamano=50,
+                                                       estado='finalizados')}
+    assert activos and finalizados and not activos & finalizados
+    assert activos | finalizados == {fila.id_proyecto for fila in _proyectos()}
+    assert all(fila.fecha_fin is None or fila.fecha_fin > hoy
+               for fila in _proyectos() if fila.id_proyecto in activos)
+
+@pytest.mark.parametrize('descendente', [False, True])
+def test_recorrer_clientes(bd, descendente):
+    with sesion():
+        esperadas = sorted(Cliente.select(Cliente.dni_cif, Cliente.nombre_cliente,
+                                          Cliente.tlf, Cliente.email).tuples(),
+                           reverse=descendente)
+    filas = _todas(paginacion.paginar_clientes, tamano=6, descendente=descendente)
+    assert [tuple(fila) for fila in filas] == esperadas
+
+def test_rechaza_cursores_de_otro_listado(bd):
+    de_clientes = paginacion.paginar_clientes(tamano=2).siguiente
+    por_id = paginacion.paginar_proyectos(tamano=2).siguiente
+    activos = paginacion.paginar_proyectos(tamano=2, estado='activos').siguiente
+
+    with pytest.raises(ValueError, match='otro listado'):
+        paginacion.paginar_proyectos(de_clientes, tamano=2)
+    with pytest.raises(ValueError, match='otro listado'):
+        paginacion.paginar_proyectos(por_id, tamano=2, orden='presupuesto')
+    with pytest.raises(ValueError, match='otro listado'):
+        paginacion.paginar_proyectos(por_id, tamano=2, descendente=True)
+    with pytest.raises(ValueError, match='otro listado'):
+        paginacion.paginar_proyectos(activos, tamano=2, estado='finalizados')
+    with pytest.raises(ValueError, match='otro listado'):
+        paginacion.paginar_clientes(por_id, tamano=2)
+    with pytest.raises(ValueError, match='no válido'):
+        paginacion.paginar_proyectos('no-es-un-cursor', tamano=2)
@@ -0,0 +1,112 @@
+import datetime
+import json
+import os
+import pytest
+from conexion import sesion
+from crear_tablas import Proyecto, EmpleadoProyecto
+import actualizacion_borrado
+import purga
+
+def _obsoletos():
+    fecha_limite = actualizacion_borrado.restar_anios(datetime.date.today(), 5)
+    return Proyecto.select(Proyecto.id_proyecto).where(
+        actualizacion_borrado.condicion_obsoletos(fecha_limite))
+
+def _destino():
+    return Proyecto.select(Proyecto.id_proyecto).where(Proyecto.fecha_fin.is_null()).scalar()
+
+def _destino_en_sesion():
+    with sesion():
+        return _destino()
+
+def _empleados(*condiciones):
+    return {dni for dni, in (EmpleadoProyecto
+                             .select(EmpleadoProyecto.id_empleado)
+                             .where(*condiciones)
+                             .tuples())}
+
+def _filas():
+    return (Proyecto.select().count(), EmpleadoProyecto.select().count())
+
+def test_las_asignaciones_llegan_al_destino(bd):
+    destino = _destino_en_sesion()
+    with sesion():
+        obsoletos = [id_proyecto for id_proyecto, in _obsoletos().tuples()]
+        esperados = _empleados(EmpleadoProyecto.id_proyecto.in_(obsoletos + [destino]))
+        ya_en_destino = _empleados(EmpleadoProyecto.id_proyecto == destino)
+
+    estado = purga.purgar_obsoletos(destino, tamano_lote=10, progreso=False)
+
+    assert estado['proyectos'] == len(obsoletos)
+    assert estado['asignaciones_movidas'] == len(esperados - ya_en_destino)
+    with sesion():
+        assert not _obsoletos().exists()
+        assert _empleados(EmpleadoProyecto.id_proyecto == destino) == esperados
+        assert EmpleadoProyecto.select().where(EmpleadoProyecto.id_proyecto == destino).count() == len(esperados)
+
+def test_la_simulacion_cuenta_sin_borrar(bd):
+    with sesion():
+        antes = _filas()
+        obsoletos = _obsoletos().count()
+        asignaciones = EmpleadoProyecto.select().where(EmpleadoProyecto.id_proyecto.in_(_obsoletos())).count()
+
+    resultado = purga.purgar_obsoletos(_destino_en_sesion(), simulacion=True, progreso=False)
+
+    assert resultado == {'proyectos': obsoletos, 'asignaciones': asignaciones}
+    with sesion():
+        assert _filas() == antes
+
+def test_reanuda_desde_el_checkpoint(bd, tmp_path, monkeypatch, capsys):
+    checkpoint = str(tmp_path / 'purga.json')
+    destino = _destino_en_sesion()
+    with sesion():
+        obsoletos = _obsoletos().count()
+        esperados = _empleados(EmpleadoProyecto.id_proyecto.in_(_obsoletos()) |
+                               (EmpleadoProyecto.id_proyecto == destino))
+    assert obsoletos > 10
+
+    # El proceso se interrumpe en la pausa tras el primer lote confirmado
+    def interrumpir(segundos):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(purga.time, 'sleep', interrumpir)
+    with pytest.raises(KeyboardInterrupt):
+        purga.purgar_obsoletos(destino, tamano_lote=10, pausa=1, checkpoint=checkpoint, progreso=False)
+
+    with open(checkpoint, encoding='utf-8') as fichero:
+        interrumpido = json.load(fichero)
+    assert (interrumpido['lotes'], interrumpido['proyectos']) == (1, 10)
+    with sesion():
+        assert _obsoletos().count() == obsoletos - 10
+
+    # Otra purga no puede usar ese checkpoint
+    with pytest.raises(ValueError):
+        purga.purgar_antiguos_baratos(checkpoint=checkpoint, progreso=False)
+
+    monkeypatch.undo()
+    capsys.readouterr()
+    estado = purga.purgar_obsoletos(destino, tamano_lote=10, checkpoint=checkpoint, progreso=False)
+
+    assert f"Reanudando desde el proyecto {interrumpido['ultimo_id']}." in capsys.readouterr().out
+    assert estado['proyectos'] == obsoletos
+    assert estado['lotes'] == -(-obsoletos // 10)
+    assert not os.path.exists(checkpoint)
+    with sesion():
+        assert not _obsoletos().exists()
+        assert _empleados(EmpleadoProyecto.id_proyecto == destino) == esperados
+
+def test_el_checkpoint_conserva_la_fecha_de_referencia(bd, tmp_path):
+    checkpoint = str(tmp_path / 'purga.json')
+    # Una purga empezada en 2000: entonces no había terminado ningún
+    # proyecto, aunque hoy sí hay antiguos y baratos
+    purga._guardar_checkpoint(checkpoint, {
+        'trabajo': 'antiguos_baratos', 'fecha': '2000-01-01', 'destino': None,
+        'ultimo_id': 0, 'lotes': 0, 'proyectos': 0,
+        'asignaciones_movidas': 0, 'asignaciones_borradas': 0})
+    with sesion():
+        antes = _filas()
+
+    estado = purga.purgar_antiguos_baratos(checkpoint=checkpoint, progreso=False)
+
+    assert estado['proyectos'] == 0
+    with sesion():
+        assert _filas() == antes
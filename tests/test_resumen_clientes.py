@@ -0,0 +1,95 @@
+import datetime
+import os
+import subprocess
+import sys
+from decimal import Decimal
+import pytest
+from conexion import sesion
+from peewee import Value
+from crear_tablas import Cliente, Empleado, Proyecto, EmpleadoProyecto, IGNORAR, con_upsert
+import actualizacion_borrado
+import resumen_clientes
+
+def _jefes_libres(cuantos):
+    dirigidos = Proyecto.select(Proyecto.id_jefe_proyecto)
+    return [dni for dni, in (Empleado.select(Empleado.dni)
+                             .where(Empleado.jefe == True, Empleado.dni.not_in(dirigidos))
+                             .order_by(Empleado.dni).limit(cuantos).tuples())]
+
+def _proyecto(jefe, cliente, **campos):
+    fila = {'titulo_proyecto': f'Prueba {jefe}', 'fecha_inicio': datetime.date(2020, 1, 1),
+            'fecha_fin': datetime.date(2021, 6, 30), 'presupuesto': Decimal('123456.78'),
+            'id_cliente': cliente, 'id_jefe_proyecto': jefe}
+    fila.update(campos)
+    return fila
+
+def _clientes(cuantos):
+    return [dni_cif for dni_cif, in Cliente.select(Cliente.dni_cif).order_by(Cliente.dni_cif.desc())
+            .limit(cuantos).tuples()]
+
+def test_resumen_inicial_consistente(bd):
+    assert resumen_clientes.comprobar_consistencia() == []
+
+def test_insert_con_id_explicito_menor_que_el_maximo(bd):
+    with sesion():
+        hueco = Proyecto.select(Proyecto.id_proyecto).order_by(Proyecto.id_proyecto).scalar()
+        EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto == hueco).execute()
+        Proyecto.delete().where(Proyecto.id_proyecto == hueco).execute()
+        jefe, = _jefes_libres(1)
+        cliente, = _clientes(1)
+        Proyecto.insert(_proyecto(jefe, cliente, id_proyecto=hueco)).execute()
+    assert resumen_clientes.comprobar_consistencia() == []
+
+@pytest.mark.parametrize('forma', ['lista', 'generador', 'select'])
+def test_insert_en_bloque(bd, forma):
+    with sesion():
+        jefes = _jefes_libres(4)
+        clientes = _clientes(4)
+        filas = [_proyecto(jefe, cliente) for jefe, cliente in zip(jefes, clientes)]
+        if forma == 'lista':
+            Proyecto.insert_many(filas).execute()
+        elif forma == 'generador':
+            Proyecto.bulk_create(Proyecto(**fila) for fila in filas)
+        else:
+            # Copia proyectos existentes cambiando el jefe: INSERT ... SELECT
+            origen = Proyecto.select().where(Proyecto.id_cliente.in_(clientes)).limit(len(jefes))
+            for proyecto, jefe in zip(list(origen), jefes):
+                Proyecto.insert_from(
+                    Proyecto.select(Proyecto.titulo_proyecto, Proyecto.fecha_inicio, Proyecto.fecha_fin,
+                                    Proyecto.presupuesto, Proyecto.id_cliente, Value(jefe))
+                    .where(Proyecto.id_proyecto == proyecto.id_proyecto),
+                    ['titulo_proyecto', 'fecha_inicio', 'fecha_fin', 'presupuesto',
+                     'id_cliente', 'id_jefe_proyecto']).execute()
+    assert resumen_clientes.comprobar_consistencia() == []
+
+def test_upsert_que_cambia_presupuesto_y_cliente(bd):
+    with sesion():
+        existente = Proyecto.select().order_by(Proyecto.presupuesto).first()
+        otro_cliente = next(c for c in _clientes(2) if c != existente.id_cliente_id)
+        fila = _proyecto(existente.id_jefe_proyecto_id, otro_cliente, id_proyecto=existente.id_proyecto,
+                         presupuesto=Decimal('99999999.00'))
+        con_upsert(Proyecto.insert(fila), ['presupuesto', 'id_cliente']).execute()
+        con_upsert(Proyecto.insert(fila), IGNORAR).execute()
+    assert resumen_clientes.comprobar_consistencia() == []
+
+def test_update_y_delete_en_bloque(bd, capsys):
+    actualizacion_borrado.aumentar_presupuesto_proyectos_activos()
+    actualizacion_borrado.eliminar_proyectos_antiguos_baratos()
+    with sesion():
+        Proyecto.update(fecha_fin=None).where(Proyecto.presupuesto > 50000).execute()
+    assert resumen_clientes.comprobar_consistencia() == []
+
+def test_se_mantiene_importando_solo_crear_tablas(bd):
+    # Un script que escribe con los modelos sin importar resumen_clientes
+    script = (
+        "import crear_tablas\n"
+        "from crear_tablas import Proyecto, EmpleadoProyecto\n"
+        "with crear_tablas.db.atomic():\n"
+        "    Proyecto.update(presupuesto=Proyecto.presupuesto * 3).execute()\n"
+        "    EmpleadoProyecto.delete().where(EmpleadoProyecto.id_proyecto < 20).execute()\n"
+        "    Proyecto.delete().where(Proyecto.id_proyecto < 20).execute()\n"
+    )
+    entorno = dict(os.environ, EMPRESA_DB_BACKEND='sqlite', EMPRESA_DB_NAME=bd)
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', script], cwd=raiz, env=entorno, check=True)
+    assert resumen_clientes.comprobar_consistencia() == []
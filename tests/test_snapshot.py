@@ -0,0 +1,20 @@
+import cache_claves
+import snapshot
+from conexion import sesion
+from crear_tablas import Cliente
+
+def test_restaurar_vacia_la_cache_por_clave(bd, tmp_path):
+    ruta = str(tmp_path / 'empresa.snap')
+    snapshot.exportar(ruta)
+    with sesion():
+        cliente = Cliente.select().first()
+    cache_claves.activar_cache()
+    try:
+        with sesion():
+            Cliente.update(tlf='699999999').where(Cliente.dni_cif == cliente.dni_cif).execute()
+            assert cache_claves.obtener_cliente(cliente.dni_cif).tlf == '699999999'
+        snapshot.restaurar(ruta)
+        with sesion():
+            assert cache_claves.obtener_cliente(cliente.dni_cif).tlf == cliente.tlf
+    finally:
+        cache_claves.desactivar_cache()